@@ -0,0 +1,107 @@
+"""Measure cold start of ``foot_traffic_service`` for each inference backend.
+
+For every backend, ``bentoml serve`` is started with ``FOOT_TRAFFIC_BACKEND``
+set and polled until ``/readyz`` succeeds and until the first ``/predict``
+succeeds. Both times are measured from the moment the server process was
+spawned, and the service's own ``/startup_report`` phase breakdown is
+recorded alongside them.
+
+Example::
+
+    python benchmarks/bench_cold_start.py --backends eager mmap --repeats 3 \\
+        --output bench_results/cold_start.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from bench_serving import ROOT, _feature_vector
+
+BACKENDS = ("eager", "torchscript", "int8", "onnx", "mmap")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure service cold start per backend")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["eager", "mmap"],
+                        help="Backends to compare")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Cold starts per backend")
+    parser.add_argument("--port", type=int, default=3000, help="Port to serve on")
+    parser.add_argument("--timeout", type=float, default=180.0,
+                        help="Seconds to wait for the first prediction")
+    parser.add_argument("--server-log", type=str, default=None,
+                        help="File receiving server output (discarded by default)")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Optional path to write results as JSON")
+    return parser.parse_args()
+
+
+def cold_start(backend: str, port: int, timeout: float, log_path: Optional[str] = None) -> dict:
+    """Start the service once and time its way to the first prediction."""
+    import httpx
+
+    url = f"http://127.0.0.1:{port}"
+    payload = {"features": _feature_vector(np.random.default_rng(0))}
+    log = open(log_path, "a") if log_path else subprocess.DEVNULL
+    env = {**os.environ, "FOOT_TRAFFIC_BACKEND": backend}
+
+    spawned = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "bentoml", "serve", "models.serving.service:svc", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    ready = first_prediction = None
+    try:
+        with httpx.Client(timeout=5.0) as client:
+            while first_prediction is None:
+                if process.poll() is not None:
+                    raise RuntimeError(f"bentoml serve exited during start-up ({backend})")
+                if time.perf_counter() - spawned > timeout:
+                    raise RuntimeError(f"no prediction within {timeout:.0f}s ({backend})")
+                try:
+                    if ready is None:
+                        if client.get(f"{url}/readyz").status_code == 200:
+                            ready = time.perf_counter() - spawned
+                    elif client.post(f"{url}/predict", json=payload).status_code == 200:
+                        first_prediction = time.perf_counter() - spawned
+                except httpx.HTTPError:
+                    pass
+                if first_prediction is None:
+                    time.sleep(0.05)
+            report = client.post(f"{url}/startup_report", json={}).json()
+    finally:
+        process.terminate()
+        process.wait()
+    return {"ready_s": ready, "first_prediction_s": first_prediction, "startup_report": report}
+
+
+def main() -> None:
+    args = parse_args()
+    results = {}
+    for backend in args.backends:
+        runs = [cold_start(backend, args.port, args.timeout, args.server_log)
+                for _ in range(args.repeats)]
+        results[backend] = {
+            "ready_s": statistics.median(run["ready_s"] for run in runs),
+            "first_prediction_s": statistics.median(run["first_prediction_s"] for run in runs),
+            "runs": runs,
+        }
+        print(f"{backend:12s} ready {results[backend]['ready_s']:.2f}s  "
+              f"first prediction {results[backend]['first_prediction_s']:.2f}s")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare training steps/sec of ``DataLoader`` and ``TensorBatchLoader``.
+
+Each configuration runs a full epoch of forward/backward/optimizer steps of
+``FootTrafficModel`` over an in-memory ``TensorDataset``::
+
+    python benchmarks/bench_dataloader.py --rows 200000 --batch-size 256
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, TensorDataset
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from models.lightning.datamodule import TensorBatchLoader  # noqa: E402
+from models.lightning.model import FootTrafficModel  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark batch loading for training")
+    parser.add_argument("--rows", type=int, default=200_000, help="Number of training rows")
+    parser.add_argument("--input-dim", type=int, default=10, help="Feature dimension")
+    parser.add_argument("--batch-size", type=int, default=256, help="Batch size")
+    parser.add_argument("--epochs", type=int, default=2, help="Timed epochs per loader")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Optional path to write results as JSON")
+    return parser.parse_args()
+
+
+def run_epochs(loader, epochs: int, input_dim: int) -> float:
+    model = FootTrafficModel(input_dim=input_dim)
+    optimizer = model.configure_optimizers()
+    steps = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for x, y in loader:
+            optimizer.zero_grad()
+            loss = F.mse_loss(model(x), y)
+            loss.backward()
+            optimizer.step()
+            steps += 1
+    return steps / (time.perf_counter() - start)
+
+
+def main() -> None:
+    args = parse_args()
+    torch.manual_seed(0)
+    dataset = TensorDataset(torch.randn(args.rows, args.input_dim), torch.randn(args.rows, 1))
+
+    loaders = {
+        "DataLoader(shuffle=True)": DataLoader(dataset, batch_size=args.batch_size, shuffle=True),
+        "TensorBatchLoader(gather)": TensorBatchLoader(dataset, args.batch_size, shuffle=True),
+        "TensorBatchLoader(block)": TensorBatchLoader(dataset, args.batch_size, shuffle=True,
+                                                      shuffle_mode="block"),
+        "TensorBatchLoader(gather, prefetch)": TensorBatchLoader(dataset, args.batch_size,
+                                                                 shuffle=True, prefetch=True),
+    }
+
+    results = {}
+    baseline = None
+    for name, loader in loaders.items():
+        steps_per_sec = run_epochs(loader, args.epochs, args.input_dim)
+        baseline = baseline or steps_per_sec
+        results[name] = steps_per_sec
+        print(f"{name:<38} {steps_per_sec:>10.1f} steps/s  ({steps_per_sec / baseline:.1f}x)")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
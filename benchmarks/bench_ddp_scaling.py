@@ -0,0 +1,89 @@
+"""Measure training samples/sec of ``FootTrafficModel`` from 1 to N CPU processes.
+
+Every configuration fits the model with the trainer settings of
+``train.py --num-processes`` (gloo DDP, one dataset shard and an equal share
+of the cores per rank) on the same sharded dataset. Throughput is summed
+over the ranks and compared with the single-process run::
+
+    python benchmarks/bench_ddp_scaling.py --max-processes 8 --rows 2000000
+
+Pass ``--train-path`` to measure on a real dataset instead of random rows.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytorch_lightning as pl
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from models.lightning.datamodule import FootTrafficDataModule  # noqa: E402
+from models.lightning.distributed import trainer_kwargs  # noqa: E402
+from models.lightning.model import FootTrafficModel  # noqa: E402
+from models.lightning.sharded import write_sharded  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark CPU data-parallel training")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1,
+                        help="Largest number of training processes")
+    parser.add_argument("--train-path", type=str, default=None,
+                        help="Dataset to train on (default: random rows)")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Random training rows")
+    parser.add_argument("--input-dim", type=int, default=10, help="Feature dimension")
+    parser.add_argument("--hidden-dim", type=int, default=64, help="Hidden layer width")
+    parser.add_argument("--batch-size", type=int, default=256, help="Batch size per process")
+    parser.add_argument("--epochs", type=int, default=2,
+                        help="Epochs per run; the last one is reported")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Optional path to write results as JSON")
+    return parser.parse_args()
+
+
+def samples_per_sec(args: argparse.Namespace, train_path: str, num_processes: int) -> float:
+    datamodule = FootTrafficDataModule(train_path, batch_size=args.batch_size, fast_loader=True)
+    model = FootTrafficModel(input_dim=args.input_dim, hidden_dim=args.hidden_dim)
+    trainer = pl.Trainer(
+        max_epochs=args.epochs,
+        logger=False,
+        enable_checkpointing=False,
+        enable_progress_bar=False,
+        enable_model_summary=False,
+        limit_val_batches=0,
+        **trainer_kwargs(num_processes, "ddp" if num_processes > 1 else "auto"),
+    )
+    trainer.fit(model, datamodule=datamodule)
+    return float(trainer.callback_metrics["samples_per_sec"])
+
+
+def main() -> None:
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        train_path = args.train_path
+        if train_path is None:
+            torch.manual_seed(0)
+            train_path = os.path.join(tmp, "train_shards")
+            write_sharded(torch.randn(args.rows, args.input_dim), torch.randn(args.rows, 1),
+                          train_path)
+
+        results = {}
+        for num_processes in range(1, args.max_processes + 1):
+            results[num_processes] = samples_per_sec(args, train_path, num_processes)
+
+    baseline = results[1]
+    print(f"{'processes':>9} {'samples/s':>12} {'speedup':>8} {'efficiency':>10}")
+    for num_processes, rate in results.items():
+        speedup = rate / baseline
+        print(f"{num_processes:>9} {rate:>12.0f} {speedup:>7.2f}x {speedup / num_processes:>10.0%}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""Replay request logs against ``foot_traffic_service`` and report latency.
+
+Requests are read from a JSONL log with one request per line::
+
+    {"endpoint": "predict", "payload": {"features": [120, 2900, 18.5, 0, 0, 6, 0.0, -1.0]}}
+    {"endpoint": "forecast", "payload": {"cbd_id": "3", "horizon": 6}, "offset": 0.25}
+
+Lines without an ``endpoint`` and ``payload`` are skipped. ``offset`` (seconds
+since the start of the log) is optional and used by ``--replay-timing``. When
+no log is given, or it has no usable requests, realistic payloads are
+synthesized instead.
+
+Targets:
+
+* ``inprocess`` imports ``models.serving.service`` and awaits its API
+  functions directly with locally initialized runners (no HTTP).
+* ``http`` sends requests to ``--url``; ``--start-server`` launches
+  ``bentoml serve`` locally first and stops it afterwards.
+
+Load models:
+
+* closed loop (default): ``--concurrency`` workers each send their next
+  request as soon as the previous one completes.
+* open loop (``--rate``): requests are released on a fixed Poisson arrival
+  schedule regardless of completions, with at most ``--concurrency`` in
+  flight; latency is measured from the scheduled send time so that queueing
+  delay is not hidden (no coordinated omission).
+
+Example::
+
+    python benchmarks/bench_serving.py --requests 5000 --concurrency 32 \\
+        --output bench_results/serving.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+ENDPOINTS = ("predict", "predict_batch", "forecast")
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+Request = dict
+Send = Callable[[str, dict], Awaitable[None]]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test the foot traffic service")
+    parser.add_argument("--log", type=str, default=None,
+                        help="JSONL request log to replay (synthesized when missing or empty)")
+    parser.add_argument("--target", choices=["inprocess", "http"], default="inprocess",
+                        help="Call the service in-process or over HTTP")
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:3000",
+                        help="Service URL for --target http")
+    parser.add_argument("--start-server", action="store_true",
+                        help="Start `bentoml serve` locally for --target http")
+    parser.add_argument("--server-log", type=str, default=None,
+                        help="File receiving the output of --start-server (discarded by default)")
+    parser.add_argument("--requests", type=int, default=2000,
+                        help="Requests to send (the log is cycled if shorter)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Closed-loop workers, or max in-flight requests in open loop")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Open-loop arrival rate in requests/sec (closed loop when unset)")
+    parser.add_argument("--replay-timing", action="store_true",
+                        help="Open loop following the log's `offset` timestamps")
+    parser.add_argument("--warmup", type=int, default=50,
+                        help="Untimed requests sent before measuring")
+    parser.add_argument("--mix", type=str, default="predict=0.7,predict_batch=0.2,forecast=0.1",
+                        help="Endpoint mix for synthesized requests")
+    parser.add_argument("--num-cbds", type=int, default=50,
+                        help="Distinct cbd_id values in synthesized /forecast requests")
+    parser.add_argument("--max-batch", type=int, default=64,
+                        help="Largest synthesized /predict_batch size")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Optional path to write results as JSON")
+    return parser.parse_args()
+
+
+# Request logs ----------------------------------------------------------------------------
+
+def load_log(path: Optional[str]) -> List[Request]:
+    """Read replayable requests from ``path``, skipping lines that are not requests."""
+    if not path or not os.path.exists(path):
+        return []
+    requests = []
+    with open(path) as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if (isinstance(record, dict) and record.get("endpoint") in ENDPOINTS
+                    and isinstance(record.get("payload"), dict)):
+                requests.append(record)
+    return requests
+
+
+def _feature_vector(rng: np.random.Generator) -> List[float]:
+    """One plausible model input in ``MODEL_COLUMNS`` order."""
+    hourly = float(rng.poisson(rng.choice([40, 150, 600])))
+    angle = 2 * np.pi * rng.integers(0, 24) / 24
+    return [
+        hourly,                                               # rolling_1h_count
+        float(hourly * 24 * rng.uniform(0.6, 1.4)),           # rolling_24h_count
+        float(np.round(rng.normal(21.0, 5.0), 1)),            # temp_lag_1h
+        float(rng.choice([0, 0, 0, rng.integers(100, 40_000)])),  # event_attendance
+        float(rng.random() < 0.05),                           # is_holiday
+        float(rng.integers(1, 25)),                           # horizon
+        float(np.sin(angle)),                                 # target_hour_sin
+        float(np.cos(angle)),                                 # target_hour_cos
+    ]
+
+
+def synthesize_requests(count: int, mix: Dict[str, float], num_cbds: int = 50,
+                        max_batch: int = 64, seed: int = 0) -> List[Request]:
+    """Generate ``count`` requests with the endpoint proportions in ``mix``."""
+    rng = np.random.default_rng(seed)
+    endpoints = list(mix)
+    weights = np.array([mix[name] for name in endpoints], dtype=float)
+    chosen = rng.choice(endpoints, size=count, p=weights / weights.sum())
+
+    requests = []
+    for endpoint in chosen:
+        if endpoint == "predict":
+            payload = {"features": _feature_vector(rng)}
+        elif endpoint == "predict_batch":
+            size = int(rng.integers(1, max_batch + 1))
+            payload = {"features": [_feature_vector(rng) for _ in range(size)]}
+        else:
+            payload = {"cbd_id": str(rng.integers(num_cbds)), "horizon": int(rng.integers(1, 25))}
+        requests.append({"endpoint": str(endpoint), "payload": payload})
+    return requests
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in --mix: {name!r}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# Targets ---------------------------------------------------------------------------------
+
+def inprocess_sender() -> Send:
+    """Call the service's API functions directly with local runners."""
+    from models.serving import service
+
+    for runner in service.svc.runners:
+        runner.init_local(quiet=True)
+    handlers = {
+        "predict": (service.predict, service.TrafficRequest),
+        "predict_batch": (service.predict_batch, service.TrafficBatchRequest),
+        "forecast": (service.forecast, service.ForecastRequest),
+    }
+
+    async def send(endpoint: str, payload: dict) -> None:
+        handler, model = handlers[endpoint]
+        await handler(model(**payload))
+
+    return send
+
+
+def http_sender(url: str, client) -> Send:
+    async def send(endpoint: str, payload: dict) -> None:
+        response = await client.post(f"{url.rstrip('/')}/{endpoint}", json=payload)
+        response.raise_for_status()
+
+    return send
+
+
+def start_server(url: str, log_path: Optional[str] = None) -> subprocess.Popen:
+    """Start ``bentoml serve`` for the service and wait until it is ready."""
+    import httpx
+
+    port = url.rsplit(":", 1)[-1].strip("/")
+    log = open(log_path, "w") if log_path else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "-m", "bentoml", "serve", "models.serving.service:svc", "--port", port],
+        cwd=ROOT, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("bentoml serve exited before becoming ready")
+        try:
+            if httpx.get(f"{url.rstrip('/')}/readyz", timeout=1.0).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("bentoml serve did not become ready within 120s")
+
+
+# Load generation -------------------------------------------------------------------------
+
+async def _timed(send: Send, request: Request, start: float, results: list) -> None:
+    try:
+        await send(request["endpoint"], request["payload"])
+        error = None
+    except Exception as exc:  # counted, not raised
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+        error = f"HTTP {status}" if status else type(exc).__name__
+    results.append((request["endpoint"], time.perf_counter() - start, error))
+
+
+async def closed_loop(send: Send, requests: List[Request], concurrency: int) -> list:
+    results: list = []
+    pending = iter(requests)
+
+    async def worker() -> None:
+        for request in pending:
+            await _timed(send, request, time.perf_counter(), results)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def open_loop(send: Send, requests: List[Request], offsets: List[float],
+                    concurrency: int) -> list:
+    """Release each request at its offset; latency counts from the scheduled time."""
+    results: list = []
+    slots = asyncio.Semaphore(concurrency)
+    origin = time.perf_counter()
+
+    async def fire(request: Request, scheduled: float) -> None:
+        async with slots:
+            await _timed(send, request, scheduled, results)
+
+    tasks = []
+    for request, offset in zip(requests, offsets):
+        delay = origin + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(request, origin + offset)))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def poisson_offsets(count: int, rate: float, seed: int = 0) -> List[float]:
+    rng = random.Random(seed)
+    offsets, now = [], 0.0
+    for _ in range(count):
+        offsets.append(now)
+        now += rng.expovariate(rate)
+    return offsets
+
+
+def replay_offsets(logged: List[Request], count: int) -> List[float]:
+    """Send offsets following the log's ``offset`` fields, cycling it to ``count`` requests.
+
+    Each repetition of the log starts one mean inter-arrival gap after the
+    last request of the previous one.
+    """
+    base = [float(r.get("offset", 0.0)) for r in logged]
+    span = max(base) + (base[-1] - base[0]) / max(len(base) - 1, 1)
+    return [base[i % len(base)] + span * (i // len(base)) for i in range(count)]
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    """Latency percentiles (ms), throughput and error rate, overall and per endpoint."""
+
+    def stats(rows: list) -> dict:
+        latencies = np.array([latency for _, latency, _ in rows]) * 1000
+        errors = sum(error is not None for _, _, error in rows)
+        summary = {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": errors / len(rows) if rows else 0.0,
+            "throughput_rps": len(rows) / elapsed if elapsed > 0 else 0.0,
+        }
+        if len(latencies):
+            summary["latency_ms"] = {
+                "mean": float(latencies.mean()),
+                **{f"p{p:g}": float(np.percentile(latencies, p)) for p in PERCENTILES},
+                "max": float(latencies.max()),
+            }
+        return summary
+
+    by_endpoint = defaultdict(list)
+    error_types: Dict[str, int] = defaultdict(int)
+    for row in results:
+        by_endpoint[row[0]].append(row)
+        if row[2] is not None:
+            error_types[row[2]] += 1
+    return {
+        **stats(results),
+        "duration_s": elapsed,
+        "error_types": dict(error_types),
+        "endpoints": {name: stats(rows) for name, rows in sorted(by_endpoint.items())},
+    }
+
+
+async def run(args: argparse.Namespace, send: Send) -> dict:
+    logged = load_log(args.log)
+    source = "log" if logged else "synthetic"
+    if not logged:
+        logged = synthesize_requests(args.requests, parse_mix(args.mix), args.num_cbds,
+                                     args.max_batch, args.seed)
+    requests = [logged[i % len(logged)] for i in range(args.requests)]
+
+    if args.warmup:
+        await closed_loop(send, requests[:args.warmup], args.concurrency)
+
+    if args.replay_timing:
+        offsets = replay_offsets(logged, len(requests))
+        mode = "open-replay"
+    elif args.rate:
+        offsets = poisson_offsets(len(requests), args.rate, args.seed)
+        mode = "open"
+    else:
+        offsets = None
+        mode = "closed"
+
+    start = time.perf_counter()
+    if offsets is None:
+        results = await closed_loop(send, requests, args.concurrency)
+    else:
+        results = await open_loop(send, requests, offsets, args.concurrency)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "config": {
+            "target": args.target,
+            "mode": mode,
+            "source": source,
+            "requests": len(requests),
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "warmup": args.warmup,
+        },
+        "results": summarize(results, elapsed),
+    }
+
+
+async def amain(args: argparse.Namespace) -> dict:
+    if args.target == "inprocess":
+        return await run(args, inprocess_sender())
+
+    import httpx
+
+    server = start_server(args.url, args.server_log) if args.start_server else None
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+            return await run(args, http_sender(args.url, client))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+def main() -> None:
+    args = parse_args()
+    report = asyncio.run(amain(args))
+
+    results = report["results"]
+    latency = results.get("latency_ms", {})
+    print(f"{report['config']['mode']} loop, {results['requests']} requests "
+          f"({report['config']['source']}), concurrency {args.concurrency}")
+    print(f"throughput {results['throughput_rps']:.1f} req/s, "
+          f"error rate {results['error_rate']:.2%}")
+    if latency:
+        print("latency ms  " + "  ".join(f"{name} {value:.2f}" for name, value in latency.items()))
+    if results["error_types"]:
+        print("errors      " + "  ".join(f"{name}: {n}" for name, n in results["error_types"].items()))
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark the vectorized rolling-window kernel against ``groupby().rolling()``.
+
+Example::
+
+    python benchmarks/bench_tecton_features.py --sizes 100000 1000000 10000000
+
+Sizes up to ``10**8`` rows are supported but need tens of GB of memory; the
+legacy implementation can be skipped for the largest sizes with
+``--skip-legacy-above``.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from dags.assets.tecton_features import window_starts, window_sum  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark rolling feature computation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**5, 10**6, 10**7],
+                        help="Row counts to benchmark")
+    parser.add_argument("--num-cbds", type=int, default=60,
+                        help="Number of distinct cbd_id values")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Timed repetitions per size (best is reported)")
+    parser.add_argument("--skip-legacy-above", type=int, default=10**7,
+                        help="Do not run the pandas implementation above this many rows")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Optional path to write results as JSON")
+    return parser.parse_args()
+
+
+def make_data(num_rows: int, num_cbds: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    span_minutes = max(num_rows // num_cbds, 1) * 15
+    offsets = np.sort(rng.integers(0, span_minutes, size=num_rows))
+    return pd.DataFrame(
+        {
+            "timestamp": pd.Timestamp("2020-01-01") + pd.to_timedelta(offsets, unit="min"),
+            "cbd_id": rng.integers(0, num_cbds, size=num_rows),
+            "count": rng.integers(0, 500, size=num_rows),
+            "attendance": rng.integers(0, 5000, size=num_rows),
+        }
+    )
+
+
+def legacy_rolling(df: pd.DataFrame) -> dict:
+    """The previous implementation: one ``groupby().rolling()`` per feature."""
+    df = df.sort_values(["cbd_id", "timestamp"])
+    grouped = df.groupby("cbd_id")
+    return {
+        "rolling_1h_count": grouped.rolling("1h", on="timestamp", closed="both")["count"].sum().to_numpy(),
+        "rolling_24h_count": grouped.rolling("24h", on="timestamp", closed="both")["count"].sum().to_numpy(),
+        "event_attendance": grouped.rolling("1D", on="timestamp", closed="both")["attendance"].sum().to_numpy(),
+    }
+
+
+def vectorized_rolling(df: pd.DataFrame) -> dict:
+    """The single-pass prefix-sum kernel used by ``compute_tecton_features``."""
+    df = df.sort_values(["cbd_id", "timestamp"])
+    codes = pd.factorize(df["cbd_id"])[0].astype(np.int64)
+    timestamps = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    hour_starts = window_starts(codes, timestamps, pd.Timedelta("1h"))
+    day_starts = window_starts(codes, timestamps, pd.Timedelta("24h"))
+    return {
+        "rolling_1h_count": window_sum(df["count"].to_numpy(), hour_starts),
+        "rolling_24h_count": window_sum(df["count"].to_numpy(), day_starts),
+        "event_attendance": window_sum(df["attendance"].to_numpy(), day_starts),
+    }
+
+
+def best_time(fn, df: pd.DataFrame, repeats: int):
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    args = parse_args()
+    results = []
+    for size in args.sizes:
+        df = make_data(size, args.num_cbds)
+        vec_time, vec_result = best_time(vectorized_rolling, df, args.repeats)
+        row = {"rows": size, "vectorized_s": vec_time, "legacy_s": None, "speedup": None}
+        if size <= args.skip_legacy_above:
+            legacy_time, legacy_result = best_time(legacy_rolling, df, args.repeats)
+            for name, expected in legacy_result.items():
+                np.testing.assert_allclose(vec_result[name], expected)
+            row.update(legacy_s=legacy_time, speedup=legacy_time / vec_time)
+        results.append(row)
+        legacy = "skipped" if row["legacy_s"] is None else f"{row['legacy_s']:.3f}s"
+        speedup = "" if row["speedup"] is None else f"  ({row['speedup']:.1f}x)"
+        print(f"{size:>12,d} rows  vectorized {vec_time:.3f}s  legacy {legacy}{speedup}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
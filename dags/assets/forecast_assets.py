@@ -0,0 +1,59 @@
+"""Batch forecasting Dagster assets."""
+
+import pandas as pd
+import torch
+from dagster import Field, Output, asset
+
+from dags.assets.instrumentation import instrumented
+from dags.assets.partitions import backfill_policy, partitions_def
+from models.serving.forecast_table import MAX_HORIZON, MODEL_COLUMNS, ForecastTable, forecast_all
+
+
+def _input_dim(model: torch.nn.Module):
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            return module.in_features
+    return None
+
+
+@asset(
+    partitions_def=partitions_def,
+    backfill_policy=backfill_policy,
+    config_schema={
+        "table_path": Field(str, default_value="feature_store/online.sqlite"),
+        "max_horizon": Field(int, default_value=MAX_HORIZON),
+    },
+)
+@instrumented
+def forecast_table(context, tecton_features: pd.DataFrame,
+                   trained_model: torch.nn.Module) -> Output[pd.DataFrame]:
+    """Forecast every CBD 1 to ``max_horizon`` hours ahead in one batch.
+
+    Uses the newest feature row of each ``cbd_id`` in the partition, runs a
+    single vectorized forward pass of ``trained_model`` over all ``cbd_id`` ×
+    horizon inputs and upserts the result into the forecast table at
+    ``table_path``, which the service reads ``/forecast`` answers from.
+    """
+
+    input_dim = _input_dim(trained_model)
+    if input_dim is not None and input_dim != len(MODEL_COLUMNS):
+        raise ValueError(
+            f"trained_model expects {input_dim} features but the model vector has "
+            f"{len(MODEL_COLUMNS)} ({', '.join(MODEL_COLUMNS)})"
+        )
+
+    config = context.op_config
+    forecasts = forecast_all(trained_model, tecton_features, max_horizon=config["max_horizon"])
+
+    table = ForecastTable(config["table_path"])
+    try:
+        table.write(forecasts)
+    finally:
+        table.close()
+
+    metadata = {
+        "cbds": int(forecasts["cbd_id"].nunique()),
+        "rows": len(forecasts),
+        "table_path": config["table_path"],
+    }
+    return Output(forecasts, metadata=metadata)
@@ -0,0 +1,131 @@
+"""Runtime metrics for Dagster assets.
+
+Wrap an asset's compute function with :func:`instrumented` (below ``@asset``)
+to add ``duration_seconds``, ``rows`` (for dataframe outputs) and
+``peak_rss_mb`` to its materialization metadata. When the
+``PROMETHEUS_PUSHGATEWAY`` environment variable names a Pushgateway
+(``host:port``) the same values are pushed there as gauges labelled by asset
+so Prometheus can alert on them::
+
+    foot_traffic_asset_duration_seconds{asset="clean_data"}
+    foot_traffic_asset_rows{asset="clean_data"}
+    foot_traffic_asset_peak_rss_bytes{asset="clean_data"}
+    foot_traffic_asset_last_success_timestamp_seconds{asset="clean_data"}
+"""
+
+import functools
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+import pandas as pd
+from dagster import Output
+
+PUSHGATEWAY_ENV = "PROMETHEUS_PUSHGATEWAY"
+PUSH_JOB = "foot_traffic_assets"
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _current_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _max_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ``ru_maxrss`` is reported in bytes on macOS and kilobytes elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakMemorySampler:
+    """Track the peak resident set size of the process while it is running.
+
+    RSS is sampled from ``/proc/self/statm`` every ``interval`` seconds on a
+    daemon thread, so the peak is specific to the sampled block rather than
+    the lifetime of the process. Where ``/proc`` is unavailable the process
+    lifetime peak (``ru_maxrss``) is reported instead.
+    """
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.peak = _current_rss_bytes() or 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "PeakMemorySampler":
+        if _current_rss_bytes() is not None:
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread is None:
+            self.peak = _max_rss_bytes()
+            return
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss_bytes() or 0)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss_bytes() or 0)
+
+
+def push_asset_metrics(asset_name: str, duration: float, rows: Optional[int],
+                       peak_rss_bytes: int, gateway: Optional[str] = None) -> bool:
+    """Push one asset run's metrics to the Pushgateway; return whether it was pushed."""
+    gateway = gateway or os.environ.get(PUSHGATEWAY_ENV)
+    if not gateway:
+        return False
+    from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+
+    registry = CollectorRegistry()
+    values = {
+        "foot_traffic_asset_duration_seconds": ("Duration of the last run", duration),
+        "foot_traffic_asset_peak_rss_bytes": ("Peak RSS during the last run", peak_rss_bytes),
+        "foot_traffic_asset_last_success_timestamp_seconds": ("End of the last run", time.time()),
+    }
+    if rows is not None:
+        values["foot_traffic_asset_rows"] = ("Rows output by the last run", rows)
+    for name, (documentation, value) in values.items():
+        Gauge(name, documentation, ["asset"], registry=registry).labels(asset=asset_name).set(value)
+    push_to_gateway(gateway, job=PUSH_JOB, registry=registry, grouping_key={"asset": asset_name})
+    return True
+
+
+def instrumented(fn: Callable) -> Callable:
+    """Record duration, output rows and peak memory of an asset compute function."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        context = args[0] if args else kwargs.get("context")
+        start = time.perf_counter()
+        with PeakMemorySampler() as memory:
+            result = fn(*args, **kwargs)
+        duration = time.perf_counter() - start
+
+        output = result if isinstance(result, Output) else Output(result)
+        rows = len(output.value) if isinstance(output.value, pd.DataFrame) else None
+        metadata = {
+            **output.metadata,
+            "duration_seconds": duration,
+            "peak_rss_mb": memory.peak / 2**20,
+        }
+        if rows is not None:
+            metadata["rows"] = rows
+
+        try:
+            push_asset_metrics(fn.__name__, duration, rows, memory.peak)
+        except Exception as exc:  # metrics must never fail the asset
+            if context is not None:
+                context.log.warning(f"Could not push metrics for {fn.__name__}: {exc}")
+        return output.with_metadata(metadata)
+
+    return wrapper
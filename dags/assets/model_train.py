@@ -4,9 +4,12 @@ from dagster import Output, asset
 import bentoml
 import torch
 
+from dags.assets.instrumentation import instrumented
+
 
 @asset(required_resource_keys={"bentoml_model_tag"})
-def trained_model(context) -> torch.nn.Module:
+@instrumented
+def trained_model(context) -> Output[torch.nn.Module]:
     """Load the BentoML-registered PyTorch model.
 
     The model is trained separately in ``train.py`` and saved to BentoML's model
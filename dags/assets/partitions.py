@@ -0,0 +1,60 @@
+"""Time partitioning shared by the pipeline's assets.
+
+``raw_data``, ``clean_data`` and ``tecton_features`` are partitioned on the
+observation ``timestamp``. The granularity is chosen with the
+``FOOT_TRAFFIC_PARTITIONS`` environment variable (``daily`` or ``hourly``) and
+the first partition with ``FOOT_TRAFFIC_PARTITION_START`` (``YYYY-MM-DD``).
+"""
+
+import math
+import os
+
+import pandas as pd
+from dagster import (
+    BackfillPolicy,
+    DailyPartitionsDefinition,
+    HourlyPartitionsDefinition,
+    TimeWindow,
+    TimeWindowPartitionMapping,
+)
+
+PARTITION_GRANULARITY = os.environ.get("FOOT_TRAFFIC_PARTITIONS", "daily")
+PARTITION_START = os.environ.get("FOOT_TRAFFIC_PARTITION_START", "2024-01-01")
+
+if PARTITION_GRANULARITY == "hourly":
+    partitions_def = HourlyPartitionsDefinition(start_date=f"{PARTITION_START}-00:00")
+    PARTITION_LENGTH = pd.Timedelta("1h")
+elif PARTITION_GRANULARITY == "daily":
+    partitions_def = DailyPartitionsDefinition(start_date=PARTITION_START)
+    PARTITION_LENGTH = pd.Timedelta("1D")
+else:
+    raise ValueError(
+        f"FOOT_TRAFFIC_PARTITIONS must be 'daily' or 'hourly', got '{PARTITION_GRANULARITY}'"
+    )
+
+# Each partition is materialized in its own run so backfills fan out across
+# the run coordinator's concurrency limit instead of running serially.
+backfill_policy = BackfillPolicy.multi_run(max_partitions_per_run=1)
+
+
+def lookback_mapping(lookback: pd.Timedelta) -> TimeWindowPartitionMapping:
+    """Map a partition to itself plus the upstream partitions covering ``lookback``."""
+    return TimeWindowPartitionMapping(
+        start_offset=-math.ceil(lookback / PARTITION_LENGTH),
+        allow_nonexistent_upstream_partitions=True,
+    )
+
+
+def window_bounds(window: TimeWindow) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """Return a partition's ``[start, end)`` as naive UTC timestamps like the data."""
+    return (
+        pd.Timestamp(window.start).tz_convert("UTC").tz_localize(None),
+        pd.Timestamp(window.end).tz_convert("UTC").tz_localize(None),
+    )
+
+
+def filter_to_window(df: pd.DataFrame, window: TimeWindow, column: str = "timestamp") -> pd.DataFrame:
+    """Keep the rows of ``df`` whose ``column`` falls inside ``window``."""
+    start, end = window_bounds(window)
+    timestamps = pd.to_datetime(df[column], errors="coerce")
+    return df[(timestamps >= start) & (timestamps < end)].reset_index(drop=True)
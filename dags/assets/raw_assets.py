@@ -1,24 +1,249 @@
 """Dagster assets for ingesting raw data from Airbyte output."""
 
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterator, List, Optional
 
 import pandas as pd
-from dagster import ConfigurableResource, asset
+import pyarrow.parquet as pq
+from dagster import AssetExecutionContext, ConfigurableResource, Output, TimeWindow, asset
+
+from dags.assets.instrumentation import instrumented
+from dags.assets.partitions import backfill_policy, filter_to_window, partitions_def, window_bounds
+
+SUPPORTED_SUFFIXES = {".json", ".csv"}
 
 
 class AirbyteOutput(ConfigurableResource):
-    """Location of Airbyte's extracted data."""
+    """Location of Airbyte's extracted data.
+
+    ``cache_path`` holds a manifest of every parsed file together with a
+    Parquet copy of its contents, so unchanged files are not parsed again.
+    ``max_workers`` bounds the thread pool used to parse new files.
+    Unreferenced cache files are deleted once older than
+    ``cache_grace_seconds``, which should exceed the longest run.
+    """
 
     base_path: str = "airbyte/output"
+    cache_path: str = "airbyte/cache"
+    max_workers: int = 4
+    cache_grace_seconds: float = 3600.0
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _parse_file(path: Path) -> pd.DataFrame:
+    if path.suffix == ".json":
+        return pd.read_json(path)
+    return pd.read_csv(path)
+
+
+def _timestamp_range(frame: pd.DataFrame) -> tuple[Optional[str], Optional[str]]:
+    """Return the first and last ``timestamp`` of ``frame`` as ISO strings, if any."""
+    if "timestamp" not in frame.columns:
+        return None, None
+    # Parsed like ``filter_to_window`` parses them.
+    timestamps = pd.to_datetime(frame["timestamp"], errors="coerce")
+    if not timestamps.notna().any():
+        return None, None
+    return timestamps.min().isoformat(), timestamps.max().isoformat()
+
+
+class IngestionManifest:
+    """Record of parsed Airbyte files keyed by file name.
+
+    Each entry stores the file's ``size``, ``mtime`` and ``sha256``, the
+    name of its cached Parquet copy (``None`` when the frame could not be
+    stored as Parquet) and the ``min_timestamp``/``max_timestamp`` of its
+    rows, so partition runs only load the files overlapping their window. A
+    file whose size and mtime are unchanged is trusted without hashing;
+    otherwise its hash decides whether it is re-parsed.
+
+    Backfills materialize partitions in concurrent runs that share the
+    manifest. Reads are lock-free because the manifest is replaced
+    atomically. Changes are made inside :meth:`update`, which holds an
+    exclusive file lock and re-reads the latest manifest first, so runs never
+    lose each other's entries. Cache files are named by content hash and never
+    rewritten. A cache that no entry references any more is only deleted once
+    it is older than ``grace_seconds``, so a concurrent run that still has it
+    in its snapshot can finish reading it.
+    """
+
+    def __init__(self, cache_dir: Path, grace_seconds: float = 3600.0) -> None:
+        self.cache_dir = cache_dir
+        self.path = cache_dir / "manifest.json"
+        self.grace_seconds = grace_seconds
+        self.entries: Dict[str, dict] = self._read()
+        self._refreshed: Dict[str, dict] = {}
+
+    def _read(self) -> Dict[str, dict]:
+        if self.path.exists():
+            return json.loads(self.path.read_text())
+        return {}
+
+    def is_current(self, file: Path, stat_size: int, stat_mtime: float) -> bool:
+        entry = self.entries.get(file.name)
+        if entry is None or entry["cache"] is None:
+            return False
+        if not (self.cache_dir / entry["cache"]).exists():
+            return False
+        if entry["size"] == stat_size and entry["mtime"] == stat_mtime:
+            return True
+        if entry["size"] == stat_size and entry["sha256"] == _file_digest(file):
+            # Touched but unchanged: refresh the mtime so the hash is skipped next time.
+            entry["mtime"] = stat_mtime
+            self._refreshed[file.name] = entry
+            return True
+        return False
+
+    def load(self, file: Path) -> pd.DataFrame:
+        return pd.read_parquet(self.cache_dir / self.entries[file.name]["cache"])
+
+    def iter_chunks(self, file: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Yield the rows of ``file`` in chunks of at most ``chunk_size``.
+
+        Rows are streamed from the Parquet cache; a file without one is parsed.
+        """
+        cache = self.entries[file.name]["cache"]
+        if cache is None:
+            frame = _parse_file(file)
+            for start in range(0, len(frame), chunk_size):
+                yield frame.iloc[start:start + chunk_size]
+            return
+        for batch in pq.ParquetFile(self.cache_dir / cache).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+    def store(self, file: Path, frame: pd.DataFrame) -> dict:
+        """Write the Parquet cache of ``file`` and return its manifest entry.
 
+        The entry only takes effect once passed to :meth:`record`.
+        """
+        stat = file.stat()
+        digest = _file_digest(file)
+        cache_name: Optional[str] = f"{file.name}.{digest[:16]}.parquet"
+        try:
+            frame.to_parquet(self.cache_dir / cache_name, index=False)
+        except Exception:  # pragma: no cover - e.g. mixed-type object columns
+            cache_name = None
+        min_timestamp, max_timestamp = _timestamp_range(frame)
+        return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest, "cache": cache_name,
+                "min_timestamp": min_timestamp, "max_timestamp": max_timestamp}
 
-@asset
-def raw_data(airbyte_output: AirbyteOutput) -> pd.DataFrame:
+    def overlaps(self, file: Path, start: pd.Timestamp, end: pd.Timestamp) -> bool:
+        """Whether ``file`` may hold rows in ``[start, end)``.
+
+        Files without a recorded timestamp range (no parseable ``timestamp``
+        column, or entries written before ranges were recorded) always may.
+        """
+        entry = self.entries[file.name]
+        if entry.get("min_timestamp") is None or entry.get("max_timestamp") is None:
+            return True
+        return (pd.Timestamp(entry["max_timestamp"]) >= start
+                and pd.Timestamp(entry["min_timestamp"]) < end)
+
+    @contextmanager
+    def update(self) -> Iterator["IngestionManifest"]:
+        """Lock the manifest, reload it, and save it atomically on exit."""
+        with open(self.cache_dir / "manifest.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.entries = self._read()
+                for name, refreshed in self._refreshed.items():
+                    entry = self.entries.get(name)
+                    if entry is not None and entry["sha256"] == refreshed["sha256"]:
+                        entry["mtime"] = refreshed["mtime"]
+                self._refreshed = {}
+                yield self
+                self._save()
+                self._collect_garbage()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def record(self, name: str, entry: dict) -> None:
+        self.entries[name] = entry
+
+    def prune(self, keep: List[str]) -> None:
+        for name in set(self.entries) - set(keep):
+            del self.entries[name]
+
+    def _save(self) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".manifest-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as fh:
+                json.dump(self.entries, fh, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _collect_garbage(self) -> None:
+        referenced = {entry["cache"] for entry in self.entries.values() if entry["cache"]}
+        cutoff = time.time() - self.grace_seconds
+        for cache in self.cache_dir.glob("*.parquet"):
+            if cache.name in referenced:
+                continue
+            try:
+                if cache.stat().st_mtime < cutoff:
+                    cache.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _select_files(manifest: IngestionManifest, files: List[Path],
+                  window: Optional[TimeWindow]) -> List[Path]:
+    """Return the ``files`` that may hold rows inside ``window`` (all without one).
+
+    With no overlapping file the first is still selected, for its columns.
+    """
+    if window is None:
+        return files
+    start, end = window_bounds(window)
+    return [file for file in files if manifest.overlaps(file, start, end)] or files[:1]
+
+
+def iter_raw_chunks(airbyte_output: AirbyteOutput, window: Optional[TimeWindow] = None,
+                    chunk_size: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """Yield the ingested rows inside ``window`` in chunks of at most ``chunk_size``.
+
+    Reads the files ``raw_data`` recorded in the ingestion manifest from their
+    Parquet cache, one chunk at a time, so the full input is never held in
+    memory. Chunks may be empty once filtered to ``window``.
+    """
+    cache_dir = Path(airbyte_output.cache_path)
+    manifest = IngestionManifest(cache_dir, grace_seconds=airbyte_output.cache_grace_seconds)
+    files = [Path(airbyte_output.base_path) / name for name in sorted(manifest.entries)]
+    for file in _select_files(manifest, files, window):
+        for chunk in manifest.iter_chunks(file, chunk_size):
+            if window is not None and "timestamp" in chunk.columns:
+                chunk = filter_to_window(chunk, window)
+            yield chunk
+
+
+@asset(partitions_def=partitions_def, backfill_policy=backfill_policy)
+@instrumented
+def raw_data(context: AssetExecutionContext, airbyte_output: AirbyteOutput) -> Output[pd.DataFrame]:
     """Fetch raw foot-traffic data produced by Airbyte.
 
     The asset expects Airbyte to dump JSON or CSV files into ``airbyte/output``.
     All files in that directory are concatenated into a single :class:`pandas.DataFrame`.
+    Files already recorded in the ingestion manifest are read back from their
+    Parquet cache; only new or changed files are parsed, in parallel. When
+    materializing a partition only the files whose recorded timestamp range
+    overlaps the partition's time window are loaded, and only their rows
+    inside the window are emitted.
     """
 
     output_dir = Path(airbyte_output.base_path)
@@ -27,16 +252,44 @@ def raw_data(airbyte_output: AirbyteOutput) -> pd.DataFrame:
             f"Airbyte output directory '{output_dir}' does not exist."
         )
 
-    frames: List[pd.DataFrame] = []
-    for file in sorted(output_dir.glob("*")):
-        if file.suffix == ".json":
-            frames.append(pd.read_json(file))
-        elif file.suffix == ".csv":
-            frames.append(pd.read_csv(file))
-
-    if not frames:
+    files = [f for f in sorted(output_dir.glob("*")) if f.suffix in SUPPORTED_SUFFIXES]
+    if not files:
         raise ValueError(
             f"No Airbyte output files found in '{output_dir}'. Ensure Airbyte has run."
         )
 
-    return pd.concat(frames, ignore_index=True)
+    cache_dir = Path(airbyte_output.cache_path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    manifest = IngestionManifest(cache_dir, grace_seconds=airbyte_output.cache_grace_seconds)
+
+    stale = []
+    for file in files:
+        stat = file.stat()
+        if not manifest.is_current(file, stat.st_size, stat.st_mtime):
+            stale.append(file)
+
+    with ThreadPoolExecutor(max_workers=max(airbyte_output.max_workers, 1)) as pool:
+        parsed = dict(zip(stale, pool.map(_parse_file, stale)))
+    stored = {file.name: manifest.store(file, frame) for file, frame in parsed.items()}
+    # Concurrent partition runs share the manifest; see IngestionManifest.
+    with manifest.update():
+        for name, entry in stored.items():
+            manifest.record(name, entry)
+        manifest.prune([file.name for file in files])
+
+    window = context.partition_time_window if context.has_partition_key else None
+    selected = _select_files(manifest, files, window)
+
+    frames = [parsed[file] if file in parsed else manifest.load(file) for file in selected]
+    df = pd.concat(frames, ignore_index=True)
+    if context.has_partition_key and "timestamp" in df.columns:
+        df = filter_to_window(df, context.partition_time_window)
+
+    metadata = {
+        "files_total": len(files),
+        "files_parsed": len(parsed),
+        "files_cached": len(files) - len(parsed),
+        "files_loaded": len(selected),
+        "rows": len(df),
+    }
+    return Output(df, metadata=metadata)
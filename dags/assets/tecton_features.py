@@ -2,59 +2,250 @@
 
 from __future__ import annotations
 
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
-from dagster import ConfigurableResource, asset
+from dagster import AssetIn, ConfigurableResource, Field, Output, asset
 from pydantic import PrivateAttr
 
+from dags.assets.instrumentation import instrumented
+from dags.assets.partitions import backfill_policy, lookback_mapping, partitions_def, window_bounds
+from features.calendar import holiday_flags
+
 try:  # pragma: no cover - optional dependency
     from tecton import TectonClient as _TectonSDKClient
 except Exception:  # pragma: no cover - the SDK is not required for tests
     _TectonSDKClient = None  # type: ignore
 
 
+def split_chunks(
+    features: pd.DataFrame, chunk_rows: int, chunk_bytes: int | None = None
+) -> list[pd.DataFrame]:
+    """Split ``features`` into consecutive row slices for pushing.
+
+    Each chunk holds at most ``chunk_rows`` rows and, when ``chunk_bytes`` is
+    given, roughly at most ``chunk_bytes`` of in-memory data based on the
+    frame's average row size. Chunks are ``iloc`` slices, not copies.
+    """
+
+    rows = max(chunk_rows, 1)
+    if chunk_bytes and len(features):
+        row_bytes = features.memory_usage(deep=True, index=False).sum() / len(features)
+        rows = max(1, min(rows, int(chunk_bytes // max(row_bytes, 1))))
+    return [features.iloc[start:start + rows] for start in range(0, len(features), rows)]
+
+
 class TectonClient(ConfigurableResource):
     """Thin wrapper around the Tecton SDK.
 
-    The resource attempts to use Tecton's Python SDK when available.  When the
-    SDK is missing (such as in unit tests or offline environments) the
-    ``push_features`` method stores the dataframe on ``last_pushed`` for
-    inspection.  This provides a documented mock interface that mimics the
-    side–effects of sending data to Tecton without requiring external
-    connectivity.
+    The resource attempts to use Tecton's Python SDK when available, creating
+    a single SDK client per resource instance and reusing its connection for
+    every push.  Frames are split into chunks of at most ``chunk_rows`` rows
+    (and about ``chunk_bytes`` bytes, when set) that are sent concurrently by
+    up to ``max_workers`` threads; a failing chunk is retried up to
+    ``max_retries`` times with exponential backoff starting at
+    ``backoff_seconds``.
+
+    When the SDK is missing (such as in unit tests or offline environments)
+    the ``push_features`` method keeps a reference to the dataframe on
+    ``last_pushed``, records every chunk on ``pushed_chunks`` and, when
+    ``online_store_path`` is set, upserts the chunks into the embedded SQLite
+    online store at that path (see :mod:`features.online_store`), which the
+    serving layer can read from.  This provides a documented mock interface
+    that mimics the side–effects of sending data to Tecton without requiring
+    external connectivity.
     """
 
     api_key: str | None = None
     workspace: str | None = None
+    online_store_path: str | None = None
+    chunk_rows: int = 50_000
+    chunk_bytes: int | None = None
+    max_workers: int = 4
+    max_retries: int = 3
+    backoff_seconds: float = 0.5
     _last_pushed: pd.DataFrame | None = PrivateAttr(default=None)
+    _pushed_chunks: dict = PrivateAttr(default_factory=dict)
+    _last_push_stats: dict | None = PrivateAttr(default=None)
+    _client: object | None = PrivateAttr(default=None)
+    _store: object | None = PrivateAttr(default=None)
+    _lock: object = PrivateAttr(default_factory=threading.Lock)
 
     @property
     def last_pushed(self) -> pd.DataFrame | None:
         """Return the most recently pushed features when using the mock interface."""
         return self._last_pushed
 
-    def push_features(self, features: pd.DataFrame) -> None:  # pragma: no cover - side effect
+    @property
+    def pushed_chunks(self) -> list[pd.DataFrame]:
+        """Chunks of the most recent push, in frame order, when using the mock interface."""
+        return [self._pushed_chunks[index] for index in sorted(self._pushed_chunks)]
+
+    @property
+    def last_push_stats(self) -> dict | None:
+        """Throughput and latency statistics of the most recent push."""
+        return self._last_push_stats
+
+    def push_features(self, features: pd.DataFrame) -> dict:
         """Push a features dataframe to Tecton or store it locally.
 
         Parameters
         ----------
         features:
-            The features to push.  When the Tecton SDK is available this method
-            forwards the call to ``tecton.TectonClient.push_features``.  When the
-            SDK is not installed the dataframe is saved to ``self.last_pushed``
-            for later inspection.
+            The features to push.  When the Tecton SDK is available each chunk
+            is forwarded to ``tecton.TectonClient.push_features``.  When the
+            SDK is not installed the dataframe is referenced by
+            ``self.last_pushed``, its chunks are recorded and written to the
+            local online store if one is configured.
+
+        Returns
+        -------
+        dict
+            Push statistics (rows, chunks, bytes, retries, wall time, rows per
+            second and chunk latency percentiles), also kept on
+            ``last_push_stats``.
         """
 
+        chunks = split_chunks(features, self.chunk_rows, self.chunk_bytes)
+        self._last_pushed = features
+        self._pushed_chunks = {}
+
+        start = time.perf_counter()
+        if len(chunks) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+                results = list(pool.map(self._push_chunk, range(len(chunks)), chunks))
+        else:
+            results = [self._push_chunk(index, chunk) for index, chunk in enumerate(chunks)]
+        elapsed = time.perf_counter() - start
+
+        latencies = np.array([latency for latency, _ in results]) * 1000
+        stats = {
+            "rows": len(features),
+            "chunks": len(chunks),
+            "bytes": int(features.memory_usage(deep=True, index=False).sum()),
+            "retries": sum(retries for _, retries in results),
+            "seconds": elapsed,
+            "rows_per_second": len(features) / elapsed if elapsed > 0 else 0.0,
+            "chunk_latency_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "chunk_latency_p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+            "chunk_latency_max_ms": float(latencies.max()) if len(latencies) else 0.0,
+        }
+        self._last_push_stats = stats
+        return stats
+
+    def _push_chunk(self, index: int, chunk: pd.DataFrame) -> tuple[float, int]:
+        """Send one chunk with retries; return its latency in seconds and retry count."""
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                self._send_chunk(index, chunk)
+                return time.perf_counter() - start, attempt
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff_seconds * 2**attempt)
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def _send_chunk(self, index: int, chunk: pd.DataFrame) -> None:  # pragma: no cover - side effect
         if _TectonSDKClient is not None:
-            client = _TectonSDKClient(api_key=self.api_key, workspace=self.workspace)
-            client.push_features(features)
-        else:  # pragma: no cover - simple mock behaviour
-            # Store the dataframe so tests can assert on its contents.
-            self._last_pushed = features.copy()
+            self._sdk_client().push_features(chunk)
+            return
+        # Simple mock behaviour: record the chunk so tests can check ordering
+        # and completeness, and write it to the local online store.
+        self._pushed_chunks[index] = chunk
+        if self.online_store_path:
+            self._online_store().upsert(chunk)
+
+    def _sdk_client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = _TectonSDKClient(api_key=self.api_key, workspace=self.workspace)
+            return self._client
+
+    def _online_store(self):
+        with self._lock:
+            if self._store is None:
+                from features.online_store import SQLiteOnlineStore
+
+                self._store = SQLiteOnlineStore(self.online_store_path)
+            return self._store
+
+
+# Input columns needed to compute the features and the longest window any
+# feature looks back over (``rolling_24h_count`` and ``event_attendance``).
+INPUT_COLUMNS = ["cbd_id", "timestamp", "count", "temperature", "attendance"]
+MAX_LOOKBACK = pd.Timedelta("24h")
+
+
+def _empty_inputs() -> pd.DataFrame:
+    return pd.DataFrame(columns=INPUT_COLUMNS)
+
 
+@dataclass
+class FeatureWindowState:
+    """Per-CBD rolling window state carried between incremental runs.
 
-def compute_tecton_features(clean_data: pd.DataFrame, tecton: TectonClient) -> pd.DataFrame:
+    ``tail`` holds, for every ``cbd_id``, the input rows falling inside
+    :data:`MAX_LOOKBACK` of that CBD's latest observation. This is all the
+    history needed to extend the rolling sums and the temperature lag to newer
+    rows, so state size is bounded by the window length rather than by the
+    length of the full history. The latest timestamp per CBD acts as the
+    watermark: only rows strictly newer than it are processed.
+    """
+
+    tail: pd.DataFrame = field(default_factory=_empty_inputs)
+
+    @property
+    def watermarks(self) -> pd.Series:
+        """Latest processed timestamp for each ``cbd_id``."""
+        return self.tail.groupby("cbd_id")["timestamp"].max()
+
+    @classmethod
+    def load(cls, path: str | Path) -> FeatureWindowState:
+        """Load state saved with :meth:`save`, or start empty if ``path`` is missing."""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        return cls(tail=pd.read_parquet(path))
+
+    def save(self, path: str | Path) -> None:
+        """Persist the window state to a Parquet file at ``path``."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.tail.to_parquet(path, index=False)
+
+
+def compute_tecton_features(
+    clean_data: pd.DataFrame,
+    tecton: TectonClient,
+    state: FeatureWindowState | None = None,
+    num_workers: int = 1,
+    since: pd.Timestamp | None = None,
+    executor: str = "processes",
+) -> pd.DataFrame:
     """Generate and push features derived from the cleaned data.
 
+    When ``since`` is given, rows before it are only used as window history:
+    features are emitted and pushed for rows at or after ``since``.
+
+    When ``state`` is provided the features are computed incrementally: only
+    rows newer than each CBD's watermark are featurized, using the retained
+    window tail as history, and ``state`` is updated in place. The emitted
+    rows and columns match those a full recompute produces for the same rows.
+
+    With ``num_workers`` greater than one the rows are hash-partitioned by
+    ``cbd_id`` and each shard is featurized in its own process (see
+    :func:`build_features_sharded`). With ``executor="ray"`` the shards run
+    as Ray tasks instead (see :func:`build_features_ray`). The result is
+    identical to the single-process computation.
+
     The input ``clean_data`` is expected to contain the following columns:
 
     ``timestamp``
@@ -69,63 +260,273 @@ def compute_tecton_features(clean_data: pd.DataFrame, tecton: TectonClient) -> p
         Attendance for any events occurring at the timestamp.
     """
 
-    df = clean_data.copy().sort_values(["cbd_id", "timestamp"])  # ensure ordering
+    if state is None:
+        features = _featurize(clean_data, num_workers, executor)
+        if since is not None:
+            features = features[features["timestamp"] >= since]
+    else:
+        features = _update_features(clean_data, state, num_workers, executor)
+    tecton.push_features(features)
+    return features
+
+
+EXECUTORS = ("processes", "ray")
+
+
+def _featurize(clean_data: pd.DataFrame, num_workers: int, executor: str = "processes") -> pd.DataFrame:
+    if executor not in EXECUTORS:
+        raise ValueError(f"executor must be one of {EXECUTORS}, got {executor!r}")
+    if num_workers > 1:
+        if executor == "ray":
+            return build_features_ray(clean_data, num_workers)
+        return build_features_sharded(clean_data, num_workers)
+    return _build_features(clean_data)
+
+
+def _update_features(
+    clean_data: pd.DataFrame,
+    state: FeatureWindowState,
+    num_workers: int = 1,
+    executor: str = "processes",
+) -> pd.DataFrame:
+    """Featurize rows past the watermark in ``state`` and advance the state."""
+    new = clean_data[INPUT_COLUMNS]
+    if not state.tail.empty:
+        watermarks = new["cbd_id"].map(state.watermarks)
+        new = new[watermarks.isna() | (new["timestamp"] > watermarks)]
+        combined = pd.concat(
+            [state.tail.assign(_is_new=False), new.assign(_is_new=True)],
+            ignore_index=True,
+        )
+    else:
+        combined = new.assign(_is_new=True)
+    combined = combined.sort_values(["cbd_id", "timestamp"]).reset_index(drop=True)
+
+    features = _featurize(combined, num_workers, executor)[combined["_is_new"]].reset_index(drop=True)
+
+    latest = combined.groupby("cbd_id")["timestamp"].transform("max")
+    state.tail = combined.loc[
+        combined["timestamp"] >= latest - MAX_LOOKBACK, INPUT_COLUMNS
+    ].reset_index(drop=True)
+    return features
+
+
+def window_starts(codes: np.ndarray, timestamps: np.ndarray, window: pd.Timedelta) -> np.ndarray:
+    """Return the first row of each row's trailing time window.
+
+    ``codes`` and ``timestamps`` (``int64`` nanoseconds) must be sorted by group
+    and then by time. For every row ``i`` the result is the smallest ``j`` in
+    the same group with ``timestamps[j] >= timestamps[i] - window``, matching
+    pandas' ``rolling(window, closed="both")`` bounds.
+
+    Because the rows are already sorted by group and time, the key
+    ``group_rank * stride + (timestamp - first_timestamp)`` is monotone, and
+    a ``stride`` larger than the time span plus the window keeps every
+    lookup inside its own group. All rows are then resolved with a single
+    ``searchsorted`` call. Groups are only split into blocks if the keys
+    would overflow ``int64``, which needs centuries of data.
+    """
+
+    starts = np.empty(len(timestamps), dtype=np.int64)
+    if not len(timestamps):
+        return starts
+    ranks = np.concatenate(([0], np.cumsum(codes[1:] != codes[:-1])))
+    offsets = timestamps - timestamps.min()
+    stride = int(offsets.max()) + window.value + 1
+    groups_per_call = max(1, np.iinfo(np.int64).max // stride)
+    for first in range(0, int(ranks[-1]) + 1, groups_per_call):
+        lo, hi = np.searchsorted(ranks, [first, first + groups_per_call])
+        keys = (ranks[lo:hi] - first) * stride + offsets[lo:hi]
+        starts[lo:hi] = lo + np.searchsorted(keys, keys - window.value)
+    return starts
+
+
+def window_sum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Sum ``values[starts[i]:i + 1]`` for every row using prefix sums.
+
+    Missing values are skipped and a window without any observation is
+    ``NaN``, as in ``pandas.core.window.Rolling.sum``.
+    """
+
+    values = np.asarray(values)
+    if values.dtype.kind in "iub":
+        prefix = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+        return (prefix[1:] - prefix[starts]).astype(np.float64)
+
+    values = values.astype(np.float64)
+    observed = ~np.isnan(values)
+    prefix = np.concatenate(([0.0], np.cumsum(np.where(observed, values, 0.0))))
+    seen = np.concatenate(([0], np.cumsum(observed)))
+    sums = prefix[1:] - prefix[starts]
+    return np.where(seen[1:] - seen[starts] > 0, sums, np.nan)
+
+
+def _build_features(clean_data: pd.DataFrame) -> pd.DataFrame:
+    """Compute the feature columns for every row of ``clean_data``."""
+
+    df = clean_data.sort_values(["cbd_id", "timestamp"])  # ensure ordering
+
+    codes = pd.factorize(df["cbd_id"])[0].astype(np.int64)
+    timestamps = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    hour_starts = window_starts(codes, timestamps, pd.Timedelta("1h"))
+    day_starts = window_starts(codes, timestamps, pd.Timedelta("24h"))
+
+    features = df[["cbd_id", "timestamp"]].copy()
 
     # Rolling counts of foot traffic.
-    df["rolling_1h_count"] = (
-        df.groupby("cbd_id")
-        .rolling("1h", on="timestamp", closed="both")["count"]
-        .sum()
-        .reset_index(level=0, drop=True)
-        .reset_index(drop=True)
-    )
-    df["rolling_24h_count"] = (
-        df.groupby("cbd_id")
-        .rolling("24h", on="timestamp", closed="both")["count"]
-        .sum()
-        .reset_index(level=0, drop=True)
-        .reset_index(drop=True)
-    )
+    count = df["count"].to_numpy()
+    features["rolling_1h_count"] = window_sum(count, hour_starts)
+    features["rolling_24h_count"] = window_sum(count, day_starts)
 
     # One hour lag of temperature readings.
-    df["temp_lag_1h"] = df.groupby("cbd_id")["temperature"].shift(1)
+    group_start = np.ones(len(df), dtype=bool)
+    group_start[1:] = codes[1:] != codes[:-1]
+    lag = np.empty(len(df), dtype=np.float64)
+    lag[1:] = df["temperature"].to_numpy(dtype=np.float64)[:-1]
+    lag[group_start] = np.nan
+    features["temp_lag_1h"] = lag
 
     # Aggregate event attendance over the previous day.
-    df["event_attendance"] = (
-        df.groupby("cbd_id")
-        .rolling("1D", on="timestamp", closed="both")["attendance"]
-        .sum()
-        .reset_index(level=0, drop=True)
-        .reset_index(drop=True)
-    )
+    features["event_attendance"] = window_sum(df["attendance"].to_numpy(), day_starts)
 
     # Public holiday flag.
-    try:  # pragma: no cover - optional dependency
-        import holidays
-
-        us_holidays = holidays.US()
-        df["is_holiday"] = df["timestamp"].dt.date.isin(us_holidays)
-    except Exception:  # pragma: no cover - fallback when library unavailable
-        # Fall back to marking weekends as holidays when the package is missing.
-        df["is_holiday"] = df["timestamp"].dt.dayofweek >= 5
-
-    feature_cols = [
-        "cbd_id",
-        "timestamp",
-        "rolling_1h_count",
-        "rolling_24h_count",
-        "temp_lag_1h",
-        "event_attendance",
-        "is_holiday",
-    ]
-
-    features = df[feature_cols]
-    tecton.push_features(features)
+    features["is_holiday"] = holiday_flags(df["timestamp"])
+
     return features
 
 
-@asset
-def tecton_features(clean_data: pd.DataFrame, tecton: TectonClient) -> pd.DataFrame:
-    """Dagster asset wrapper around :func:`compute_tecton_features`."""
+# Shards are exchanged through tmpfs so that memory-mapped Arrow files are
+# backed by shared memory pages rather than disk.
+_SHARED_MEMORY_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def _write_arrow(frame: pd.DataFrame, path: str) -> None:
+    """Write ``frame`` (with its index) to ``path`` as an Arrow IPC file."""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(frame, preserve_index=True)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_arrow(path: str) -> pd.DataFrame:
+    """Memory-map an Arrow IPC file written by :func:`_write_arrow`."""
+    import pyarrow as pa
+
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+
+def _featurize_shard(source: str, target: str) -> str:
+    """Process-pool entry point: featurize the shard at ``source`` into ``target``."""
+    _write_arrow(_build_features(_read_arrow(source)), target)
+    return target
+
+
+def _shard_ids(clean_data: pd.DataFrame, num_workers: int) -> np.ndarray:
+    """Hash-partition rows by ``cbd_id`` so every CBD lands in a single shard."""
+    return pd.util.hash_pandas_object(clean_data["cbd_id"], index=False).to_numpy() % num_workers
+
+
+def build_features_sharded(clean_data: pd.DataFrame, num_workers: int) -> pd.DataFrame:
+    """Compute features in ``num_workers`` processes, one shard of CBDs each.
+
+    Rows are hash-partitioned by ``cbd_id`` so every CBD's history lands in a
+    single shard. Shards and results cross the process boundary as
+    memory-mapped Arrow IPC files in shared memory instead of pickled frames.
+    Results are combined in ``(cbd_id, timestamp)`` order with the original
+    index labels, matching :func:`_build_features` on the whole frame.
+    """
+
+    shard_ids = _shard_ids(clean_data, num_workers)
+    shards = [shard for shard in range(num_workers) if (shard_ids == shard).any()]
+    if len(shards) < 2:
+        return _build_features(clean_data)
+
+    with tempfile.TemporaryDirectory(prefix="tecton-features-", dir=_SHARED_MEMORY_DIR) as tmp:
+        sources, targets = [], []
+        for shard in shards:
+            sources.append(os.path.join(tmp, f"shard-{shard}.arrow"))
+            targets.append(os.path.join(tmp, f"features-{shard}.arrow"))
+            _write_arrow(clean_data[shard_ids == shard], sources[-1])
+
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(shards))) as pool:
+            outputs = list(pool.map(_featurize_shard, sources, targets))
+        features = pd.concat([_read_arrow(path) for path in outputs])
+
+    return features.sort_values(["cbd_id", "timestamp"], kind="stable")
+
+
+def build_features_ray(clean_data: pd.DataFrame, num_workers: int) -> pd.DataFrame:
+    """Compute features as ``num_workers`` Ray tasks, one shard of CBDs each.
+
+    Shards are partitioned as in :func:`build_features_sharded` and passed
+    to the tasks through the Ray object store. Ray is started locally with
+    ``num_workers`` CPUs unless it is already running or ``RAY_ADDRESS``
+    points at a cluster (see :mod:`training.ray_backend`).
+    """
+
+    from training.ray_backend import init_ray, map_tasks
+
+    shard_ids = _shard_ids(clean_data, num_workers)
+    shards = [shard for shard in range(num_workers) if (shard_ids == shard).any()]
+    if len(shards) < 2:
+        return _build_features(clean_data)
+
+    init_ray(num_cpus=num_workers)
+    outputs = map_tasks(_build_features, [(clean_data[shard_ids == shard],) for shard in shards])
+    return pd.concat(outputs).sort_values(["cbd_id", "timestamp"], kind="stable")
+
+
+@asset(
+    partitions_def=partitions_def,
+    backfill_policy=backfill_policy,
+    ins={"clean_data": AssetIn(partition_mapping=lookback_mapping(MAX_LOOKBACK))},
+    config_schema={
+        "incremental": Field(bool, default_value=False),
+        "state_path": Field(str, default_value="feature_state/window_tail.parquet"),
+        "num_workers": Field(int, default_value=1),
+        "executor": Field(str, default_value="processes"),
+    },
+)
+@instrumented
+def tecton_features(context, clean_data, tecton: TectonClient) -> Output[pd.DataFrame]:
+    """Dagster asset wrapper around :func:`compute_tecton_features`.
+
+    Each partition loads ``clean_data`` for its own window plus the preceding
+    partitions covering :data:`MAX_LOOKBACK`, which serve as rolling window
+    history; only the partition's own rows are emitted and pushed.
+
+    With ``incremental`` enabled the window state is loaded from and saved back
+    to ``state_path`` so each run only featurizes rows newer than the last one.
+    Incremental state assumes partitions are materialized in time order, so it
+    should not be combined with concurrent backfills.
+    ``num_workers`` sets how many processes share the per-CBD computation, and
+    ``executor`` whether they are local processes or Ray tasks (``"ray"``).
+    Push throughput and chunk latency statistics are reported as metadata.
+    """
+
+    if isinstance(clean_data, dict):  # several upstream partitions were loaded
+        clean_data = pd.concat(
+            [clean_data[key] for key in sorted(clean_data)], ignore_index=True
+        )
+
+    config = context.op_config
+    num_workers = config["num_workers"]
+    executor = config["executor"]
+    if not config["incremental"]:
+        since = None
+        if context.has_partition_key:
+            since, _ = window_bounds(context.partition_time_window)
+        features = compute_tecton_features(
+            clean_data, tecton, num_workers=num_workers, since=since, executor=executor
+        )
+    else:
+        state = FeatureWindowState.load(config["state_path"])
+        features = compute_tecton_features(
+            clean_data, tecton, state=state, num_workers=num_workers, executor=executor
+        )
+        state.save(config["state_path"])
 
-    return compute_tecton_features(clean_data, tecton)
+    metadata = {f"push_{key}": value for key, value in (tecton.last_push_stats or {}).items()}
+    return Output(features, metadata=metadata)
@@ -1,16 +1,21 @@
+import os
+from datetime import datetime, timezone
+
 from dagster import Definitions, ResourceDefinition, define_asset_job, load_assets_from_modules
 
-from dags.assets import clean_assets, model_train, raw_assets, tecton_features
+from dags.assets import clean_assets, forecast_assets, model_train, raw_assets, tecton_features
+from dags.assets.partitions import partitions_def
 from dags.assets.raw_assets import AirbyteOutput
 from dags.assets.tecton_features import TectonClient
 
 # Load all asset definitions from their modules
 all_assets = load_assets_from_modules(
-    [raw_assets, clean_assets, tecton_features, model_train]
+    [raw_assets, clean_assets, tecton_features, model_train, forecast_assets]
 )
 
-# Job chaining the assets together
-foot_traffic_pipeline = define_asset_job("foot_traffic_pipeline")
+# Job chaining the assets together. Each run materializes one time partition;
+# backfills launch one run per partition so they execute concurrently.
+foot_traffic_pipeline = define_asset_job("foot_traffic_pipeline", partitions_def=partitions_def)
 
 # Definitions used by Dagster to load assets, jobs and resources
 defs = Definitions(
@@ -18,10 +23,15 @@ defs = Definitions(
     jobs=[foot_traffic_pipeline],
     resources={
         "airbyte_output": AirbyteOutput(),
-        "tecton": TectonClient(),
+        # Without the Tecton SDK, pushed features land in a local SQLite online store.
+        "tecton": TectonClient(
+            online_store_path=os.environ.get("FOOT_TRAFFIC_ONLINE_STORE", "feature_store/online.sqlite")
+        ),
         "bentoml_model_tag": ResourceDefinition.hardcoded_resource("foot_traffic:latest"),
     },
 )
 
 if __name__ == "__main__":
-    foot_traffic_pipeline.execute_in_process()
+    # Materialize the most recent complete partition.
+    latest = partitions_def.get_last_partition_key(current_time=datetime.now(timezone.utc))
+    defs.get_job_def("foot_traffic_pipeline").execute_in_process(partition_key=latest)
@@ -0,0 +1,18 @@
+"""Calendar features shared by feature engineering and forecasting."""
+
+import pandas as pd
+
+
+def holiday_flags(timestamps: pd.Series) -> pd.Series:
+    """Flag public holidays among ``timestamps``.
+
+    Uses the ``holidays`` package when it is installed and falls back to
+    marking weekends as holidays otherwise.
+    """
+
+    try:  # pragma: no cover - optional dependency
+        import holidays
+
+        return timestamps.dt.date.isin(holidays.US())
+    except Exception:  # pragma: no cover - fallback when library unavailable
+        return timestamps.dt.dayofweek >= 5
@@ -0,0 +1,167 @@
+"""Embedded SQLite online feature store for local development and CI.
+
+Stands in for Tecton's online store when the SDK is not available: the
+``tecton`` Dagster resource upserts every pushed feature frame here and the
+serving layer reads the latest values back per ``cbd_id``.
+
+Each feature view in ``features/tecton/features.py`` gets two tables:
+
+``<view>``
+    Every pushed row keyed by ``(cbd_id, timestamp)``; pushing a key again
+    overwrites it. Used for point-in-time (``as_of``) lookups.
+``<view>__latest``
+    The newest row of every ``cbd_id``, keyed by ``cbd_id`` alone, so a
+    latest-value lookup is a single primary key read. Rows older than the one
+    already stored never replace it.
+
+Timestamps are stored as UTC nanoseconds since the epoch.
+"""
+
+import sqlite3
+import threading
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Feature views and the features they serve, with their ``ttl``, mirroring
+# ``features/tecton/features.py``.
+FEATURE_VIEWS: Dict[str, Tuple[List[str], timedelta]] = {
+    "foot_traffic_rolling_counts": (["rolling_1h_count", "rolling_24h_count"], timedelta(days=7)),
+    "weather_lag": (["temp_lag_1h"], timedelta(days=7)),
+    "event_attendance": (["event_attendance"], timedelta(days=30)),
+    "holiday_flag": (["is_holiday"], timedelta(days=365)),
+}
+
+# Latest observation of every feature: ``column -> (timestamp, value)``.
+FeatureRow = Dict[str, Tuple[pd.Timestamp, Optional[float]]]
+
+
+def _to_nanoseconds(timestamps: pd.Series) -> np.ndarray:
+    timestamps = pd.to_datetime(timestamps)
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+    return timestamps.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def _timestamp_nanoseconds(timestamp) -> int:
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return int(timestamp.value)
+
+
+class SQLiteOnlineStore:
+    """Online feature store backed by a single SQLite database file.
+
+    Writes go through :meth:`upsert`, which loads a whole feature frame in one
+    transaction using batched ``executemany`` statements. Reads through
+    :meth:`get_latest` return, per feature, the newest value at or before an
+    optional ``as_of`` timestamp. The connection is shared by all threads of
+    the process and serialized with a lock.
+    """
+
+    def __init__(self, path: Union[str, Path], batch_size: int = 50_000) -> None:
+        self.path = str(path)
+        self.batch_size = batch_size
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            for view, (columns, _) in FEATURE_VIEWS.items():
+                values = ", ".join(f"{column} REAL" for column in columns)
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {view} (cbd_id TEXT NOT NULL, "
+                    f"timestamp INTEGER NOT NULL, {values}, PRIMARY KEY (cbd_id, timestamp)) "
+                    "WITHOUT ROWID"
+                )
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {view}__latest (cbd_id TEXT PRIMARY KEY, "
+                    f"timestamp INTEGER NOT NULL, {values}) WITHOUT ROWID"
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def upsert(self, features: pd.DataFrame) -> int:
+        """Write every row of ``features`` and advance the latest rows; return the row count.
+
+        ``features`` needs ``cbd_id`` and ``timestamp`` columns plus the
+        feature columns of any feature view; views whose columns are absent
+        are left untouched. Missing values are stored as ``NULL``.
+        """
+
+        if features.empty:
+            return 0
+        keys = pd.DataFrame({
+            "cbd_id": features["cbd_id"].astype(str).to_numpy(),
+            "timestamp": _to_nanoseconds(features["timestamp"]),
+        })
+        # Index of the newest row of each CBD, computed once for all views.
+        latest = keys.groupby("cbd_id", sort=False)["timestamp"].idxmax().to_numpy()
+
+        with self._lock, self._conn:
+            for view, (columns, _) in FEATURE_VIEWS.items():
+                if not all(column in features.columns for column in columns):
+                    continue
+                frame = keys.assign(**{
+                    column: features[column].astype(np.float64).to_numpy() for column in columns
+                })
+                frame = frame.astype(object).where(frame.notna(), None)
+                names = ", ".join(["cbd_id", "timestamp", *columns])
+                marks = ", ".join("?" * (len(columns) + 2))
+                updates = ", ".join(f"{c} = excluded.{c}" for c in ["timestamp", *columns])
+
+                history = (f"INSERT INTO {view} ({names}) VALUES ({marks}) "
+                           f"ON CONFLICT (cbd_id, timestamp) DO UPDATE SET {updates}")
+                for start in range(0, len(frame), self.batch_size):
+                    chunk = frame.iloc[start:start + self.batch_size]
+                    self._conn.executemany(history, chunk.itertuples(index=False, name=None))
+
+                self._conn.executemany(
+                    f"INSERT INTO {view}__latest ({names}) VALUES ({marks}) "
+                    f"ON CONFLICT (cbd_id) DO UPDATE SET {updates} "
+                    f"WHERE excluded.timestamp >= {view}__latest.timestamp",
+                    frame.iloc[latest].itertuples(index=False, name=None),
+                )
+        return len(features)
+
+    def get_latest(self, cbd_id, as_of=None) -> Optional[FeatureRow]:
+        """Return the newest value of each feature for ``cbd_id`` at or before ``as_of``.
+
+        Returns ``None`` when no feature view has a row for ``cbd_id``.
+        """
+
+        row: FeatureRow = {}
+        with self._lock:
+            for view, (columns, _) in FEATURE_VIEWS.items():
+                names = ", ".join(["timestamp", *columns])
+                if as_of is None:
+                    found = self._conn.execute(
+                        f"SELECT {names} FROM {view}__latest WHERE cbd_id = ?", (str(cbd_id),)
+                    ).fetchone()
+                else:
+                    found = self._conn.execute(
+                        f"SELECT {names} FROM {view} WHERE cbd_id = ? AND timestamp <= ? "
+                        "ORDER BY timestamp DESC LIMIT 1",
+                        (str(cbd_id), _timestamp_nanoseconds(as_of)),
+                    ).fetchone()
+                if found is None:
+                    continue
+                timestamp = pd.Timestamp(found[0], unit="ns")
+                row.update({column: (timestamp, value) for column, value in zip(columns, found[1:])})
+        return row or None
+
+    def count(self, view: str, latest: bool = False) -> int:
+        """Number of rows stored for ``view`` (or of its latest table)."""
+        table = f"{view}__latest" if latest else view
+        if view not in FEATURE_VIEWS:
+            raise KeyError(f"Unknown feature view: {view}")
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
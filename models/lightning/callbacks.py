@@ -0,0 +1,79 @@
+import time
+from typing import Any
+
+import pytorch_lightning as pl
+import torch
+
+
+class OptunaPruningCallback(pl.Callback):
+    """Report a validation metric to an Optuna trial after every epoch.
+
+    When the trial's pruner decides the trial is hopeless the callback asks
+    the trainer to stop and sets ``pruned``; the objective should then raise
+    ``optuna.TrialPruned`` so the trial is recorded as pruned. Stopping the
+    trainer rather than raising from inside the fit loop lets Lightning tear
+    down cleanly.
+    """
+
+    def __init__(self, trial: Any, monitor: str = "val_loss") -> None:
+        super().__init__()
+        self.trial = trial
+        self.monitor = monitor
+        self.pruned = False
+
+    def on_validation_end(self, trainer: pl.Trainer, pl_module: pl.LightningModule) -> None:
+        if trainer.sanity_checking:
+            return
+        value = trainer.callback_metrics.get(self.monitor)
+        if value is None:
+            return
+        self.trial.report(float(value), step=trainer.current_epoch)
+        if self.trial.should_prune():
+            self.pruned = True
+            trainer.should_stop = True
+
+
+class SamplesPerSecond(pl.Callback):
+    """Log training throughput in samples per second after every epoch.
+
+    Each rank times its training batches from the start of the epoch to the
+    end of its last batch (validation is excluded), and the per-rank rates
+    are summed over all ranks. The total is logged as ``samples_per_sec``, so
+    it is also in ``trainer.callback_metrics`` of a DDP launcher process.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._samples = 0
+        self._start = 0.0
+        self._last = 0.0
+
+    def on_train_epoch_start(self, trainer: pl.Trainer, pl_module: pl.LightningModule) -> None:
+        self._samples = 0
+        self._start = self._last = time.perf_counter()
+
+    def on_train_batch_end(self, trainer: pl.Trainer, pl_module: pl.LightningModule,
+                           outputs: Any, batch: Any, batch_idx: int) -> None:
+        self._samples += len(batch[0])
+        self._last = time.perf_counter()
+
+    def on_train_epoch_end(self, trainer: pl.Trainer, pl_module: pl.LightningModule) -> None:
+        elapsed = self._last - self._start
+        rate = torch.tensor(self._samples / elapsed if elapsed > 0 else 0.0)
+        pl_module.log("samples_per_sec", rate, prog_bar=True, sync_dist=True, reduce_fx="sum")
+
+
+class ThreadsPerRank(pl.Callback):
+    """Set the intra-op thread count of every training process.
+
+    Data-parallel ranks on one machine share its cores; left alone each rank
+    would start one thread per core and the ranks would oversubscribe the
+    CPU. The count is applied in each rank before training starts.
+    """
+
+    def __init__(self, threads: int) -> None:
+        super().__init__()
+        self.threads = threads
+
+    def setup(self, trainer: pl.Trainer, pl_module: pl.LightningModule, stage: str) -> None:
+        torch.set_num_threads(self.threads)
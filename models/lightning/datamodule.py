@@ -1,60 +1,375 @@
+import bisect
+import math
 import os
-from typing import Optional
+import queue
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import torch
-from torch.utils.data import DataLoader, TensorDataset
+from torch.utils.data import DataLoader, Dataset, TensorDataset
 import pytorch_lightning as pl
 
+from models.lightning.sharded import ShardedTensorDataset, is_sharded_dataset
+
+Batch = Tuple[torch.Tensor, torch.Tensor]
+
+
+def _tensor_segments(dataset: Dataset) -> List[Batch]:
+    """Return the contiguous ``(features, targets)`` tensors backing ``dataset``."""
+    if isinstance(dataset, TensorDataset) and len(dataset.tensors) == 2:
+        return [tuple(dataset.tensors)]  # type: ignore[list-item]
+    if isinstance(dataset, ShardedTensorDataset):
+        return list(dataset.shards)
+    if isinstance(dataset, (RankShard, SlidingWindowDataset)):
+        return list(dataset.segments)
+    raise TypeError(f"TensorBatchLoader cannot read batches from {type(dataset).__name__}")
+
+
+class SlidingWindowDataset(Dataset):
+    """Lookback windows over per-CBD time series, built from strided views.
+
+    ``series`` holds one ``(features, targets)`` pair per CBD, ordered by
+    time: ``features`` is ``(length, num_features)`` and ``targets`` is
+    ``(length,)``. Sample ``i`` of a series is the ``window`` feature rows
+    starting at row ``i`` and the ``horizon`` targets that follow them::
+
+        features[i:i + window], targets[i + window:i + window + horizon]
+
+    A series yields ``length - window - horizon + 1`` samples (none if it is
+    shorter than ``window + horizon``), and no window crosses from one CBD
+    into the next. Windows are ``unfold`` views of the series tensors, so
+    memory grows with the total series length, not with length x window.
+    Rows are treated as consecutive time steps, so the series should be
+    regularly sampled.
+
+    Works with :class:`TensorBatchLoader`, which slices batches of windows
+    without copying them, and with :class:`RankShard`.
+    """
+
+    def __init__(self, series: Sequence[Tuple[torch.Tensor, torch.Tensor]], window: int,
+                 horizon: int = 1) -> None:
+        if window < 1 or horizon < 1:
+            raise ValueError("window and horizon must be positive")
+        self.window = window
+        self.horizon = horizon
+
+        self.segments: List[Batch] = []
+        self._offsets = [0]
+        for features, targets in series:
+            features, targets = torch.as_tensor(features), torch.as_tensor(targets)
+            if features.dim() != 2 or targets.dim() != 1 or len(features) != len(targets):
+                raise ValueError("Each series must be (length, num_features) features "
+                                 "and (length,) targets")
+            count = len(features) - window - horizon + 1
+            if count < 1:
+                continue
+            # (count, window, num_features) and (count, horizon) views.
+            windows = features.unfold(0, window, 1).transpose(1, 2)[:count]
+            horizons = targets[window:].unfold(0, horizon, 1)
+            self.segments.append((windows, horizons))
+            self._offsets.append(self._offsets[-1] + count)
+
+    @classmethod
+    def from_frame(cls, frame, feature_columns: Sequence[str], target_column: str,
+                   window: int, horizon: int = 1,
+                   group_column: str = "cbd_id") -> "SlidingWindowDataset":
+        """Window a frame sorted by ``group_column`` and then by time.
+
+        This is the layout of the ``tecton_features`` output. The feature and
+        target columns are converted to ``float32`` once, and every CBD's
+        series is a slice of those arrays.
+        """
+        features = torch.from_numpy(
+            np.ascontiguousarray(frame[list(feature_columns)].to_numpy(), dtype=np.float32)
+        )
+        targets = torch.from_numpy(
+            np.ascontiguousarray(frame[target_column].to_numpy(), dtype=np.float32)
+        )
+        groups = frame[group_column].to_numpy()
+        if len(groups) == 0:
+            return cls([], window, horizon)
+        bounds = np.concatenate(
+            ([0], np.flatnonzero(groups[1:] != groups[:-1]) + 1, [len(groups)])
+        ).astype(int)
+        if len(set(groups[bounds[:-1]].tolist())) != len(bounds) - 1:
+            raise ValueError(f"Rows must be sorted by {group_column!r}")
+        return cls([(features[lo:hi], targets[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])],
+                   window, horizon)
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+    def __getitem__(self, index: int) -> Batch:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        segment = bisect.bisect_right(self._offsets, index) - 1
+        windows, horizons = self.segments[segment]
+        return windows[index - self._offsets[segment]], horizons[index - self._offsets[segment]]
+
+
+class RankShard(Dataset):
+    """The rows of ``dataset`` read by one rank of a data-parallel job.
+
+    The rows are split into ``world_size`` contiguous, equally sized slices
+    and rank ``rank`` gets slice number ``rank``. Up to ``world_size - 1``
+    trailing rows are dropped so that every rank runs the same number of
+    steps. The slice is kept as views of the backing tensors, so a rank of a
+    memory-mapped :class:`ShardedTensorDataset` only pages in its own rows.
+    """
+
+    def __init__(self, dataset: Dataset, rank: int, world_size: int) -> None:
+        if not 0 <= rank < world_size:
+            raise ValueError(f"rank must be in [0, {world_size}), got {rank}")
+        segments = _tensor_segments(dataset)
+        rows = sum(len(x) for x, _ in segments) // world_size
+        start, stop = rank * rows, (rank + 1) * rows
+
+        self.segments: List[Batch] = []
+        self._offsets = [0]
+        lo = 0
+        for x, y in segments:
+            hi = lo + len(x)
+            if lo < stop and hi > start:
+                begin, end = max(start, lo) - lo, min(stop, hi) - lo
+                self.segments.append((x[begin:end], y[begin:end]))
+                self._offsets.append(self._offsets[-1] + end - begin)
+            lo = hi
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+    def __getitem__(self, index: int) -> Batch:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        segment = bisect.bisect_right(self._offsets, index) - 1
+        x, y = self.segments[segment]
+        return x[index - self._offsets[segment]], y[index - self._offsets[segment]]
+
+
+def _prefetch(batches: Iterator[Batch], depth: int = 1) -> Iterator[Batch]:
+    """Produce ``batches`` on a background thread, ``depth`` batches ahead."""
+    slots: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                slots.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for batch in batches:
+                if not put(("batch", batch)):
+                    return
+            put(("end", None))
+        except BaseException as exc:  # surfaced to the consumer
+            put(("error", exc))
+
+    worker = threading.Thread(target=produce, name="batch-prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            kind, item = slots.get()
+            if kind == "end":
+                return
+            if kind == "error":
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+
+
+class TensorBatchLoader:
+    """Batch iterator that reads straight from a dataset's backing tensors.
+
+    Unlike a ``DataLoader`` it never indexes single samples or collates them:
+    without shuffling each batch is a contiguous slice (a view, no copy) of
+    the underlying tensors. With ``shuffle`` a single permutation is drawn per
+    epoch and either gathered with one ``index_select`` per batch
+    (``shuffle_mode="gather"``) or used to reorder contiguous batch-sized
+    blocks (``shuffle_mode="block"``), which keeps batches as views at the
+    cost of coarser shuffling. ``prefetch`` builds the next batch on a
+    background thread while the current one is being consumed.
+
+    Works with ``TensorDataset`` and :class:`ShardedTensorDataset` inputs.
+    """
+
+    def __init__(self, dataset: Dataset, batch_size: int, shuffle: bool = False,
+                 shuffle_mode: str = "gather", drop_last: bool = False,
+                 prefetch: bool = False) -> None:
+        if shuffle_mode not in ("gather", "block"):
+            raise ValueError("shuffle_mode must be 'gather' or 'block'")
+        self.segments = _tensor_segments(dataset)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.shuffle_mode = shuffle_mode
+        self.drop_last = drop_last
+        self.prefetch = prefetch
+
+        starts = [0]
+        for x, _ in self.segments:
+            starts.append(starts[-1] + len(x))
+        self.num_rows = starts[-1]
+        self._starts = torch.tensor(starts)
+
+    def __len__(self) -> int:
+        if self.drop_last:
+            return self.num_rows // self.batch_size
+        return math.ceil(self.num_rows / self.batch_size)
+
+    def __iter__(self) -> Iterator[Batch]:
+        batches = self._batches()
+        return _prefetch(batches) if self.prefetch else batches
+
+    def _batches(self) -> Iterator[Batch]:
+        bounds = [(start, min(start + self.batch_size, self.num_rows))
+                  for start in range(0, len(self) * self.batch_size, self.batch_size)]
+        if not self.shuffle:
+            for start, end in bounds:
+                yield self._slice(start, end)
+        elif self.shuffle_mode == "block":
+            for block in torch.randperm(len(bounds)).tolist():
+                yield self._slice(*bounds[block])
+        else:
+            order = torch.randperm(self.num_rows)
+            for start, end in bounds:
+                yield self._gather(order[start:end])
+
+    def _slice(self, start: int, end: int) -> Batch:
+        parts = []
+        for (x, y), lo in zip(self.segments, self._starts.tolist()):
+            hi = lo + len(x)
+            if hi <= start or lo >= end:
+                continue
+            parts.append((x[max(start, lo) - lo:min(end, hi) - lo],
+                          y[max(start, lo) - lo:min(end, hi) - lo]))
+        if len(parts) == 1:
+            return parts[0]
+        return torch.cat([p[0] for p in parts]), torch.cat([p[1] for p in parts])
+
+    def _gather(self, index: torch.Tensor) -> Batch:
+        if len(self.segments) == 1:
+            x, y = self.segments[0]
+            return x.index_select(0, index), y.index_select(0, index)
+        segment = torch.bucketize(index, self._starts[1:], right=True)
+        xs, ys = [], []
+        for s in segment.unique().tolist():
+            local = index[segment == s] - self._starts[s]
+            x, y = self.segments[s]
+            xs.append(x.index_select(0, local))
+            ys.append(y.index_select(0, local))
+        return torch.cat(xs), torch.cat(ys)
+
 
 class FootTrafficDataModule(pl.LightningDataModule):
     """Simple ``LightningDataModule`` for foot traffic datasets.
 
     Expects datasets saved as ``torch`` tensors via ``torch.save`` containing a
-    tuple of ``(features, targets)``. Each path should point to a ``.pt`` file.
+    tuple of ``(features, targets)``. Each path should point to a ``.pt`` file
+    or to a directory in the memory-mapped sharded format (see
+    :mod:`models.lightning.sharded`), which is opened without loading the data
+    into memory.
+
+    With ``fast_loader`` the dataloaders are :class:`TensorBatchLoader`
+    instances that slice batches from the backing tensors instead of stock
+    ``DataLoader`` objects; ``shuffle_mode`` and ``prefetch`` are forwarded to
+    them.
+
+    ``dataset_cache`` is an optional dictionary shared between datamodule
+    instances (for example across Optuna trials) that maps each path to its
+    loaded dataset, so every file is only loaded once.
+
+    Under a multi-process trainer (DDP) each rank trains and validates on its
+    own :class:`RankShard` of the data, so the trainer should be created with
+    ``use_distributed_sampler=False``. ``.pt`` files are then memory-mapped
+    instead of loaded by every rank.
     """
 
     def __init__(self, train_path: str, val_path: Optional[str] = None,
-                 test_path: Optional[str] = None, batch_size: int = 32) -> None:
+                 test_path: Optional[str] = None, batch_size: int = 32,
+                 fast_loader: bool = False, shuffle_mode: str = "gather",
+                 prefetch: bool = False,
+                 dataset_cache: Optional[Dict[str, Dataset]] = None) -> None:
         super().__init__()
         self.train_path = train_path
         self.val_path = val_path
         self.test_path = test_path
         self.batch_size = batch_size
+        self.fast_loader = fast_loader
+        self.shuffle_mode = shuffle_mode
+        self.prefetch = prefetch
+        self.dataset_cache = dataset_cache
+
+        self.train_dataset: Optional[Dataset] = None
+        self.val_dataset: Optional[Dataset] = None
+        self.test_dataset: Optional[Dataset] = None
 
-        self.train_dataset: Optional[TensorDataset] = None
-        self.val_dataset: Optional[TensorDataset] = None
-        self.test_dataset: Optional[TensorDataset] = None
+    def _load_dataset(self, path: str) -> Dataset:
+        """Load a dataset from ``path``, reusing ``dataset_cache`` when given."""
+        if self.dataset_cache is None:
+            return self._read_dataset(path)
+        if path not in self.dataset_cache:
+            self.dataset_cache[path] = self._read_dataset(path)
+        return self.dataset_cache[path]
 
-    def _load_dataset(self, path: str) -> TensorDataset:
-        """Load a dataset from ``path`` expecting ``torch.save`` format."""
+    def _read_dataset(self, path: str) -> Dataset:
+        """Read a dataset from ``path`` in sharded or ``torch.save`` format."""
         if not os.path.exists(path):
             raise FileNotFoundError(f"Dataset not found: {path}")
-        data = torch.load(path)
+        if is_sharded_dataset(path):
+            return ShardedTensorDataset(path)
+        data = torch.load(path, mmap=self._world_size() > 1)
         if isinstance(data, tuple) and len(data) == 2:
             x, y = data
             return TensorDataset(x, y)
         raise ValueError("Dataset file must contain a tuple of (features, targets)")
 
+    def _world_size(self) -> int:
+        return self.trainer.world_size if self.trainer is not None else 1
+
+    def _rank_dataset(self, path: str) -> Dataset:
+        """Load ``path`` and keep only this rank's share of it under DDP."""
+        dataset = self._load_dataset(path)
+        if self._world_size() > 1:
+            return RankShard(dataset, self.trainer.global_rank, self._world_size())
+        return dataset
+
     def setup(self, stage: Optional[str] = None) -> None:  # type: ignore[override]
         if stage == 'fit' or stage is None:
-            self.train_dataset = self._load_dataset(self.train_path)
+            self.train_dataset = self._rank_dataset(self.train_path)
             if self.val_path:
-                self.val_dataset = self._load_dataset(self.val_path)
+                self.val_dataset = self._rank_dataset(self.val_path)
         if stage == 'test' or stage is None:
             if self.test_path:
                 self.test_dataset = self._load_dataset(self.test_path)
 
-    def train_dataloader(self) -> DataLoader:  # type: ignore[override]
+    def _loader(self, dataset: Dataset, shuffle: bool) -> Union[DataLoader, TensorBatchLoader]:
+        if self.fast_loader:
+            return TensorBatchLoader(dataset, batch_size=self.batch_size, shuffle=shuffle,
+                                     shuffle_mode=self.shuffle_mode, prefetch=self.prefetch)
+        return DataLoader(dataset, batch_size=self.batch_size, shuffle=shuffle)
+
+    def train_dataloader(self) -> Union[DataLoader, TensorBatchLoader]:  # type: ignore[override]
         if self.train_dataset is None:
             raise RuntimeError("DataModule not setup. Call setup('fit') first.")
-        return DataLoader(self.train_dataset, batch_size=self.batch_size, shuffle=True)
+        return self._loader(self.train_dataset, shuffle=True)
 
-    def val_dataloader(self) -> Optional[DataLoader]:  # type: ignore[override]
+    def val_dataloader(self) -> Optional[Union[DataLoader, TensorBatchLoader]]:  # type: ignore[override]
         if self.val_dataset is None:
             return None
-        return DataLoader(self.val_dataset, batch_size=self.batch_size)
+        return self._loader(self.val_dataset, shuffle=False)
 
-    def test_dataloader(self) -> Optional[DataLoader]:  # type: ignore[override]
+    def test_dataloader(self) -> Optional[Union[DataLoader, TensorBatchLoader]]:  # type: ignore[override]
         if self.test_dataset is None:
             return None
-        return DataLoader(self.test_dataset, batch_size=self.batch_size)
+        return self._loader(self.test_dataset, shuffle=False)
@@ -0,0 +1,51 @@
+"""Data-parallel training on the CPU cores of one machine.
+
+:func:`trainer_kwargs` configures a ``pl.Trainer`` for ``num_processes``
+local processes. With more than one process (or ``strategy="ddp"``) the
+trainer runs DDP over the gloo backend. The processes are started with
+``spawn``, so the calling script is not executed again in every rank, and
+the trained weights are copied back into the caller's model when ``fit``
+returns.
+
+Each rank reads only its own slice of the data (see
+:class:`models.lightning.datamodule.RankShard`) and uses ``threads``
+intra-op threads, by default an equal share of the machine's cores.
+Training throughput summed over the ranks is logged as ``samples_per_sec``.
+"""
+
+import os
+from typing import Optional
+
+from models.lightning.callbacks import SamplesPerSecond, ThreadsPerRank
+
+STRATEGIES = ("auto", "ddp")
+
+
+def threads_per_process(num_processes: int, threads: Optional[int] = None) -> int:
+    """Intra-op threads for each of ``num_processes`` processes sharing the cores."""
+    if threads:
+        return threads
+    return max(1, (os.cpu_count() or 1) // num_processes)
+
+
+def trainer_kwargs(num_processes: int = 1, strategy: str = "auto",
+                   threads: Optional[int] = None) -> dict:
+    """Keyword arguments for a ``pl.Trainer`` using ``num_processes`` CPU processes."""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"strategy must be one of {STRATEGIES}, got {strategy!r}")
+    if num_processes < 1:
+        raise ValueError("num_processes must be positive")
+    callbacks = [ThreadsPerRank(threads_per_process(num_processes, threads)), SamplesPerSecond()]
+    if strategy == "auto" and num_processes == 1:
+        return {"accelerator": "cpu", "devices": 1, "callbacks": callbacks}
+
+    from pytorch_lightning.strategies import DDPStrategy
+
+    return {
+        "accelerator": "cpu",
+        "devices": num_processes,
+        "strategy": DDPStrategy(process_group_backend="gloo", start_method="spawn"),
+        # Every rank already reads only its own RankShard.
+        "use_distributed_sampler": False,
+        "callbacks": callbacks,
+    }
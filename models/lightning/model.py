@@ -1,10 +1,11 @@
 from typing import Any
 
 import torch
-from torch import nn
 import torch.nn.functional as F
 import pytorch_lightning as pl
 
+from models.lightning.network import feed_forward
+
 
 class FootTrafficModel(pl.LightningModule):
     """Simple feed-forward network for regression tasks."""
@@ -13,11 +14,7 @@ class FootTrafficModel(pl.LightningModule):
         super().__init__()
         self.save_hyperparameters()
 
-        self.model = nn.Sequential(
-            nn.Linear(input_dim, hidden_dim),
-            nn.ReLU(),
-            nn.Linear(hidden_dim, 1),
-        )
+        self.model = feed_forward(input_dim, hidden_dim)
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:  # type: ignore[override]
         return self.model(x)
@@ -33,7 +30,7 @@ class FootTrafficModel(pl.LightningModule):
         x, y = batch
         y_hat = self(x)
         loss = F.mse_loss(y_hat, y)
-        self.log("val_loss", loss, prog_bar=True)
+        self.log("val_loss", loss, prog_bar=True, sync_dist=True)
         return loss
 
     def configure_optimizers(self):  # type: ignore[override]
@@ -0,0 +1,16 @@
+"""Network architecture shared by training and serving.
+
+Kept free of Lightning so that the serving runner can rebuild the network
+without importing ``pytorch_lightning``.
+"""
+
+from torch import nn
+
+
+def feed_forward(input_dim: int = 10, hidden_dim: int = 64) -> nn.Sequential:
+    """Return the feed-forward regressor wrapped by ``FootTrafficModel``."""
+    return nn.Sequential(
+        nn.Linear(input_dim, hidden_dim),
+        nn.ReLU(),
+        nn.Linear(hidden_dim, 1),
+    )
@@ -0,0 +1,150 @@
+"""Memory-mapped, sharded on-disk format for foot traffic datasets.
+
+A dataset is a directory containing ``header.json`` and one or more shard
+files. Each shard holds the raw little-endian ``float32`` feature block of all
+its rows followed by the raw ``float32`` target block, with no framing, so
+both can be memory-mapped and wrapped as tensors without deserialization or
+copying. The header records the per-row feature and target shapes and the row
+count of every shard::
+
+    {"format": "foot-traffic-shards", "version": 1, "dtype": "float32",
+     "feature_shape": [10], "target_shape": [1],
+     "shards": [{"file": "shard-00000.bin", "rows": 1048576}, ...]}
+
+Convert an existing ``torch.save`` dataset with::
+
+    python -m models.lightning.sharded train.pt train_shards/
+"""
+
+import argparse
+import bisect
+import json
+import os
+from typing import List, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+FORMAT_NAME = "foot-traffic-shards"
+FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+
+
+def is_sharded_dataset(path: str) -> bool:
+    """Return ``True`` if ``path`` is a directory in the sharded format."""
+    return os.path.isfile(os.path.join(path, HEADER_FILE))
+
+
+def write_sharded(features: torch.Tensor, targets: torch.Tensor, path: str,
+                  shard_size: int = 1 << 20) -> None:
+    """Write ``(features, targets)`` to ``path`` in shards of ``shard_size`` rows."""
+    if len(features) != len(targets):
+        raise ValueError("features and targets must have the same number of rows")
+
+    os.makedirs(path, exist_ok=True)
+    x = features.detach().cpu().to(torch.float32).numpy()
+    y = targets.detach().cpu().to(torch.float32).numpy()
+
+    shards = []
+    for index, start in enumerate(range(0, max(len(x), 1), shard_size)):
+        name = f"shard-{index:05d}.bin"
+        with open(os.path.join(path, name), "wb") as fh:
+            fh.write(np.ascontiguousarray(x[start:start + shard_size], dtype="<f4").tobytes())
+            fh.write(np.ascontiguousarray(y[start:start + shard_size], dtype="<f4").tobytes())
+        shards.append({"file": name, "rows": len(x[start:start + shard_size])})
+
+    header = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "dtype": "float32",
+        "feature_shape": list(x.shape[1:]),
+        "target_shape": list(y.shape[1:]),
+        "shards": shards,
+    }
+    with open(os.path.join(path, HEADER_FILE), "w") as fh:
+        json.dump(header, fh, indent=2)
+
+
+def convert_pt(source: str, destination: str, shard_size: int = 1 << 20) -> None:
+    """Convert a ``torch.save`` ``(features, targets)`` file to the sharded format."""
+    data = torch.load(source)
+    if not (isinstance(data, tuple) and len(data) == 2):
+        raise ValueError("Dataset file must contain a tuple of (features, targets)")
+    write_sharded(data[0], data[1], destination, shard_size=shard_size)
+
+
+class ShardedTensorDataset(Dataset):
+    """``(features, targets)`` dataset backed by memory-mapped shards.
+
+    Opening the dataset only maps the shard files; pages are read lazily by
+    the OS and shared through the page cache between every process mapping
+    the same files. Shards are mapped copy-on-write so the tensors are
+    writable without ever modifying the files. Pickling (for DataLoader
+    workers or trial processes) transfers only the path, and the receiving
+    process maps the files again instead of copying the data.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, HEADER_FILE)) as fh:
+            self.header = json.load(fh)
+        if self.header.get("format") != FORMAT_NAME:
+            raise ValueError(f"Not a sharded foot traffic dataset: {path}")
+        if self.header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported sharded dataset version: {self.header.get('version')}")
+
+        self.shards: List[Tuple[torch.Tensor, torch.Tensor]] = [
+            self._map_shard(shard) for shard in self.header["shards"]
+        ]
+        self._offsets = [0]
+        for shard in self.header["shards"]:
+            self._offsets.append(self._offsets[-1] + shard["rows"])
+
+    def _map_shard(self, shard: dict) -> Tuple[torch.Tensor, torch.Tensor]:
+        rows = shard["rows"]
+        feature_shape = tuple(self.header["feature_shape"])
+        target_shape = tuple(self.header["target_shape"])
+        feature_count = rows * int(np.prod(feature_shape, dtype=np.int64))
+        target_count = rows * int(np.prod(target_shape, dtype=np.int64))
+        if feature_count + target_count == 0:
+            return torch.empty((rows, *feature_shape)), torch.empty((rows, *target_shape))
+
+        mapped = np.memmap(os.path.join(self.path, shard["file"]), dtype="<f4", mode="c",
+                           shape=(feature_count + target_count,))
+        x = torch.from_numpy(mapped[:feature_count].reshape(rows, *feature_shape))
+        y = torch.from_numpy(mapped[feature_count:].reshape(rows, *target_shape))
+        return x, y
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+    def __getitem__(self, index: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        shard = bisect.bisect_right(self._offsets, index) - 1
+        x, y = self.shards[shard]
+        row = index - self._offsets[shard]
+        return x[row], y[row]
+
+    def __getstate__(self) -> dict:
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["path"])
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Convert a .pt dataset to the sharded format")
+    parser.add_argument("source", type=str, help="Path to a torch.save (features, targets) file")
+    parser.add_argument("destination", type=str, help="Output directory for the sharded dataset")
+    parser.add_argument("--shard-size", type=int, default=1 << 20,
+                        help="Rows per shard file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    convert_pt(args.source, args.destination, shard_size=args.shard_size)
@@ -0,0 +1,78 @@
+"""Fix for BentoML's batch splitting in the runner dispatcher.
+
+A runner groups queued calls into batches of at most ``max_batch_size`` rows.
+When the next queued call does not fit the rest of a batch, the dispatcher
+splits it in two with ``Params.iter``. That method stops with a
+``StopIteration`` raised inside a generator expression, which Python turns
+into a ``RuntimeError`` (PEP 479). The dispatcher then never releases its
+batch slot, so every later call to the runner times out.
+
+Calls of several rows trigger the split whenever they arrive concurrently
+with other calls, e.g. the chunks of a large ``/predict_batch`` or two batch
+requests at once. :func:`patch_batch_splitting` replaces ``Params.iter``
+with an equivalent that ends cleanly. The service module calls it at import,
+so it runs in the API server and in every runner process.
+
+``Params.iter`` is private BentoML API. The patch was checked against
+``TESTED_BENTOML_VERSION``, which ``requirements.txt`` and ``bentofile.yaml``
+pin. On other versions it is still applied if ``Params`` has the expected
+shape, with a warning; otherwise it is skipped and logged.
+"""
+
+import inspect
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+TESTED_BENTOML_VERSION = "1.4.39"
+
+
+def _iter(self):
+    from bentoml._internal.runner.utils import Params
+
+    iter_params = self.map(iter)
+    while True:
+        try:
+            args = tuple([next(a) for a in iter_params.args])
+            kwargs = {k: next(v) for k, v in iter_params.kwargs.items()}
+        except StopIteration:
+            return
+        yield Params(*args, **kwargs)
+
+
+def _unexpected_shape(params) -> Optional[str]:
+    """Why ``params`` does not look like the ``Params`` the patch was written for."""
+    original = getattr(params, "iter", None)
+    if original is None:
+        return "Params has no iter method"
+    if original is _iter:
+        return None
+    if not inspect.isgeneratorfunction(original):
+        return "Params.iter is not a generator function"
+    if list(inspect.signature(original).parameters) != ["self"]:
+        return f"Params.iter has signature {inspect.signature(original)}, expected (self)"
+    if not callable(getattr(params, "map", None)):
+        return "Params has no map method"
+    return None
+
+
+def patch_batch_splitting() -> bool:
+    """Install the fixed ``Params.iter`` and return whether it was installed."""
+    try:
+        import bentoml
+        from bentoml._internal.runner.utils import Params
+    except ImportError:
+        logger.warning("BentoML's runner Params not found; batch splitting is not patched")
+        return False
+    problem = _unexpected_shape(Params)
+    if problem is not None:
+        logger.warning("Not patching BentoML %s batch splitting: %s",
+                       getattr(bentoml, "__version__", "?"), problem)
+        return False
+    version = getattr(bentoml, "__version__", None)
+    if version != TESTED_BENTOML_VERSION:
+        logger.warning("Patching batch splitting of BentoML %s; the patch was checked "
+                       "against %s", version, TESTED_BENTOML_VERSION)
+    Params.iter = _iter
+    return True
@@ -0,0 +1,99 @@
+"""Optimized inference artifacts for the foot traffic regressor.
+
+Builds TorchScript, dynamically quantized ``int8`` and (optionally) ONNX
+versions of the eager ``nn.Sequential`` trained in ``train.py`` and checks
+each against the eager model on example inputs before it is registered.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import torch
+from torch import nn
+
+# Maximum relative error tolerated for each artifact compared with the eager
+# model. Graph exports should be numerically identical up to float rounding;
+# int8 weights trade a little accuracy for speed and memory.
+DEFAULT_TOLERANCES = {"torchscript": 1e-5, "onnx": 1e-5, "int8": 5e-2}
+
+
+def trace_torchscript(model: nn.Module, example: torch.Tensor) -> torch.jit.ScriptModule:
+    """Trace ``model`` on ``example`` into a TorchScript module."""
+    model.eval()
+    with torch.no_grad():
+        return torch.jit.trace(model, example)
+
+
+def quantize_int8(model: nn.Module) -> nn.Module:
+    """Return a copy of ``model`` with ``nn.Linear`` weights dynamically quantized to int8."""
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def export_onnx(model: nn.Module, example: torch.Tensor, path: str) -> str:
+    """Export ``model`` to ONNX at ``path`` with a dynamic batch dimension."""
+    model.eval()
+    torch.onnx.export(
+        model,
+        (example,),
+        path,
+        input_names=["features"],
+        output_names=["prediction"],
+        dynamic_axes={"features": {0: "batch"}, "prediction": {0: "batch"}},
+    )
+    return path
+
+
+def parity_error(reference: torch.Tensor, candidate: torch.Tensor) -> float:
+    """Maximum absolute difference relative to the largest reference output."""
+    scale = reference.abs().max().clamp_min(1e-12)
+    return float((reference - candidate).abs().max() / scale)
+
+
+def check_parity(name: str, reference: torch.Tensor, candidate: torch.Tensor,
+                 tolerance: Optional[float] = None) -> float:
+    """Raise ``ValueError`` if ``candidate`` drifts from ``reference`` beyond ``tolerance``."""
+    tolerance = DEFAULT_TOLERANCES[name] if tolerance is None else tolerance
+    error = parity_error(reference, candidate)
+    if error > tolerance:
+        raise ValueError(
+            f"{name} artifact failed the parity check: relative error {error:.3g} > {tolerance:.3g}"
+        )
+    return error
+
+
+def build_inference_artifacts(model: nn.Module, example: torch.Tensor,
+                              onnx_path: Optional[str] = None,
+                              tolerances: Optional[Dict[str, float]] = None
+                              ) -> Dict[str, Tuple[object, float]]:
+    """Build every inference artifact for ``model`` and verify its parity.
+
+    Returns a mapping of artifact name to ``(artifact, relative_error)``. The
+    ``torchscript`` and ``int8`` artifacts are TorchScript modules; ``onnx``
+    (only when ``onnx_path`` is given) is the path of the exported file and
+    is checked with ``onnxruntime`` on CPU.
+    """
+
+    tolerances = {**DEFAULT_TOLERANCES, **(tolerances or {})}
+    model.eval()
+    with torch.no_grad():
+        reference = model(example)
+
+        scripted = trace_torchscript(model, example)
+        artifacts = {
+            "torchscript": (scripted, check_parity("torchscript", reference, scripted(example),
+                                                   tolerances["torchscript"])),
+        }
+
+        quantized = trace_torchscript(quantize_int8(model), example)
+        artifacts["int8"] = (quantized, check_parity("int8", reference, quantized(example),
+                                                     tolerances["int8"]))
+
+    if onnx_path is not None:
+        import onnxruntime as ort
+
+        export_onnx(model, example, onnx_path)
+        session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        (output,) = session.run(None, {"features": example.numpy()})
+        artifacts["onnx"] = (onnx_path, check_parity("onnx", reference, torch.from_numpy(output),
+                                                     tolerances["onnx"]))
+    return artifacts
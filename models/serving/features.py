@@ -0,0 +1,186 @@
+"""Online feature lookups for the forecasting service.
+
+``/forecast`` callers only send a ``cbd_id``; the service assembles the model's
+feature vector from the rows produced by
+:func:`dags.assets.tecton_features.compute_tecton_features`. Lookups go
+through :class:`FeatureCache`, an in-process LRU cache with a time-to-live,
+in front of an online store.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from features.online_store import FEATURE_VIEWS, FeatureRow, SQLiteOnlineStore
+
+# Order of the values in the model's feature vector.
+FEATURE_COLUMNS = [column for columns, _ in FEATURE_VIEWS.values() for column in columns]
+
+# Time-to-live of each feature: the ``ttl`` of the feature view it belongs to.
+# Values older than their TTL are treated as missing, as Tecton's online store
+# does.
+FEATURE_TTLS = {column: ttl for columns, ttl in FEATURE_VIEWS.values() for column in columns}
+
+
+def _naive_utc(timestamp) -> pd.Timestamp:
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp
+
+
+def _epoch_seconds(timestamp) -> float:
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize("UTC")
+    return timestamp.timestamp()
+
+
+class FrameOnlineStore:
+    """Online store stand-in serving rows of a features dataframe.
+
+    Rows are grouped by ``cbd_id`` (compared as strings) and sorted by
+    ``timestamp`` once, so each lookup is a dictionary access plus a binary
+    search. Useful for local development and tests in place of Tecton.
+    """
+
+    def __init__(self, features: pd.DataFrame) -> None:
+        features = features.assign(cbd_id=features["cbd_id"].astype(str))
+        features = features.sort_values(["cbd_id", "timestamp"], kind="stable")
+        self._groups: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for cbd_id, group in features.groupby("cbd_id", sort=False, observed=True):
+            self._groups[cbd_id] = (
+                group["timestamp"].to_numpy(dtype="datetime64[ns]"),
+                group[FEATURE_COLUMNS].to_numpy(dtype=np.float64),
+            )
+
+    @classmethod
+    def from_parquet(cls, path: str) -> "FrameOnlineStore":
+        return cls(pd.read_parquet(path, columns=["cbd_id", "timestamp", *FEATURE_COLUMNS]))
+
+    def get_latest(self, cbd_id: str, as_of: Optional[pd.Timestamp] = None) -> Optional[FeatureRow]:
+        """Return the newest row for ``cbd_id`` at or before ``as_of``, if any.
+
+        Every feature of the returned row shares that row's timestamp.
+        """
+        group = self._groups.get(str(cbd_id))
+        if group is None:
+            return None
+        timestamps, values = group
+        index = len(timestamps) - 1
+        if as_of is not None:
+            index = int(np.searchsorted(timestamps, np.datetime64(_naive_utc(as_of), "ns"),
+                                        side="right")) - 1
+        if index < 0:
+            return None
+        timestamp = pd.Timestamp(timestamps[index])
+        return {column: (timestamp, value) for column, value in zip(FEATURE_COLUMNS, values[index].tolist())}
+
+
+def open_store(path: str):
+    """Open the online store at ``path``: a Parquet features export or a SQLite store."""
+    if path.endswith(".parquet"):
+        return FrameOnlineStore.from_parquet(path)
+    return SQLiteOnlineStore(path)
+
+
+class FeatureCache:
+    """LRU + TTL cache of assembled feature vectors keyed by ``cbd_id``.
+
+    A hit returns the cached vector without touching ``store``. Entries are
+    evicted least recently used first once ``max_entries`` is reached and
+    expire after ``ttl`` seconds, or earlier when one of their features would
+    outlive its feature view's TTL, so a cached vector is never fresher than
+    the store itself would allow. Lookups with an explicit ``as_of`` timestamp
+    are cached under ``(cbd_id, as_of)``.
+
+    Missing or expired feature values are replaced by ``fill_value``.
+    ``hits`` and ``misses`` count cache lookups.
+    """
+
+    def __init__(self, store, max_entries: int = 10000, ttl: float = 60.0,
+                 fill_value: float = 0.0, clock: Callable[[], float] = time.time) -> None:
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.fill_value = fill_value
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, list[float], pd.Timestamp]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cbd_id: str, as_of: Optional[pd.Timestamp] = None) -> list[float]:
+        """Return the feature vector for ``cbd_id``; ``KeyError`` if the store has none."""
+        return self.lookup(cbd_id, as_of)[0]
+
+    def lookup(self, cbd_id: str,
+               as_of: Optional[pd.Timestamp] = None) -> Tuple[list[float], pd.Timestamp]:
+        """Return the feature vector for ``cbd_id`` and the time it was observed.
+
+        The observation time is the newest feature timestamp of the store's
+        row (naive UTC); forecasts are made relative to it. ``KeyError`` if
+        the store has no row.
+        """
+        key = str(cbd_id) if as_of is None else (str(cbd_id), _naive_utc(as_of))
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+
+        row = self.store.get_latest(cbd_id, as_of)
+        if row is None:
+            raise KeyError(f"No features for cbd_id {cbd_id!r}")
+        vector, expires_at = self._assemble(row, now if as_of is None else _epoch_seconds(as_of))
+        if as_of is not None:
+            expires_at = now + self.ttl  # historical lookups do not go stale
+        else:
+            expires_at = min(expires_at, now + self.ttl)
+        observed_at = max(_naive_utc(timestamp) for timestamp, _ in row.values())
+
+        with self._lock:
+            self._entries[key] = (expires_at, vector, observed_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vector, observed_at
+
+    def _assemble(self, row: FeatureRow, reference: float) -> Tuple[list[float], float]:
+        """Build the vector as of ``reference`` and the time its first value expires."""
+        vector = []
+        expires_at = float("inf")
+        for column in FEATURE_COLUMNS:
+            if column not in row:
+                vector.append(self.fill_value)
+                continue
+            timestamp, value = row[column]
+            valid_until = _epoch_seconds(timestamp) + FEATURE_TTLS[column].total_seconds()
+            if valid_until <= reference or value is None or np.isnan(value):
+                vector.append(self.fill_value)
+            else:
+                vector.append(float(value))
+                expires_at = min(expires_at, valid_until)
+        return vector, expires_at
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit and miss counters and the current number of cached entries."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,212 @@
+"""Precomputed multi-horizon forecasts for every CBD.
+
+The ``forecast_table`` Dagster asset runs one batched forward pass over every
+``cbd_id`` × horizon (1 to 24 hours ahead) and stores the predictions in
+:class:`ForecastTable`, a SQLite table keyed by ``(cbd_id, horizon)``. The
+service answers ``/forecast`` from it with a single primary key read and only
+runs the model itself when a row is missing or stale.
+
+One model serves every horizon. Its input vector, ``MODEL_COLUMNS``, is the
+``FEATURE_COLUMNS`` vector of a feature row followed by ``HORIZON_COLUMNS``:
+the horizon ``h`` in hours and the hour of day of the target ``timestamp + h``.
+The calendar features (``is_holiday``) are also set for the target hour. The
+feature row's own ``timestamp`` is the reference time everywhere: training
+examples, the precomputed table and live ``/forecast`` inference all predict
+``timestamp + h`` from the row observed at ``timestamp``.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from features.calendar import holiday_flags
+from models.serving.features import FEATURE_COLUMNS
+
+if TYPE_CHECKING:
+    import torch
+
+MAX_HORIZON = 24
+
+# Inputs describing the forecast itself, appended to the feature vector. The
+# target hour is encoded on the unit circle so that 23:00 is next to 00:00.
+HORIZON_COLUMNS = ["horizon", "target_hour_sin", "target_hour_cos"]
+
+# Order of the values in the model's input vector.
+MODEL_COLUMNS = [*FEATURE_COLUMNS, *HORIZON_COLUMNS]
+
+# Features known ahead of time and recomputed for each target hour.
+_HOLIDAY_INDEX = FEATURE_COLUMNS.index("is_holiday")
+
+
+def target_times(issued_at, horizons) -> np.ndarray:
+    """Return ``issued_at + horizons`` hours as ``datetime64[ns]``."""
+    issued_at = np.asarray(issued_at, dtype="datetime64[ns]")
+    return issued_at + np.asarray(horizons, dtype=np.int64).astype("timedelta64[h]")
+
+
+def _horizon_features(horizons: np.ndarray, target_time: np.ndarray) -> np.ndarray:
+    hour = target_time.astype("datetime64[h]").astype(np.int64) % 24
+    angle = 2 * np.pi * hour / 24
+    return np.column_stack([horizons, np.sin(angle), np.cos(angle)]).astype(np.float32)
+
+
+def horizon_vector(features: list[float], issued_at: pd.Timestamp, horizon: int) -> list[float]:
+    """Return the model input for forecasting ``horizon`` hours after ``issued_at``.
+
+    ``features`` is the ``FEATURE_COLUMNS`` vector observed at ``issued_at``
+    (naive UTC).
+    """
+    target_time = target_times([pd.Timestamp(issued_at).to_datetime64()], [horizon])
+    vector = list(features)
+    vector[_HOLIDAY_INDEX] = float(holiday_flags(pd.Series(target_time)).iloc[0])
+    return vector + _horizon_features(np.array([horizon]), target_time)[0].tolist()
+
+
+def horizon_inputs(features: pd.DataFrame, horizons, fill_value: float = 0.0) -> np.ndarray:
+    """Return the ``float32`` ``MODEL_COLUMNS`` inputs for each row of ``features``.
+
+    Row ``i`` forecasts ``horizons[i]`` hours after ``features["timestamp"][i]``:
+    the row's ``FEATURE_COLUMNS`` with missing values replaced by
+    ``fill_value``, calendar features set for the target hour, then the
+    ``HORIZON_COLUMNS``. Training examples and batch forecasts are built the
+    same way.
+    """
+    horizons = np.broadcast_to(np.asarray(horizons, dtype=np.int64), (len(features),))
+    target_time = target_times(features["timestamp"].to_numpy(dtype="datetime64[ns]"), horizons)
+    values = features[FEATURE_COLUMNS].to_numpy(dtype=np.float32, na_value=np.nan)
+    inputs = np.empty((len(features), len(MODEL_COLUMNS)), dtype=np.float32)
+    inputs[:, :len(FEATURE_COLUMNS)] = np.nan_to_num(values, nan=fill_value)
+    inputs[:, _HOLIDAY_INDEX] = holiday_flags(pd.Series(target_time)).to_numpy(dtype=np.float32)
+    inputs[:, len(FEATURE_COLUMNS):] = _horizon_features(horizons, target_time)
+    return inputs
+
+
+def forecast_all(model: "torch.nn.Module", features: pd.DataFrame,
+                 max_horizon: int = MAX_HORIZON, fill_value: float = 0.0) -> pd.DataFrame:
+    """Forecast ``1..max_horizon`` hours ahead for every CBD in ``features``.
+
+    ``features`` holds feature rows as produced by ``compute_tecton_features``;
+    the newest row of each ``cbd_id`` is used. All ``cbd_id`` × horizon inputs
+    are built as one matrix and predicted in a single forward pass. Missing
+    feature values are replaced by ``fill_value``.
+    """
+    # Imported here so that the service can read the table without torch.
+    import torch
+
+    latest = (
+        features.sort_values("timestamp", kind="stable")
+        .groupby("cbd_id", sort=True, observed=True)
+        .tail(1)
+    )
+    num_cbds = len(latest)
+    horizons = np.tile(np.arange(1, max_horizon + 1), num_cbds)
+
+    rows = latest.iloc[np.repeat(np.arange(num_cbds), max_horizon)]
+    issued_at = rows["timestamp"].to_numpy(dtype="datetime64[ns]")
+    inputs = horizon_inputs(rows, horizons, fill_value=fill_value)
+
+    model.eval()
+    with torch.no_grad():
+        predictions = model(torch.from_numpy(inputs)).reshape(-1).numpy()
+
+    return pd.DataFrame({
+        "cbd_id": rows["cbd_id"].astype(str).to_numpy(),
+        "horizon": horizons.astype(np.int8),
+        "issued_at": issued_at,
+        "target_time": target_times(issued_at, horizons),
+        "prediction": predictions.astype(np.float32),
+    })
+
+
+class ForecastTable:
+    """SQLite table of precomputed forecasts keyed by ``(cbd_id, horizon)``.
+
+    Each row also records ``issued_at`` (the timestamp of the features it was
+    computed from), ``target_time`` and ``created_at`` (wall-clock seconds when
+    it was written). A row is only replaced by a forecast issued at the same
+    time or later, so backfilling an old partition never overwrites newer
+    forecasts. Readers judge staleness from ``issued_at``, not ``created_at``.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS forecasts (cbd_id TEXT NOT NULL, "
+                "horizon INTEGER NOT NULL, issued_at INTEGER NOT NULL, "
+                "target_time INTEGER NOT NULL, prediction REAL NOT NULL, "
+                "created_at REAL NOT NULL, PRIMARY KEY (cbd_id, horizon)) WITHOUT ROWID"
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def write(self, forecasts: pd.DataFrame, created_at: Optional[float] = None) -> int:
+        """Upsert ``forecasts`` (as returned by :func:`forecast_all`).
+
+        Rows issued before the stored forecast for the same key are skipped.
+        """
+        created_at = time.time() if created_at is None else created_at
+        rows = zip(
+            forecasts["cbd_id"].astype(str).tolist(),
+            forecasts["horizon"].astype(int).tolist(),
+            forecasts["issued_at"].to_numpy(dtype="datetime64[ns]").view(np.int64).tolist(),
+            forecasts["target_time"].to_numpy(dtype="datetime64[ns]").view(np.int64).tolist(),
+            forecasts["prediction"].astype(float).tolist(),
+            [created_at] * len(forecasts),
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO forecasts VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(cbd_id, horizon) DO UPDATE SET issued_at = excluded.issued_at, "
+                "target_time = excluded.target_time, prediction = excluded.prediction, "
+                "created_at = excluded.created_at "
+                "WHERE excluded.issued_at >= forecasts.issued_at",
+                rows,
+            )
+        return len(forecasts)
+
+    def get(self, cbd_id, horizon: int, now: Optional[pd.Timestamp] = None,
+            max_age: Optional[float] = None) -> Optional[dict]:
+        """Return the stored forecast for ``cbd_id`` and ``horizon``, if any.
+
+        With ``now`` (naive UTC, like the feature timestamps) a forecast whose
+        ``target_time`` is not after ``now`` is not returned, nor is one
+        issued more than ``max_age`` seconds before ``now``.
+        """
+        query = ("SELECT issued_at, target_time, prediction, created_at FROM forecasts "
+                 "WHERE cbd_id = ? AND horizon = ?")
+        params: list = [str(cbd_id), int(horizon)]
+        if now is not None:
+            now_ns = pd.Timestamp(now).value
+            query += " AND target_time > ?"
+            params.append(now_ns)
+            if max_age is not None:
+                query += " AND issued_at >= ?"
+                params.append(now_ns - int(max_age * 1e9))
+        with self._lock:
+            found = self._conn.execute(query, params).fetchone()
+        if found is None:
+            return None
+        issued_at, target_time, prediction, created_at = found
+        return {
+            "issued_at": pd.Timestamp(issued_at, unit="ns"),
+            "target_time": pd.Timestamp(target_time, unit="ns"),
+            "prediction": prediction,
+            "created_at": created_at,
+        }
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM forecasts").fetchone()[0]
@@ -0,0 +1,69 @@
+"""Prometheus metrics for the forecasting service.
+
+Metrics are created through ``bentoml.metrics`` so BentoML exports them on the
+service's ``/metrics`` endpoint alongside its own (including
+``bentoml_runner_adaptive_batch_size`` for the batches the runner forms).
+
+``foot_traffic_stage_seconds`` records how long each stage of a request takes,
+labelled by ``endpoint`` and ``stage``:
+
+``parse``
+    pydantic validation of the request body (decoding it for
+    ``/predict_binary``).
+``tensor``
+    building the float32 input array from the request.
+``runner``
+    the runner round trip, including time queued for an adaptive batch.
+``table`` / ``features``
+    ``/forecast`` reads of the forecast table and the feature cache.
+``serialize``
+    converting the model output into the JSON-ready response.
+
+``foot_traffic_startup_seconds`` records the cold start phases of the API
+server and runner processes (see :mod:`models.serving.startup`).
+
+Observing a histogram costs on the order of a microsecond, so the metrics are
+always on.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import bentoml
+
+STAGE_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+stage_seconds = bentoml.metrics.Histogram(
+    name="foot_traffic_stage_seconds",
+    documentation="Time spent in each stage of a request",
+    labelnames=["endpoint", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+request_batch_size = bentoml.metrics.Histogram(
+    name="foot_traffic_request_batch_size",
+    documentation="Feature vectors sent to the runner per request",
+    labelnames=["endpoint"],
+    buckets=BATCH_BUCKETS,
+)
+
+startup_seconds = bentoml.metrics.Gauge(
+    name="foot_traffic_startup_seconds",
+    documentation="Duration of each start-up phase, and seconds from process start to each milestone",
+    labelnames=["process", "phase"],
+)
+
+
+@contextmanager
+def stage(endpoint: str, name: str) -> Iterator[None]:
+    """Record the duration of the enclosed block as stage ``name`` of ``endpoint``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.labels(endpoint=endpoint, stage=name).observe(time.perf_counter() - start)
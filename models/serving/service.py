@@ -1,24 +1,296 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import ClassVar, Optional
+
 import bentoml
-import torch
-from bentoml.io import JSON
-from pydantic import BaseModel
+import numpy as np
+import pandas as pd
+from bentoml.exceptions import BadInput, NotFound, ServiceUnavailable
+from bentoml.io import JSON, File
+from pydantic import BaseModel, Field, model_validator
+
+from models.serving.binary import decode_features, encode_predictions
+from models.serving.dispatch import patch_batch_splitting
+from models.serving.features import FeatureCache, open_store
+from models.serving.forecast_table import MAX_HORIZON, MODEL_COLUMNS, ForecastTable, horizon_vector
+from models.serving.metrics import request_batch_size, stage
+from models.serving.startup import StartupTimer
+from models.serving.weights import WEIGHTS_MODEL, weights_runner
+
+startup = StartupTimer("api_server")
+patch_batch_splitting()
+
+
+class TimedRequest(BaseModel):
+    """Request schema whose validation time is recorded as the ``parse`` stage."""
+    endpoint: ClassVar[str] = ""
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def _record_parse(cls, data, handler):
+        with stage(cls.endpoint, "parse"):
+            return handler(data)
 
 
-class TrafficRequest(BaseModel):
+class TrafficRequest(TimedRequest):
     """Input data schema for foot traffic forecasting."""
+    endpoint: ClassVar[str] = "predict"
     features: list[float]
 
 
-# Load the latest trained PyTorch model registered in BentoML's model store.
-model_runner = bentoml.pytorch.get("foot_traffic:latest").to_runner()
+class TrafficBatchRequest(TimedRequest):
+    """Input data schema for forecasting many feature vectors in one call."""
+    endpoint: ClassVar[str] = "predict_batch"
+    features: list[list[float]]
+
+
+class ForecastRequest(TimedRequest):
+    """Forecast request for a CBD whose features are looked up by the service."""
+    endpoint: ClassVar[str] = "forecast"
+    cbd_id: str
+    timestamp: Optional[datetime] = None
+    horizon: int = Field(default=1, ge=1, le=MAX_HORIZON)
+
+
+# Adaptive batching limits. Concurrent ``/predict`` calls are grouped by the
+# runner into a single forward pass of at most ``MAX_BATCH_SIZE`` rows; how
+# long it waits for a batch to fill is tuned by BentoML's dispatcher from the
+# measured model latency. ``MAX_LATENCY_MS`` is not that wait but a rejection
+# budget: a request the runner expects to miss it is answered with 503. The
+# default is BentoML's own (60 s), so requests are only shed under overload.
+MAX_BATCH_SIZE = int(os.environ.get("FOOT_TRAFFIC_MAX_BATCH_SIZE", "256"))
+MAX_LATENCY_MS = int(os.environ.get("FOOT_TRAFFIC_MAX_LATENCY_MS", "60000"))
+
+# Inference backend: the eager PyTorch model, its TorchScript trace, the int8
+# dynamically quantized TorchScript trace, ONNX run by onnxruntime on CPU, or
+# the memory-mapped weights served by ``WeightsRunnable`` for fast cold starts
+# (see ``models/serving/weights.py``). All are registered by ``train.py``
+# (ONNX only with ``--export-onnx``).
+BACKEND = os.environ.get("FOOT_TRAFFIC_BACKEND", "eager")
+
+
+def load_model(backend: str):
+    """Return the latest BentoML model registered for ``backend``."""
+    if backend == "eager":
+        return bentoml.pytorch.get("foot_traffic:latest")
+    if backend == "torchscript":
+        return bentoml.torchscript.get("foot_traffic_torchscript:latest")
+    if backend == "int8":
+        return bentoml.torchscript.get("foot_traffic_int8:latest")
+    if backend == "onnx":
+        return bentoml.onnx.get("foot_traffic_onnx:latest")
+    if backend == "mmap":
+        return bentoml.models.get(f"{WEIGHTS_MODEL}:latest")
+    raise ValueError(f"Unknown FOOT_TRAFFIC_BACKEND: {backend!r}")
+
+
+# Every model is saved with a batchable signature (see ``train.py``). The
+# ``mmap`` runner also warms up at the largest batch it will be sent.
+with startup.phase("model_lookup"):
+    bento_model = load_model(BACKEND)
+
+# ``train.py`` records the model's input width as metadata. Live /forecast
+# inference sends the ``MODEL_COLUMNS`` vector, so a model trained on other
+# features cannot answer it; the mismatch is detected once here.
+MODEL_INPUT_DIM = bento_model.info.metadata.get("input_dim")
+FORECAST_ERROR: Optional[str] = None
+if MODEL_INPUT_DIM is not None and int(MODEL_INPUT_DIM) != len(MODEL_COLUMNS):
+    FORECAST_ERROR = (
+        f"Model {bento_model.tag} expects {MODEL_INPUT_DIM} features but /forecast builds "
+        f"{len(MODEL_COLUMNS)} ({', '.join(MODEL_COLUMNS)}); retrain it on data from "
+        "`python -m training.dataset`"
+    )
+# ``/predict_binary`` checks payloads against the served model's width. For a
+# model of the ``MODEL_COLUMNS`` vector, separate Arrow columns must also be
+# named after it.
+BINARY_WIDTH = int(MODEL_INPUT_DIM) if MODEL_INPUT_DIM is not None else None
+BINARY_COLUMNS = MODEL_COLUMNS if BINARY_WIDTH == len(MODEL_COLUMNS) else None
+if BACKEND == "mmap":
+    model_runner = weights_runner(
+        bento_model,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_latency_ms=MAX_LATENCY_MS,
+        warmup_batch_sizes=(1, MAX_BATCH_SIZE),
+    )
+else:
+    model_runner = bento_model.to_runner(
+        max_batch_size=MAX_BATCH_SIZE,
+        max_latency_ms=MAX_LATENCY_MS,
+    )
+
+# Define the BentoML service with /predict, /predict_batch, /predict_binary and
+# /forecast endpoints.
+# BentoML >= 1.2 moved the runner-based ``Service`` to ``bentoml.legacy``.
+Service = getattr(bentoml, "legacy", bentoml).Service
+svc = Service("foot_traffic_service", runners=[model_runner])
+
+
+@svc.on_startup
+def _mark_ready(_context) -> None:
+    startup.mark_ready()
+
+# Online feature lookups for /forecast. The store is the embedded SQLite
+# online store written by the ``tecton`` resource (or a Parquet export of the
+# ``tecton_features`` asset); assembled vectors are cached per ``cbd_id``.
+ONLINE_STORE = os.environ.get("FOOT_TRAFFIC_ONLINE_STORE", "feature_store/online.sqlite")
+FEATURE_CACHE_SIZE = int(os.environ.get("FOOT_TRAFFIC_FEATURE_CACHE_SIZE", "10000"))
+FEATURE_CACHE_TTL = float(os.environ.get("FOOT_TRAFFIC_FEATURE_CACHE_TTL", "60"))
+
+_feature_cache: Optional[FeatureCache] = None
+
+
+def feature_cache() -> FeatureCache:
+    """Return the process-wide feature cache, opening the store on first use."""
+    global _feature_cache
+    if _feature_cache is None:
+        _feature_cache = FeatureCache(
+            open_store(ONLINE_STORE),
+            max_entries=FEATURE_CACHE_SIZE,
+            ttl=FEATURE_CACHE_TTL,
+        )
+    return _feature_cache
 
-# Define the BentoML service with a /predict endpoint.
-svc = bentoml.Service("foot_traffic_service", runners=[model_runner])
+
+# Precomputed forecasts written by the ``forecast_table`` asset. Rows issued
+# more than ``FORECAST_MAX_AGE`` seconds ago, or whose target hour has passed,
+# are stale and answered by live inference.
+FORECAST_TABLE = os.environ.get("FOOT_TRAFFIC_FORECAST_TABLE", "feature_store/online.sqlite")
+FORECAST_MAX_AGE = float(os.environ.get("FOOT_TRAFFIC_FORECAST_MAX_AGE", "3600"))
+
+_forecast_table: Optional[ForecastTable] = None
+
+
+def utcnow() -> pd.Timestamp:
+    """Current time as a naive UTC timestamp, comparable with feature timestamps."""
+    return pd.Timestamp.now(tz="UTC").tz_localize(None)
+
+
+def forecast_table() -> ForecastTable:
+    """Return the process-wide forecast table, opening it on first use."""
+    global _forecast_table
+    if _forecast_table is None:
+        _forecast_table = ForecastTable(FORECAST_TABLE)
+    return _forecast_table
+
+
+async def infer(inputs: np.ndarray, endpoint: str) -> np.ndarray:
+    """Run ``inputs`` through the configured backend and return an array.
+
+    Inputs are float32 NumPy arrays for every backend (the PyTorch runners
+    convert them to tensors), so the API server itself does not need torch.
+    Inputs larger than ``MAX_BATCH_SIZE`` are split into chunks of at most
+    that size. The chunks are sent concurrently, so the runner can batch them
+    (splitting calls that straddle a batch, see ``models/serving/dispatch.py``),
+    and their outputs are concatenated in order.
+    """
+    request_batch_size.labels(endpoint=endpoint).observe(len(inputs))
+    # The ONNX runner exposes the session's ``run``.
+    run = model_runner.run if BACKEND == "onnx" else model_runner
+    with stage(endpoint, "runner"):
+        if len(inputs) <= MAX_BATCH_SIZE:
+            outputs = np.asarray(await run.async_run(inputs))
+        else:
+            chunks = await asyncio.gather(*(
+                run.async_run(inputs[start:start + MAX_BATCH_SIZE])
+                for start in range(0, len(inputs), MAX_BATCH_SIZE)
+            ))
+            outputs = np.concatenate([np.asarray(chunk) for chunk in chunks])
+    startup.mark_first_prediction()
+    return outputs
 
 
 @svc.api(input=JSON(pydantic_model=TrafficRequest), output=JSON())
-def predict(req: TrafficRequest) -> dict:
+async def predict(req: TrafficRequest) -> dict:
     """Return foot traffic predictions for the provided features."""
-    tensor = torch.tensor(req.features, dtype=torch.float32).unsqueeze(0)
-    prediction = model_runner.run(tensor)
-    return {"prediction": float(prediction.squeeze().item())}
+    with stage("predict", "tensor"):
+        inputs = np.asarray(req.features, dtype=np.float32)[np.newaxis]
+    prediction = await infer(inputs, "predict")
+    with stage("predict", "serialize"):
+        return {"prediction": float(prediction.squeeze().item())}
+
+
+@svc.api(input=JSON(pydantic_model=TrafficBatchRequest), output=JSON())
+async def predict_batch(req: TrafficBatchRequest) -> dict:
+    """Return foot traffic predictions for every feature vector in the request."""
+    if not req.features:
+        return {"predictions": []}
+    with stage("predict_batch", "tensor"):
+        inputs = np.asarray(req.features, dtype=np.float32)
+    predictions = await infer(inputs, "predict_batch")
+    with stage("predict_batch", "serialize"):
+        return {"predictions": predictions.reshape(-1).tolist()}
+
+
+@svc.api(input=File(), output=File())
+async def predict_binary(payload) -> bytes:
+    """Return predictions for a binary ``.npy`` or Arrow IPC feature matrix.
+
+    See ``models/serving/binary.py`` for the accepted formats. Payloads whose
+    width (or Arrow column names) do not match the model are rejected with
+    ``BadInput``. Predictions are returned as a float32 vector in the
+    request's format.
+    """
+    with stage("predict_binary", "parse"):
+        try:
+            features, fmt = decode_features(payload.read(), BINARY_WIDTH, BINARY_COLUMNS)
+        except ValueError as exc:
+            raise BadInput(str(exc)) from exc
+    if len(features):
+        predictions = await infer(features, "predict_binary")
+    else:
+        predictions = np.empty(0, dtype=np.float32)
+    with stage("predict_binary", "serialize"):
+        return encode_predictions(predictions, fmt)
+
+
+@svc.api(input=JSON(pydantic_model=ForecastRequest), output=JSON())
+async def forecast(req: ForecastRequest) -> dict:
+    """Forecast foot traffic for ``cbd_id`` ``horizon`` hours ahead.
+
+    Latest forecasts are read from the precomputed forecast table; a missing
+    or stale row, or a request with an explicit ``timestamp``, falls back to
+    live inference from the CBD's latest (or as-of) features. Like the table,
+    live forecasts target ``horizon`` hours after the features were observed,
+    which the response reports as ``target_time``. Live inference is refused
+    if the served model does not take the ``MODEL_COLUMNS`` vector.
+    """
+    result = {"cbd_id": req.cbd_id, "horizon": req.horizon}
+    if req.timestamp is None:
+        with stage("forecast", "table"):
+            row = forecast_table().get(req.cbd_id, req.horizon, now=utcnow(),
+                                       max_age=FORECAST_MAX_AGE)
+        if row is not None:
+            return {**result, "target_time": row["target_time"].isoformat(),
+                    "prediction": row["prediction"], "source": "table"}
+
+    if FORECAST_ERROR is not None:
+        raise ServiceUnavailable(FORECAST_ERROR)
+    with stage("forecast", "features"):
+        try:
+            features, issued_at = feature_cache().lookup(req.cbd_id, req.timestamp)
+        except KeyError as exc:
+            raise NotFound(str(exc)) from exc
+    with stage("forecast", "tensor"):
+        vector = horizon_vector(features, issued_at, req.horizon)
+        inputs = np.asarray(vector, dtype=np.float32)[np.newaxis]
+    prediction = await infer(inputs, "forecast")
+    with stage("forecast", "serialize"):
+        target_time = issued_at + pd.Timedelta(hours=req.horizon)
+        return {**result, "target_time": target_time.isoformat(),
+                "prediction": float(prediction.squeeze().item()), "source": "live"}
+
+
+@svc.api(input=JSON(), output=JSON())
+async def feature_cache_stats(_: dict) -> dict:
+    """Hit and miss counters of the ``/forecast`` feature cache."""
+    return feature_cache().stats()
+
+
+@svc.api(input=JSON(), output=JSON())
+async def startup_report(_: dict) -> dict:
+    """Cold start phase timings of the API server (and the ``mmap`` runner)."""
+    report = {"api_server": startup.report()}
+    if BACKEND == "mmap":
+        report["runner"] = await model_runner.startup_report.async_run()
+    return report
@@ -0,0 +1,79 @@
+"""Cold start timing for the forecasting service.
+
+Both the API server and the weights runner (see :mod:`models.serving.weights`)
+keep a :class:`StartupTimer`. Its report, served by the service's
+``/startup_report`` endpoint, breaks a process's start into phases:
+
+``boot``
+    process creation until the timer was created (interpreter start-up and
+    the imports that ran before it).
+``model_lookup`` / ``load_weights`` / ``warmup``
+    the phases timed explicitly with :meth:`StartupTimer.phase`.
+
+plus two milestones counted from process creation: ``ready_seconds`` and
+``first_prediction_seconds``. Phases and milestones are also exported as
+``foot_traffic_startup_seconds{process, phase}``.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import psutil
+
+from models.serving.metrics import startup_seconds
+
+
+def process_age() -> float:
+    """Seconds since the current process was created."""
+    return max(time.time() - psutil.Process().create_time(), 0.0)
+
+
+class StartupTimer:
+    """Record how long each phase of a process's start-up takes."""
+
+    def __init__(self, process: str) -> None:
+        self.process = process
+        self.phases: dict = {}
+        self.ready_seconds: Optional[float] = None
+        self.first_prediction_seconds: Optional[float] = None
+        self._created = time.perf_counter()
+        self._offset = process_age()
+        self._record("boot", self._offset)
+
+    def elapsed(self) -> float:
+        """Seconds since the process was created."""
+        return self._offset + time.perf_counter() - self._created
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Record the duration of the enclosed block as phase ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+
+    def mark_ready(self) -> None:
+        if self.ready_seconds is None:
+            self.ready_seconds = self.elapsed()
+            startup_seconds.labels(process=self.process, phase="ready").set(self.ready_seconds)
+
+    def mark_first_prediction(self) -> None:
+        if self.first_prediction_seconds is None:
+            self.first_prediction_seconds = self.elapsed()
+            startup_seconds.labels(process=self.process, phase="first_prediction").set(
+                self.first_prediction_seconds
+            )
+
+    def report(self) -> dict:
+        return {
+            "process": self.process,
+            "phases": dict(self.phases),
+            "ready_seconds": self.ready_seconds,
+            "first_prediction_seconds": self.first_prediction_seconds,
+        }
+
+    def _record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+        startup_seconds.labels(process=self.process, phase=name).set(seconds)
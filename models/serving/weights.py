@@ -0,0 +1,109 @@
+"""Memory-mapped model weights for fast serving cold starts.
+
+``train.py`` registers ``foot_traffic_weights``: the network's ``state_dict``
+saved with ``torch.save`` and its dimensions as model metadata. Serving it
+(``FOOT_TRAFFIC_BACKEND=mmap``) avoids the slow parts of loading the pickled
+``foot_traffic`` model:
+
+* the weights are mapped from the file with ``torch.load(mmap=True)`` instead
+  of read into memory, so runner workers share the page cache;
+* the network is built on the ``meta`` device and the mapped tensors are
+  assigned to it, so no random initial weights are allocated first;
+* torch (and the network code) is imported only in the runner process. The
+  API server sends and receives NumPy arrays and never imports torch.
+
+:class:`WeightsRunnable` runs a synthetic warmup batch at each batch size in
+``warmup_batch_sizes`` before the runner reports ready, so the first real
+request does not pay for lazy initialization inside torch.
+"""
+
+from typing import Sequence
+
+import bentoml
+import numpy as np
+
+from models.serving.startup import StartupTimer
+
+WEIGHTS_MODEL = "foot_traffic_weights"
+WEIGHTS_FILE = "weights.pt"
+
+# BentoML >= 1.2 moved ``Runner`` and ``Runnable`` to ``bentoml.legacy``.
+_legacy = getattr(bentoml, "legacy", bentoml)
+
+
+def save_weights(network, input_dim: int, hidden_dim: int, name: str = WEIGHTS_MODEL):
+    """Register ``network``'s weights in BentoML's model store."""
+    import torch
+
+    metadata = {"input_dim": input_dim, "hidden_dim": hidden_dim}
+    with bentoml.models.create(name, module=__name__, metadata=metadata) as bento_model:
+        torch.save(network.state_dict(), bento_model.path_of(WEIGHTS_FILE))
+    return bento_model
+
+
+def load_network(path: str, input_dim: int, hidden_dim: int):
+    """Rebuild the network around weights memory-mapped from ``path``."""
+    import torch
+
+    from models.lightning.network import feed_forward
+
+    state = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    with torch.device("meta"):
+        network = feed_forward(input_dim, hidden_dim)
+    network.load_state_dict(state, assign=True)
+    return network.eval().requires_grad_(False)
+
+
+class WeightsRunnable(_legacy.Runnable):
+    """Runner that serves memory-mapped weights and warms up before it is ready."""
+
+    SUPPORTED_RESOURCES = ("cpu",)
+    SUPPORTS_CPU_MULTI_THREADING = True
+
+    def __init__(self, path: str, input_dim: int, hidden_dim: int,
+                 warmup_batch_sizes: Sequence[int] = (1,)) -> None:
+        self.timer = StartupTimer("runner")
+        with self.timer.phase("import_torch"):
+            import torch
+        self._torch = torch
+        with self.timer.phase("load_weights"):
+            self.network = load_network(path, input_dim, hidden_dim)
+        with self.timer.phase("warmup"):
+            for rows in warmup_batch_sizes:
+                self._forward(np.zeros((rows, input_dim), dtype=np.float32))
+        self.timer.mark_ready()
+
+    def _forward(self, inputs: np.ndarray) -> np.ndarray:
+        # Deserialized request arrays may be read-only; torch needs them writable.
+        inputs = np.require(inputs, dtype=np.float32, requirements=["C", "W"])
+        with self._torch.inference_mode():
+            return self.network(self._torch.from_numpy(inputs)).numpy()
+
+    @_legacy.Runnable.method(batchable=True, batch_dim=0)
+    def __call__(self, inputs: np.ndarray) -> np.ndarray:
+        outputs = self._forward(inputs)
+        self.timer.mark_first_prediction()
+        return outputs
+
+    @_legacy.Runnable.method(batchable=False)
+    def startup_report(self) -> dict:
+        return self.timer.report()
+
+
+def weights_runner(bento_model, max_batch_size: int, max_latency_ms: int,
+                   warmup_batch_sizes: Sequence[int] = (1,)):
+    """Return a runner serving ``bento_model`` with :class:`WeightsRunnable`."""
+    metadata = bento_model.info.metadata
+    return _legacy.Runner(
+        WeightsRunnable,
+        name=WEIGHTS_MODEL,
+        models=[bento_model],
+        runnable_init_params={
+            "path": bento_model.path_of(WEIGHTS_FILE),
+            "input_dim": metadata["input_dim"],
+            "hidden_dim": metadata["hidden_dim"],
+            "warmup_batch_sizes": tuple(warmup_batch_sizes),
+        },
+        max_batch_size=max_batch_size,
+        max_latency_ms=max_latency_ms,
+    )
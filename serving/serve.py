@@ -1,22 +1,157 @@
 from pathlib import Path
+import atexit
 import os
+import queue
+import threading
+import time
+import pandas as pd
 import yaml
 import whylogs as why
+from whylogs.api.writer.whylabs import WhyLabsWriter
 
 CONFIG_PATH = Path(__file__).resolve().parent.parent / "monitoring" / "whylabs.yaml"
 config = yaml.safe_load(CONFIG_PATH.read_text())
-logger = why.logger(
-    project=config["org_id"],
-    dataset_name=config["dataset_id"],
+writer = WhyLabsWriter(
+    org_id=config["org_id"],
+    dataset_id=config["dataset_id"],
     api_key=os.getenv(config.get("api_key_env", "WHYLABS_API_KEY")),
 )
 
 
+# Queued by ``close`` to wake a worker that is waiting for records.
+_WAKE = object()
+
+
+def records_frame(records: list[dict]) -> pd.DataFrame:
+    """Return ``records`` as a DataFrame with ``features`` split into ``feature_<i>`` columns.
+
+    The column names match the training baseline profile.
+    """
+    frame = pd.DataFrame.from_records(records)
+    if "features" in frame:
+        features = pd.DataFrame(frame.pop("features").tolist(), index=frame.index)
+        frame = pd.concat([features.add_prefix("feature_"), frame], axis=1)
+    return frame
+
+
+class ProfilingPipeline:
+    """Background WhyLabs profiling decoupled from the prediction path.
+
+    ``submit`` places records on a bounded queue and returns immediately. A
+    daemon worker drains the queue in batches of up to ``flush_rows`` records,
+    profiles each batch as one DataFrame with ``why.log(pandas=...)`` and
+    merges the result into a running profile view. The merged view is
+    uploaded through ``writer`` every ``flush_interval`` seconds, or as soon
+    as it holds ``upload_rows`` records, which bounds it under heavy traffic.
+    When the queue is full new records are dropped and counted on ``dropped``
+    instead of blocking the caller.
+    """
+
+    def __init__(self, writer, queue_size: int = 10000, flush_rows: int = 1000,
+                 flush_interval: float = 30.0, upload_rows: int = 100000) -> None:
+        self.writer = writer
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.upload_rows = upload_rows
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._view = None
+        self._rows = 0
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._stop = threading.Event()
+        self._worker: threading.Thread | None = None
+
+    def submit(self, record: dict) -> bool:
+        """Queue ``record`` for profiling, returning ``False`` if it was dropped."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def flush(self) -> int:
+        """Profile pending records, upload the merged profile and return its row count."""
+        self._profile(self._drain())
+        with self._lock:
+            view, rows = self._view, self._rows
+            self._view, self._rows = None, 0
+            self._last_flush = time.monotonic()
+        if view is not None:
+            self.writer.write(file=view)
+        return rows
+
+    def close(self) -> None:
+        """Stop the worker and flush any remaining records."""
+        self._stop.set()
+        if self._worker is not None:
+            try:
+                self._queue.put_nowait(_WAKE)
+            except queue.Full:
+                pass  # the worker is busy and checks the stop flag next
+            self._worker.join()
+        self.flush()
+
+    def _drain(self, limit: int | None = None) -> list[dict]:
+        batch: list[dict] = []
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _profile(self, batch: list[dict]) -> None:
+        batch = [record for record in batch if record is not _WAKE]
+        if not batch:
+            return
+        view = why.log(pandas=records_frame(batch)).view()
+        with self._lock:
+            self._view = view if self._view is None else self._view.merge(view)
+            self._rows += len(batch)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name="whylogs-profiler", daemon=True
+                    )
+                    self._worker.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            elapsed = time.monotonic() - self._last_flush
+            try:
+                first = self._queue.get(timeout=max(self.flush_interval - elapsed, 0.01))
+            except queue.Empty:
+                batch = []
+            else:
+                batch = [first, *self._drain(self.flush_rows - 1)]
+            self._profile(batch)
+            if (self._rows >= self.upload_rows
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self.flush()
+
+
+profiling_config = config.get("profiling") or {}
+profiler = ProfilingPipeline(
+    writer,
+    queue_size=int(profiling_config.get("queue_size", 10000)),
+    flush_rows=int(profiling_config.get("flush_rows", 1000)),
+    flush_interval=float(profiling_config.get("flush_interval_seconds", 30)),
+    upload_rows=int(profiling_config.get("upload_rows", 100000)),
+)
+atexit.register(profiler.close)
+
+
 def predict(features):
-    """Dummy prediction routine that logs inputs and outputs to WhyLabs."""
+    """Dummy prediction routine that profiles inputs and outputs in the background."""
     prediction = sum(features)
-    with logger.session() as session:
-        session.log({"features": features, "prediction": prediction})
+    profiler.submit({"features": features, "prediction": prediction})
     return prediction
 
 
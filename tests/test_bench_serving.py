@@ -0,0 +1,115 @@
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks.bench_serving import (
+    load_log,
+    parse_mix,
+    poisson_offsets,
+    replay_offsets,
+    summarize,
+    synthesize_requests,
+)
+from models.serving.forecast_table import MAX_HORIZON, MODEL_COLUMNS
+
+
+def test_load_log_keeps_only_replayable_requests(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    lines = [
+        {"endpoint": "predict", "payload": {"features": [1.0] * 8}},
+        "not json",
+        {"endpoint": "forecast", "payload": {"cbd_id": "3"}, "offset": 0.25},
+        {"endpoint": "metrics", "payload": {}},
+        {"endpoint": "predict", "payload": [1.0]},
+        {"payload": {"features": []}},
+        ["predict"],
+    ]
+    path.write_text("\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines))
+
+    requests = load_log(str(path))
+
+    assert [r["endpoint"] for r in requests] == ["predict", "forecast"]
+    assert requests[1]["offset"] == 0.25
+    assert load_log(None) == []
+    assert load_log(str(tmp_path / "missing.jsonl")) == []
+
+
+def test_parse_mix():
+    assert parse_mix("predict=0.7, predict_batch=0.2,forecast") == {
+        "predict": 0.7, "predict_batch": 0.2, "forecast": 1.0,
+    }
+    with pytest.raises(ValueError, match="Unknown endpoint"):
+        parse_mix("predict=1,metrics=1")
+
+
+def test_synthesize_requests_follows_the_mix_and_payload_shapes():
+    requests = synthesize_requests(2000, {"predict": 3, "predict_batch": 1, "forecast": 1},
+                                   num_cbds=5, max_batch=4, seed=1)
+
+    assert requests == synthesize_requests(2000, {"predict": 3, "predict_batch": 1, "forecast": 1},
+                                           num_cbds=5, max_batch=4, seed=1)
+    counts = {name: sum(r["endpoint"] == name for r in requests)
+              for name in ("predict", "predict_batch", "forecast")}
+    assert counts["predict"] / 2000 == pytest.approx(0.6, abs=0.05)
+    assert counts["forecast"] / 2000 == pytest.approx(0.2, abs=0.05)
+
+    for request in requests:
+        payload = request["payload"]
+        if request["endpoint"] == "predict":
+            assert len(payload["features"]) == len(MODEL_COLUMNS)
+        elif request["endpoint"] == "predict_batch":
+            assert 1 <= len(payload["features"]) <= 4
+            assert {len(row) for row in payload["features"]} == {len(MODEL_COLUMNS)}
+        else:
+            assert payload["cbd_id"] in {str(i) for i in range(5)}
+            assert 1 <= payload["horizon"] <= MAX_HORIZON
+
+
+def test_poisson_offsets_match_the_rate():
+    offsets = poisson_offsets(20000, rate=50.0, seed=3)
+
+    assert offsets == poisson_offsets(20000, rate=50.0, seed=3)
+    assert offsets[0] == 0.0
+    gaps = np.diff(offsets)
+    assert (gaps > 0).all()
+    assert gaps.mean() == pytest.approx(1 / 50.0, rel=0.05)
+    # Exponential gaps: the standard deviation is close to the mean.
+    assert gaps.std() == pytest.approx(gaps.mean(), rel=0.05)
+
+
+def test_replay_offsets_cycle_the_log():
+    logged = [{"offset": 0.0}, {"offset": 0.5}, {"offset": 1.0}]
+
+    # Each repetition starts one mean gap (0.5 s) after the previous one ends.
+    assert replay_offsets(logged, 7) == [0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0]
+    assert replay_offsets([{}], 3) == [0.0, 0.0, 0.0]
+
+
+def test_summarize_reports_overall_and_per_endpoint_stats():
+    results = [
+        ("predict", 0.010, None),
+        ("predict", 0.030, "HTTP 503"),
+        ("forecast", 0.020, None),
+    ]
+
+    summary = summarize(results, elapsed=2.0)
+
+    assert summary["requests"] == 3
+    assert summary["errors"] == 1
+    assert summary["error_rate"] == pytest.approx(1 / 3)
+    assert summary["throughput_rps"] == pytest.approx(1.5)
+    assert summary["duration_s"] == 2.0
+    assert summary["error_types"] == {"HTTP 503": 1}
+    latency = summary["latency_ms"]
+    assert latency["mean"] == pytest.approx(20.0)
+    assert latency["p50"] == pytest.approx(20.0)
+    assert latency["max"] == pytest.approx(30.0)
+    assert set(latency) == {"mean", "p50", "p90", "p95", "p99", "p99.9", "max"}
+    assert list(summary["endpoints"]) == ["forecast", "predict"]
+    assert summary["endpoints"]["predict"]["latency_ms"]["p50"] == pytest.approx(20.0)
+    assert summary["endpoints"]["forecast"]["errors"] == 0
+
+    empty = summarize([], elapsed=0.0)
+    assert (empty["requests"], empty["error_rate"], empty["throughput_rps"]) == (0, 0.0, 0.0)
+    assert "latency_ms" not in empty
@@ -0,0 +1,456 @@
+import asyncio
+import importlib
+import io
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+import torch
+
+
+def load_service(monkeypatch, model=None):
+    """Import ``models.serving.service`` against a stand-in BentoML module."""
+    model = model or torch.nn.Linear(3, 1)
+    # train.py records the first layer's width as the model's input_dim.
+    input_dim = next(m.in_features for m in model.modules() if isinstance(m, torch.nn.Linear))
+    runner_calls = []
+    runner_kwargs = {}
+    loaded_tags = []
+
+    class DummyRunner:
+        async def async_run(self, inputs):
+            runner_calls.append(inputs)
+            with torch.no_grad():
+                return model(torch.as_tensor(inputs))
+
+    class DummyOnnxRunner:
+        class run:
+            @staticmethod
+            async def async_run(array):
+                runner_calls.append(array)
+                with torch.no_grad():
+                    return model(torch.from_numpy(array)).numpy()
+
+    class DummyModel:
+        def __init__(self, tag):
+            loaded_tags.append(tag)
+            self.tag = tag
+            self.info = types.SimpleNamespace(metadata={"input_dim": input_dim})
+
+        def to_runner(self, **kwargs):
+            runner_kwargs.update(kwargs)
+            return DummyOnnxRunner() if self.tag.startswith("foot_traffic_onnx") else DummyRunner()
+
+    class DummyWeightsRunner(DummyRunner):
+        def __init__(self, runnable_class, name, models, runnable_init_params, **kwargs):
+            runner_kwargs.update(kwargs)
+            self.init_params = runnable_init_params
+
+        class startup_report:
+            @staticmethod
+            async def async_run():
+                return {"process": "runner"}
+
+    class DummyService:
+        def __init__(self, name, runners=None):
+            self.name = name
+            self.runners = runners or []
+            self.startup_hooks = []
+
+        def api(self, **kwargs):
+            return lambda fn: fn
+
+        def on_startup(self, fn):
+            self.startup_hooks.append(fn)
+            return fn
+
+    class DummyBentoModel:
+        def __init__(self, tag):
+            loaded_tags.append(tag)
+            self.tag = tag
+            self.info = types.SimpleNamespace(metadata={"input_dim": input_dim, "hidden_dim": 4})
+
+        def path_of(self, name):
+            return f"/models/{name}"
+
+    class DummyHistogram:
+        def __init__(self, name, **kwargs):
+            self.name = name
+            self.observations = []
+
+        def labels(self, **labels):
+            return types.SimpleNamespace(
+                observe=lambda value: self.observations.append((labels, value)),
+                set=lambda value: self.observations.append((labels, value)),
+            )
+
+    class DummyRunnable:
+        @staticmethod
+        def method(**kwargs):
+            return lambda fn: fn
+
+    dummy_bentoml = types.ModuleType("bentoml")
+    dummy_bentoml.metrics = types.SimpleNamespace(Histogram=DummyHistogram, Gauge=DummyHistogram)
+    dummy_bentoml.models = types.SimpleNamespace(get=DummyBentoModel)
+    dummy_bentoml.Runnable = DummyRunnable
+    dummy_bentoml.Runner = DummyWeightsRunner
+    dummy_bentoml.pytorch = types.SimpleNamespace(get=DummyModel)
+    dummy_bentoml.torchscript = types.SimpleNamespace(get=DummyModel)
+    dummy_bentoml.onnx = types.SimpleNamespace(get=DummyModel)
+    dummy_bentoml.Service = DummyService
+    dummy_io = types.ModuleType("bentoml.io")
+    dummy_io.JSON = lambda **kwargs: None
+    dummy_io.File = lambda **kwargs: None
+    dummy_bentoml.io = dummy_io
+    dummy_exceptions = types.ModuleType("bentoml.exceptions")
+    dummy_exceptions.NotFound = type("NotFound", (Exception,), {})
+    dummy_exceptions.BadInput = type("BadInput", (Exception,), {})
+    dummy_exceptions.ServiceUnavailable = type("ServiceUnavailable", (Exception,), {})
+    dummy_bentoml.exceptions = dummy_exceptions
+
+    monkeypatch.setitem(sys.modules, "bentoml", dummy_bentoml)
+    monkeypatch.setitem(sys.modules, "bentoml.io", dummy_io)
+    monkeypatch.setitem(sys.modules, "bentoml.exceptions", dummy_exceptions)
+    monkeypatch.delitem(sys.modules, "models.serving.service", raising=False)
+    monkeypatch.delitem(sys.modules, "models.serving.metrics", raising=False)
+    monkeypatch.delitem(sys.modules, "models.serving.startup", raising=False)
+    monkeypatch.delitem(sys.modules, "models.serving.weights", raising=False)
+
+    service = importlib.import_module("models.serving.service")
+    service.loaded_tags = loaded_tags
+    return service, model, runner_calls, runner_kwargs
+
+
+def test_runner_configured_for_adaptive_batching(monkeypatch):
+    monkeypatch.setenv("FOOT_TRAFFIC_MAX_BATCH_SIZE", "64")
+    monkeypatch.setenv("FOOT_TRAFFIC_MAX_LATENCY_MS", "5")
+    _, _, _, runner_kwargs = load_service(monkeypatch)
+    assert runner_kwargs == {"max_batch_size": 64, "max_latency_ms": 5}
+
+
+def test_latency_budget_defaults_to_bentoml_default(monkeypatch):
+    monkeypatch.delenv("FOOT_TRAFFIC_MAX_BATCH_SIZE", raising=False)
+    monkeypatch.delenv("FOOT_TRAFFIC_MAX_LATENCY_MS", raising=False)
+    _, _, _, runner_kwargs = load_service(monkeypatch)
+    # A tight budget makes the runner answer 503 instead of queueing.
+    assert runner_kwargs == {"max_batch_size": 256, "max_latency_ms": 60000}
+
+
+def test_predict_batch_matches_single_predictions(monkeypatch):
+    service, model, runner_calls, _ = load_service(monkeypatch)
+    rows = [[1.0, 2.0, 3.0], [0.5, -1.0, 2.0], [0.0, 0.0, 1.0]]
+
+    result = asyncio.run(service.predict_batch(service.TrafficBatchRequest(features=rows)))
+
+    # A single runner call handles the whole batch.
+    assert len(runner_calls) == 1
+    assert runner_calls[0].shape == (3, 3)
+    singles = [
+        asyncio.run(service.predict(service.TrafficRequest(features=row)))["prediction"]
+        for row in rows
+    ]
+    assert result["predictions"] == pytest.approx(singles)
+
+
+def test_predict_batch_empty(monkeypatch):
+    service, _, runner_calls, _ = load_service(monkeypatch)
+    result = asyncio.run(service.predict_batch(service.TrafficBatchRequest(features=[])))
+    assert result == {"predictions": []}
+    assert runner_calls == []
+
+
+@pytest.mark.parametrize("backend, tag", [
+    ("eager", "foot_traffic:latest"),
+    ("torchscript", "foot_traffic_torchscript:latest"),
+    ("int8", "foot_traffic_int8:latest"),
+    ("onnx", "foot_traffic_onnx:latest"),
+    ("mmap", "foot_traffic_weights:latest"),
+])
+def test_backend_selection(monkeypatch, backend, tag):
+    monkeypatch.setenv("FOOT_TRAFFIC_BACKEND", backend)
+    service, model, _, _ = load_service(monkeypatch)
+    assert service.loaded_tags == [tag]
+
+    rows = [[1.0, 2.0, 3.0], [0.5, -1.0, 2.0]]
+    result = asyncio.run(service.predict_batch(service.TrafficBatchRequest(features=rows)))
+    with torch.no_grad():
+        expected = model(torch.tensor(rows)).reshape(-1).tolist()
+    assert result["predictions"] == pytest.approx(expected)
+
+
+def test_unknown_backend_rejected(monkeypatch):
+    monkeypatch.setenv("FOOT_TRAFFIC_BACKEND", "tensorrt")
+    with pytest.raises(ValueError, match="FOOT_TRAFFIC_BACKEND"):
+        load_service(monkeypatch)
+
+
+def _forecast_service(monkeypatch, tmp_path, model=None):
+    from models.lightning.model import FootTrafficModel
+    from models.serving.features import FEATURE_COLUMNS
+    from models.serving.forecast_table import MODEL_COLUMNS
+
+    features = pd.DataFrame({
+        "cbd_id": ["a", "a", "b"],
+        "timestamp": pd.to_datetime(["2024-01-01 00:00", "2024-01-01 01:00", "2024-01-01 00:00"]),
+        "rolling_1h_count": [1.0, 2.0, 3.0],
+        "rolling_24h_count": [10.0, 20.0, 30.0],
+        "temp_lag_1h": [15.0, 16.0, 17.0],
+        "event_attendance": [0.0, 100.0, 0.0],
+        "is_holiday": [False, False, True],
+    })
+    path = tmp_path / "features.parquet"
+    features.to_parquet(path)
+    monkeypatch.setenv("FOOT_TRAFFIC_ONLINE_STORE", str(path))
+    monkeypatch.setenv("FOOT_TRAFFIC_FORECAST_TABLE", str(tmp_path / "forecasts.sqlite"))
+    # Long feature-view TTLs relative to these 2024 rows are not under test here.
+    monkeypatch.setattr("models.serving.features.FEATURE_TTLS",
+                        {column: pd.Timedelta(days=100000) for column in FEATURE_COLUMNS})
+    # Built like train.py builds models trained on the MODEL_COLUMNS vector.
+    model = model or FootTrafficModel(input_dim=len(MODEL_COLUMNS), hidden_dim=8).model
+    service, model, _, _ = load_service(monkeypatch, model=model)
+    return service, model, features
+
+
+def test_forecast_looks_up_features_by_cbd(monkeypatch, tmp_path):
+    from models.serving.forecast_table import horizon_vector
+
+    service, model, _ = _forecast_service(monkeypatch, tmp_path)
+
+    result = asyncio.run(service.forecast(service.ForecastRequest(cbd_id="a")))
+    assert result["source"] == "live"
+    assert result["horizon"] == 1
+    # Forecasts are relative to the time the features were observed.
+    assert result["target_time"] == "2024-01-01T02:00:00"
+    vector = horizon_vector([2.0, 20.0, 16.0, 100.0, 0.0], pd.Timestamp("2024-01-01 01:00"), 1)
+    with torch.no_grad():
+        expected = model(torch.tensor([vector])).item()
+    assert result["prediction"] == pytest.approx(expected)
+
+    asyncio.run(service.forecast(service.ForecastRequest(cbd_id="a")))
+    stats = asyncio.run(service.feature_cache_stats({}))
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    with pytest.raises(sys.modules["bentoml.exceptions"].NotFound):
+        asyncio.run(service.forecast(service.ForecastRequest(cbd_id="missing")))
+
+
+def test_forecast_refuses_live_inference_with_mismatched_model(monkeypatch, tmp_path):
+    from models.lightning.model import FootTrafficModel
+
+    # The 10-input default that train.py used to build.
+    model = FootTrafficModel(hidden_dim=8).model
+    service, _, _ = _forecast_service(monkeypatch, tmp_path, model=model)
+
+    assert service.MODEL_INPUT_DIM == 10
+    with pytest.raises(sys.modules["bentoml.exceptions"].ServiceUnavailable,
+                       match="expects 10 features but /forecast builds 8"):
+        asyncio.run(service.forecast(service.ForecastRequest(cbd_id="a")))
+
+
+def test_forecast_reads_precomputed_table(monkeypatch, tmp_path):
+    from models.serving.forecast_table import forecast_all
+
+    service, model, features = _forecast_service(monkeypatch, tmp_path)
+    forecasts = forecast_all(model, features)
+    service.forecast_table().write(forecasts)
+    monkeypatch.setattr(service, "utcnow", lambda: pd.Timestamp("2024-01-01 00:30"))
+
+    result = asyncio.run(service.forecast(service.ForecastRequest(cbd_id="b", horizon=6)))
+    expected = forecasts.set_index(["cbd_id", "horizon"]).loc[("b", 6), "prediction"]
+    assert result == {"cbd_id": "b", "horizon": 6, "target_time": "2024-01-01T06:00:00",
+                      "prediction": pytest.approx(expected), "source": "table"}
+    assert asyncio.run(service.feature_cache_stats({}))["misses"] == 0
+
+    # Forecasts whose target hour has passed are not served.
+    monkeypatch.setattr(service, "utcnow", lambda: pd.Timestamp("2024-01-01 01:00"))
+    assert asyncio.run(service.forecast(service.ForecastRequest(cbd_id="b", horizon=6)))["source"] == "table"
+    result = asyncio.run(service.forecast(service.ForecastRequest(cbd_id="b", horizon=1)))
+    assert result["source"] == "live"
+    # Live inference uses the same reference time as the table.
+    assert result["target_time"] == "2024-01-01T01:00:00"
+    expected = forecasts.set_index(["cbd_id", "horizon"]).loc[("b", 1), "prediction"]
+    assert result["prediction"] == pytest.approx(expected, rel=1e-5)
+
+    # Neither are forecasts issued more than FORECAST_MAX_AGE ago, however
+    # recently they were written.
+    monkeypatch.setattr(service, "utcnow", lambda: pd.Timestamp("2024-01-01 02:00"))
+    result = asyncio.run(service.forecast(service.ForecastRequest(cbd_id="b", horizon=6)))
+    assert result["source"] == "live"
+
+
+def test_predict_records_stage_metrics(monkeypatch):
+    service, _, _, _ = load_service(monkeypatch)
+    metrics = sys.modules["models.serving.metrics"]
+
+    asyncio.run(service.predict(service.TrafficRequest(features=[1.0, 2.0, 3.0])))
+    asyncio.run(service.predict_batch(service.TrafficBatchRequest(features=[[1.0, 2.0, 3.0]] * 4)))
+
+    stages = [(labels["endpoint"], labels["stage"]) for labels, _ in metrics.stage_seconds.observations]
+    assert stages == [
+        ("predict", "parse"), ("predict", "tensor"), ("predict", "runner"), ("predict", "serialize"),
+        ("predict_batch", "parse"), ("predict_batch", "tensor"), ("predict_batch", "runner"),
+        ("predict_batch", "serialize"),
+    ]
+    assert all(seconds >= 0 for _, seconds in metrics.stage_seconds.observations)
+    assert [value for _, value in metrics.request_batch_size.observations] == [1, 4]
+
+
+def test_mmap_backend_warms_up_at_max_batch_size(monkeypatch):
+    monkeypatch.setenv("FOOT_TRAFFIC_BACKEND", "mmap")
+    monkeypatch.setenv("FOOT_TRAFFIC_MAX_BATCH_SIZE", "64")
+    service, _, _, runner_kwargs = load_service(monkeypatch)
+
+    assert runner_kwargs["max_batch_size"] == 64
+    assert service.model_runner.init_params == {
+        "path": "/models/weights.pt", "input_dim": 3, "hidden_dim": 4,
+        "warmup_batch_sizes": (1, 64),
+    }
+
+
+def test_startup_report_records_ready_and_first_prediction(monkeypatch):
+    monkeypatch.setenv("FOOT_TRAFFIC_BACKEND", "mmap")
+    service, _, _, _ = load_service(monkeypatch)
+
+    report = asyncio.run(service.startup_report({}))["api_server"]
+    assert set(report["phases"]) == {"boot", "model_lookup"}
+    assert report["ready_seconds"] is None
+    assert report["first_prediction_seconds"] is None
+
+    for hook in service.svc.startup_hooks:
+        hook(None)
+    asyncio.run(service.predict(service.TrafficRequest(features=[1.0, 2.0, 3.0])))
+
+    report = asyncio.run(service.startup_report({}))
+    assert report["runner"] == {"process": "runner"}
+    api = report["api_server"]
+    assert 0 < api["phases"]["boot"] <= api["ready_seconds"] <= api["first_prediction_seconds"]
+
+
+def test_predict_binary_accepts_npy_and_arrow(monkeypatch):
+    from models.serving.forecast_table import MODEL_COLUMNS
+
+    width = len(MODEL_COLUMNS)
+    service, _, runner_calls, _ = load_service(monkeypatch, torch.nn.Linear(width, 1))
+    rows = np.arange(2 * width, dtype=np.float32).reshape(2, width) / 4
+    expected = asyncio.run(service.predict_batch(service.TrafficBatchRequest(features=rows.tolist())))
+
+    npy = io.BytesIO()
+    np.save(npy, rows)
+    npy.seek(0)
+    result = np.load(io.BytesIO(asyncio.run(service.predict_binary(npy))))
+    assert result.dtype == np.float32
+    assert result.tolist() == pytest.approx(expected["predictions"])
+    assert runner_calls[-1].shape == (2, width)
+
+    table = pa.table({name: rows[:, i] for i, name in enumerate(MODEL_COLUMNS)})
+    stream = pa.BufferOutputStream()
+    with pa.ipc.new_stream(stream, table.schema) as writer:
+        writer.write_table(table)
+    body = io.BytesIO(stream.getvalue().to_pybytes())
+    result = pa.ipc.open_stream(asyncio.run(service.predict_binary(body))).read_all()
+    assert result.column("prediction").to_pylist() == pytest.approx(expected["predictions"])
+
+
+def test_predict_binary_rejects_malformed_payloads(monkeypatch):
+    from models.serving.forecast_table import MODEL_COLUMNS
+
+    service, _, runner_calls, _ = load_service(monkeypatch, torch.nn.Linear(len(MODEL_COLUMNS), 1))
+    runner_calls.clear()
+    bad_input = sys.modules["bentoml.exceptions"].BadInput
+
+    def npy(array):
+        body = io.BytesIO()
+        np.save(body, array)
+        body.seek(0)
+        return body
+
+    def arrow(table):
+        stream = pa.BufferOutputStream()
+        with pa.ipc.new_stream(stream, table.schema) as writer:
+            writer.write_table(table)
+        return io.BytesIO(stream.getvalue().to_pybytes())
+
+    with pytest.raises(bad_input, match="neither"):
+        asyncio.run(service.predict_binary(io.BytesIO(b'{"features": [[1, 2, 3]]}')))
+    with pytest.raises(bad_input, match="float32"):
+        asyncio.run(service.predict_binary(npy(np.ones((2, len(MODEL_COLUMNS)), dtype=np.float64))))
+    # Wrong widths and column names are rejected before reaching the runner.
+    with pytest.raises(bad_input, match="features per row"):
+        asyncio.run(service.predict_binary(npy(np.ones((2, 3), dtype=np.float32))))
+    renamed = pa.table({f"f{i}": np.ones(2, dtype=np.float32) for i in range(len(MODEL_COLUMNS))})
+    with pytest.raises(bad_input, match="feature columns"):
+        asyncio.run(service.predict_binary(arrow(renamed)))
+    assert runner_calls == []
+
+
+def test_inputs_larger_than_max_batch_are_chunked(monkeypatch):
+    monkeypatch.setenv("FOOT_TRAFFIC_MAX_BATCH_SIZE", "2")
+    service, model, runner_calls, _ = load_service(monkeypatch)
+    rows = np.arange(15, dtype=np.float32).reshape(5, 3)
+
+    result = asyncio.run(service.predict_batch(service.TrafficBatchRequest(features=rows.tolist())))
+
+    assert [len(call) for call in runner_calls] == [2, 2, 1]
+    with torch.no_grad():
+        expected = model(torch.from_numpy(rows)).reshape(-1).tolist()
+    assert result["predictions"] == pytest.approx(expected)
+
+
+def test_oversized_chunks_run_concurrently_in_order(monkeypatch):
+    monkeypatch.setenv("FOOT_TRAFFIC_MAX_BATCH_SIZE", "2")
+    service, _, _, _ = load_service(monkeypatch)
+    events = []
+
+    class SlowRunner:
+        async def async_run(self, inputs):
+            events.append(("start", len(inputs)))
+            # Later chunks finish first; the output order must not change.
+            await asyncio.sleep(0.01 * (3 - len(events)))
+            events.append(("end", len(inputs)))
+            return inputs[:, :1] * 2
+
+    monkeypatch.setattr(service, "model_runner", SlowRunner())
+    rows = np.arange(15, dtype=np.float32).reshape(5, 3)
+
+    result = asyncio.run(service.predict_batch(service.TrafficBatchRequest(features=rows.tolist())))
+
+    assert events[:3] == [("start", 2), ("start", 2), ("start", 1)]
+    assert result["predictions"] == (rows[:, 0] * 2).tolist()
+
+
+def test_dispatcher_can_split_a_call_across_batches(monkeypatch):
+    utils = pytest.importorskip("bentoml._internal.runner.utils")
+    from bentoml._internal.runner.container import AutoContainer
+
+    from models.serving.dispatch import patch_batch_splitting
+
+    monkeypatch.setattr(utils.Params, "iter", utils.Params.iter)
+    payload = utils.Params(AutoContainer.to_payload(np.arange(8, dtype=np.float32).reshape(4, 2), 0))
+    assert patch_batch_splitting()
+
+    # The split the runner makes when a 4-row call only partly fits a batch.
+    first, second = AutoContainer.batch_to_batches(payload, [0, 1, 4], 0)
+    assert AutoContainer.from_payload(first.args[0]).shape == (1, 2)
+    assert AutoContainer.from_payload(second.args[0]).shape == (3, 2)
+
+
+def test_batch_splitting_patch_skips_an_unexpected_params(monkeypatch, caplog):
+    utils = pytest.importorskip("bentoml._internal.runner.utils")
+
+    from models.serving.dispatch import patch_batch_splitting
+
+    def changed_iter(self, extra):  # a changed private API
+        return iter(self.args)
+
+    monkeypatch.setattr(utils.Params, "iter", changed_iter)
+    with caplog.at_level("WARNING", logger="models.serving.dispatch"):
+        assert not patch_batch_splitting()
+    assert utils.Params.iter is changed_iter
+    assert "Not patching" in caplog.text
+
+    monkeypatch.delattr(utils.Params, "iter")
+    assert not patch_batch_splitting()
+    assert "no iter method" in caplog.text
@@ -0,0 +1,91 @@
+import io
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from models.serving.binary import ARROW, NPY, decode_features, encode_predictions
+
+
+def _npy(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+def _arrow(table, file_format=False):
+    sink = pa.BufferOutputStream()
+    new = pa.ipc.new_file if file_format else pa.ipc.new_stream
+    with new(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def test_npy_features_are_a_view_of_the_body():
+    features = np.arange(12, dtype="<f4").reshape(4, 3)
+    body = _npy(features)
+
+    decoded, fmt = decode_features(body)
+    assert fmt == NPY
+    np.testing.assert_array_equal(decoded, features)
+    assert np.shares_memory(decoded, np.frombuffer(body, dtype=np.uint8))
+
+
+def test_npy_shape_and_dtype_are_checked():
+    with pytest.raises(ValueError, match="2-D"):
+        decode_features(_npy(np.zeros(3, dtype="<f4")))
+    with pytest.raises(ValueError, match="float32"):
+        decode_features(_npy(np.zeros((2, 3), dtype=">f4")))
+    with pytest.raises(ValueError, match="bytes of data"):
+        decode_features(_npy(np.zeros((2, 3), dtype="<f4"))[:-4])
+
+
+def test_arrow_list_column_is_zero_copy_and_columns_are_interleaved():
+    features = np.arange(12, dtype="<f4").reshape(4, 3)
+    lists = pa.table({"features": pa.FixedSizeListArray.from_arrays(pa.array(features.reshape(-1)), 3)})
+    body = _arrow(lists, file_format=True)
+
+    decoded, fmt = decode_features(body)
+    assert fmt == ARROW
+    np.testing.assert_array_equal(decoded, features)
+    assert np.shares_memory(decoded, np.frombuffer(body, dtype=np.uint8))
+
+    columns = pa.table({f"f{i}": features[:, i] for i in range(3)})
+    decoded, _ = decode_features(_arrow(columns))
+    np.testing.assert_array_equal(decoded, features)
+
+
+def test_arrow_schema_is_checked():
+    with pytest.raises(ValueError, match="float32 feature columns"):
+        decode_features(_arrow(pa.table({"a": pa.array([1.0], pa.float64())})))
+    with pytest.raises(ValueError, match="nulls"):
+        decode_features(_arrow(pa.table({"a": pa.array([1.0, None], pa.float32())})))
+
+
+def test_width_and_column_names_are_checked():
+    features = np.zeros((2, 3), dtype="<f4")
+    assert decode_features(_npy(features), width=3)[0].shape == (2, 3)
+    with pytest.raises(ValueError, match="Expected 4 features per row, got 3"):
+        decode_features(_npy(features), width=4)
+
+    lists = pa.table({"features": pa.FixedSizeListArray.from_arrays(pa.array(features.reshape(-1)), 3)})
+    with pytest.raises(ValueError, match="Expected 4 features"):
+        decode_features(_arrow(lists), width=4)
+
+    columns = pa.table({name: features[:, i] for i, name in enumerate("abc")})
+    assert decode_features(_arrow(columns), columns=["a", "b", "c"])[0].shape == (2, 3)
+    with pytest.raises(ValueError, match="Expected feature columns"):
+        decode_features(_arrow(columns), columns=["a", "c", "b"])
+    with pytest.raises(ValueError, match="Expected 2 features"):
+        decode_features(_arrow(columns), columns=["a", "b"])
+
+
+@pytest.mark.parametrize("fmt", [NPY, ARROW])
+def test_predictions_round_trip(fmt):
+    predictions = np.array([[0.5], [1.5]], dtype=np.float32)
+    body = encode_predictions(predictions, fmt)
+    if fmt == NPY:
+        decoded = np.load(io.BytesIO(body))
+    else:
+        decoded = pa.ipc.open_stream(body).read_all().column("prediction").to_numpy()
+    np.testing.assert_array_equal(decoded, [0.5, 1.5])
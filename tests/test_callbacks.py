@@ -0,0 +1,49 @@
+import pytorch_lightning as pl
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from models.lightning.callbacks import OptunaPruningCallback, SamplesPerSecond, ThreadsPerRank
+from models.lightning.model import FootTrafficModel
+
+
+class DummyTrial:
+    def __init__(self, prune_after):
+        self.prune_after = prune_after
+        self.reports = []
+
+    def report(self, value, step):
+        self.reports.append((step, value))
+
+    def should_prune(self):
+        return len(self.reports) >= self.prune_after
+
+
+def test_pruning_callback_reports_each_epoch_and_stops():
+    dataset = TensorDataset(torch.randn(16, 4), torch.randn(16, 1))
+    loader = DataLoader(dataset, batch_size=8)
+    trial = DummyTrial(prune_after=2)
+    callback = OptunaPruningCallback(trial)
+
+    trainer = pl.Trainer(max_epochs=10, logger=False, enable_checkpointing=False,
+                         enable_progress_bar=False, enable_model_summary=False,
+                         callbacks=[callback])
+    trainer.fit(FootTrafficModel(input_dim=4, hidden_dim=8), loader, loader)
+
+    assert callback.pruned
+    assert [step for step, _ in trial.reports] == [0, 1]
+    assert trainer.current_epoch < 10
+
+
+def test_samples_per_second_is_logged_every_epoch():
+    dataset = TensorDataset(torch.randn(32, 4), torch.randn(32, 1))
+    threads = torch.get_num_threads()
+    trainer = pl.Trainer(max_epochs=2, logger=False, enable_checkpointing=False,
+                         enable_progress_bar=False, enable_model_summary=False,
+                         callbacks=[SamplesPerSecond(), ThreadsPerRank(1)])
+    try:
+        trainer.fit(FootTrafficModel(input_dim=4, hidden_dim=8), DataLoader(dataset, batch_size=8))
+        assert torch.get_num_threads() == 1
+    finally:
+        torch.set_num_threads(threads)
+
+    assert float(trainer.callback_metrics["samples_per_sec"]) > 0
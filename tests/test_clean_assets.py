@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from dagster import build_asset_context
+
+from dags.assets.clean_assets import clean_data
+from dags.assets.raw_assets import AirbyteOutput, raw_data
+
+
+def test_clean_data_compacts_dtypes_across_chunks(tmp_path):
+    raw = pd.DataFrame(
+        {
+            "timestamp": ["2024-01-01T00:00:00", "2024-01-01T01:00:00", None, "2024-01-01T03:00:00"],
+            "cbd_id": [2, 1, 1, 3],
+            "count": [10.0, 300.0, 5.0, np.nan],
+            "temperature": [20.5, 21.0, 19.5, 18.0],
+            "attendance": [0, 40000, 10, 5],
+        }
+    )
+
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    raw.to_csv(output_dir / "traffic.csv", index=False)
+    resource = AirbyteOutput(base_path=str(output_dir), cache_path=str(tmp_path / "cache"))
+    raw_data(build_asset_context(), airbyte_output=resource)
+
+    context = build_asset_context(asset_config={
+        "chunk_size": 2, "timestamp_format": "ISO8601", "output_path": str(tmp_path / "clean"),
+    })
+    result = clean_data(context, airbyte_output=resource)
+    df = result.value
+
+    # Rows with missing values are dropped.
+    assert df["count"].tolist() == [10, 300]
+    assert df["timestamp"].tolist() == [pd.Timestamp("2024-01-01 00:00"), pd.Timestamp("2024-01-01 01:00")]
+
+    assert df["count"].dtype == np.int16
+    assert df["attendance"].dtype == np.int32
+    assert df["temperature"].dtype == np.float32
+    assert isinstance(df["cbd_id"].dtype, pd.CategoricalDtype)
+    assert list(df["cbd_id"].cat.categories) == [1, 2, 3]
+
+    assert result.metadata["rows_in"].value == 4
+    assert result.metadata["rows_out"].value == 2
+    # The cleaned chunks were written out as they were produced.
+    written = pd.read_parquet(result.metadata["output_path"].value)
+    pd.testing.assert_frame_equal(written.astype({"cbd_id": df["cbd_id"].dtype}), df)
+    assert result.metadata["peak_rss_mb"].value > 0
+    assert result.metadata["output_size_mb"].value > 0
@@ -1,7 +1,18 @@
+import pickle
+import types
+
+import pandas as pd
 import torch
 import pytest
+from torch.utils.data import TensorDataset
 
-from models.lightning.datamodule import FootTrafficDataModule
+from models.lightning.datamodule import (
+    FootTrafficDataModule,
+    RankShard,
+    SlidingWindowDataset,
+    TensorBatchLoader,
+)
+from models.lightning.sharded import ShardedTensorDataset, convert_pt, write_sharded
 
 
 def create_dataset(path, num_samples=10, num_features=4):
@@ -20,3 +31,233 @@ def test_train_dataloader(tmp_path):
     features, targets = batch
     assert features.shape[0] == 2
     assert targets.shape[0] == 2
+
+
+def test_sharded_dataset_matches_pt(tmp_path):
+    data_path = tmp_path / "train.pt"
+    shard_path = tmp_path / "train_shards"
+    create_dataset(data_path, num_samples=10)
+    convert_pt(str(data_path), str(shard_path), shard_size=3)
+
+    x, y = torch.load(data_path)
+    dm = FootTrafficDataModule(str(shard_path), batch_size=4)
+    dm.setup('fit')
+    dataset = dm.train_dataset
+    assert isinstance(dataset, ShardedTensorDataset)
+    assert len(dataset.shards) == 4
+    assert len(dataset) == 10
+    for i in range(10):
+        features, target = dataset[i]
+        assert torch.equal(features, x[i])
+        assert torch.equal(target, y[i])
+
+    # Pickling transfers only the path; the copy maps the same files.
+    clone = pickle.loads(pickle.dumps(dataset))
+    assert len(pickle.dumps(dataset)) < 200
+    assert torch.equal(clone[9][0], x[9])
+
+    features, targets = next(iter(dm.train_dataloader()))
+    assert features.shape == (4, 4)
+    assert targets.shape == (4, 1)
+
+
+@pytest.mark.parametrize("shuffle_mode", ["gather", "block"])
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_tensor_batch_loader_covers_every_row_once(tmp_path, shuffle_mode, prefetch):
+    x = torch.arange(22, dtype=torch.float32).reshape(11, 2)
+    y = torch.arange(11, dtype=torch.float32).reshape(11, 1)
+    write_sharded(x, y, str(tmp_path / "shards"), shard_size=4)
+
+    for dataset in (TensorDataset(x, y), ShardedTensorDataset(str(tmp_path / "shards"))):
+        loader = TensorBatchLoader(dataset, batch_size=3, shuffle=True,
+                                   shuffle_mode=shuffle_mode, prefetch=prefetch)
+        batches = list(loader)
+        assert len(batches) == len(loader) == 4
+        targets = torch.cat([target for _, target in batches]).flatten()
+        assert sorted(targets.tolist()) == list(range(11))
+        for features, target in batches:
+            # Rows stay paired with their targets.
+            assert torch.equal(features[:, 0], target.flatten() * 2)
+
+
+def test_tensor_batch_loader_sequential_batches_are_views():
+    x = torch.randn(10, 4)
+    y = torch.randn(10, 1)
+    batches = list(TensorBatchLoader(TensorDataset(x, y), batch_size=4))
+    assert [len(features) for features, _ in batches] == [4, 4, 2]
+    assert batches[1][0].data_ptr() == x[4].data_ptr()
+
+
+def test_fast_loader_trains_with_lightning(tmp_path):
+    import pytorch_lightning as pl
+    from models.lightning.model import FootTrafficModel
+
+    data_path = tmp_path / "train.pt"
+    create_dataset(data_path, num_samples=20)
+    dm = FootTrafficDataModule(str(data_path), val_path=str(data_path), batch_size=8,
+                               fast_loader=True, prefetch=True)
+    trainer = pl.Trainer(max_epochs=1, logger=False, enable_checkpointing=False,
+                         enable_progress_bar=False, enable_model_summary=False)
+    trainer.fit(FootTrafficModel(input_dim=4, hidden_dim=8), datamodule=dm)
+    assert "val_loss" in trainer.callback_metrics
+
+
+def test_dataset_cache_loads_each_file_once(tmp_path, monkeypatch):
+    data_path = tmp_path / "train.pt"
+    create_dataset(data_path)
+    loads = []
+    original = torch.load
+    monkeypatch.setattr(torch, "load", lambda *a, **kw: loads.append(a[0]) or original(*a, **kw))
+
+    cache = {}
+    for _ in range(3):
+        dm = FootTrafficDataModule(str(data_path), val_path=str(data_path), dataset_cache=cache)
+        dm.setup('fit')
+    assert len(loads) == 1
+    assert dm.train_dataset is cache[str(data_path)]
+
+
+def test_rank_shards_split_rows_evenly_as_views(tmp_path):
+    x = torch.arange(22, dtype=torch.float32).reshape(11, 2)
+    y = torch.arange(11, dtype=torch.float32).reshape(11, 1)
+    write_sharded(x, y, str(tmp_path / "shards"), shard_size=4)
+    dataset = ShardedTensorDataset(str(tmp_path / "shards"))
+
+    ranks = [RankShard(dataset, rank, 3) for rank in range(3)]
+
+    # 11 rows over 3 ranks: 3 rows each, the last 2 are dropped.
+    assert [len(shard) for shard in ranks] == [3, 3, 3]
+    assert [float(ranks[r][i][1]) for r in range(3) for i in range(3)] == list(range(9))
+    # Rank 1 spans the first two shard files without copying either.
+    assert [len(sx) for sx, _ in ranks[1].segments] == [1, 2]
+    assert ranks[1].segments[1][0].data_ptr() == dataset.shards[1][0].data_ptr()
+
+    features, targets = next(iter(TensorBatchLoader(ranks[2], batch_size=3)))
+    assert torch.equal(features, x[6:9])
+    with pytest.raises(ValueError):
+        RankShard(dataset, 3, 3)
+
+
+def test_datamodule_reads_only_its_rank_under_ddp(tmp_path):
+    data_path = tmp_path / "train.pt"
+    create_dataset(data_path, num_samples=10)
+    x, _ = torch.load(data_path)
+
+    dm = FootTrafficDataModule(str(data_path), val_path=str(data_path), batch_size=4)
+    dm.trainer = types.SimpleNamespace(world_size=2, global_rank=1)
+    dm.setup('fit')
+
+    assert len(dm.train_dataset) == len(dm.val_dataset) == 5
+    assert torch.equal(dm.train_dataset[0][0], x[5])
+
+
+def test_sliding_windows_are_views_within_each_cbd():
+    first = (torch.arange(14, dtype=torch.float32).reshape(7, 2), torch.arange(7.0))
+    second = (torch.arange(100, 108, dtype=torch.float32).reshape(4, 2), torch.arange(100.0, 104.0))
+    short = (torch.zeros(2, 2), torch.zeros(2))
+
+    dataset = SlidingWindowDataset([first, short, second], window=3, horizon=2)
+
+    # 7 - 3 - 2 + 1 = 3 samples from the first CBD, none from the others.
+    assert len(dataset) == 3
+    dataset = SlidingWindowDataset([first, short, second], window=2, horizon=1)
+    assert len(dataset) == 5 + 0 + 2
+    features, targets = dataset[4]
+    assert torch.equal(features, first[0][4:6])
+    assert torch.equal(targets, torch.tensor([6.0]))
+    features, targets = dataset[5]
+    assert torch.equal(features, second[0][0:2])
+    assert torch.equal(targets, torch.tensor([102.0]))
+
+    # No window is materialized: every sample shares the series storage.
+    windows, horizons = dataset.segments[0]
+    assert windows.shape == (5, 2, 2)
+    assert windows.untyped_storage().data_ptr() == first[0].untyped_storage().data_ptr()
+    assert horizons.untyped_storage().data_ptr() == first[1].untyped_storage().data_ptr()
+
+    batches = list(TensorBatchLoader(dataset, batch_size=4))
+    assert [len(x) for x, _ in batches] == [4, 3]
+    assert torch.equal(batches[1][0][2], second[0][1:3])
+
+
+def test_sliding_windows_from_tecton_feature_frame():
+    frame = pd.DataFrame({
+        "cbd_id": [1, 1, 1, 1, 2, 2, 2],
+        "timestamp": pd.date_range("2023-01-01", periods=7, freq="h"),
+        "rolling_1h_count": [1.0, 2.0, 3.0, 4.0, 10.0, 20.0, 30.0],
+        "is_holiday": [False, False, True, True, False, False, False],
+    })
+
+    dataset = SlidingWindowDataset.from_frame(frame, ["rolling_1h_count", "is_holiday"],
+                                              "rolling_1h_count", window=2)
+
+    assert len(dataset) == 2 + 1
+    features, target = dataset[2]
+    assert features.dtype == torch.float32
+    assert torch.equal(features, torch.tensor([[10.0, 0.0], [20.0, 0.0]]))
+    assert torch.equal(target, torch.tensor([30.0]))
+
+    with pytest.raises(ValueError, match="sorted"):
+        SlidingWindowDataset.from_frame(frame.iloc[[0, 4, 1]], ["rolling_1h_count"],
+                                        "rolling_1h_count", window=1)
+
+
+def _mark_first_feature(dataset_cache, path):
+    dataset_cache[path].tensors[0][0, 0] = 42.0
+
+
+def test_trial_processes_share_the_parents_datasets(tmp_path):
+    import argparse
+    import multiprocessing.reduction
+
+    import torch.multiprocessing
+
+    import train
+
+    data_path = str(tmp_path / "train.pt")
+    torch.save((torch.zeros(1000, 4), torch.zeros(1000, 1)), data_path)
+    args = argparse.Namespace(train_path=data_path, val_path=None, test_path=None)
+
+    cache = train.process_datasets(args)
+
+    features = cache[data_path].tensors[0]
+    assert features.is_shared()
+    # Shared tensors are pickled as handles, not as their data.
+    assert len(multiprocessing.reduction.ForkingPickler.dumps(cache)) < features.nbytes
+    worker = torch.multiprocessing.get_context("spawn").Process(
+        target=_mark_first_feature, args=(cache, data_path))
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+    assert features[0, 0] == 42.0
+
+
+def test_sqlite_storage_is_limited_to_local_low_parallelism(tmp_path, monkeypatch):
+    import sys
+
+    import train
+
+    def parse(*argv):
+        monkeypatch.setattr(sys, "argv", ["train.py", "--train-path", "train.pt", *argv])
+        return train.parse_args()
+
+    monkeypatch.delenv("RAY_ADDRESS", raising=False)
+    assert parse("--n-jobs", str(train.SQLITE_MAX_JOBS)).n_jobs == train.SQLITE_MAX_JOBS
+    with pytest.raises(SystemExit):
+        parse("--n-jobs", str(train.SQLITE_MAX_JOBS + 1))
+    assert parse("--n-jobs", "16", "--storage", "postgresql://optuna@db/optuna").n_jobs == 16
+
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: object())  # Ray "installed"
+    assert parse("--backend", "ray").backend == "ray"  # a local instance
+    with pytest.raises(SystemExit):
+        parse("--backend", "ray", "--ray-address", "ray://head:10001")
+    monkeypatch.setenv("RAY_ADDRESS", "ray://head:10001")
+    with pytest.raises(SystemExit):
+        parse("--backend", "ray")
+
+    # Workers sharing a SQLite study wait for its lock instead of failing.
+    storage = train.optuna_storage(f"sqlite:///{tmp_path / 'optuna.db'}")
+    with storage.engine.connect() as connection:
+        busy_ms = connection.exec_driver_sql("PRAGMA busy_timeout").scalar()
+    assert busy_ms == train.SQLITE_BUSY_TIMEOUT * 1000
+    assert train.optuna_storage("postgresql://optuna@db/optuna") == "postgresql://optuna@db/optuna"
@@ -0,0 +1,87 @@
+import argparse
+import types
+
+import pytest
+import pytorch_lightning as pl
+import torch
+from pytorch_lightning.strategies import DDPStrategy
+
+from models.lightning.callbacks import SamplesPerSecond, ThreadsPerRank
+from models.lightning.datamodule import FootTrafficDataModule
+from models.lightning.distributed import threads_per_process, trainer_kwargs
+from models.lightning.model import FootTrafficModel
+
+
+def test_single_process_keeps_default_strategy():
+    kwargs = trainer_kwargs(1, threads=3)
+
+    assert "strategy" not in kwargs
+    assert kwargs["devices"] == 1
+    threads, throughput = kwargs["callbacks"]
+    assert isinstance(threads, ThreadsPerRank) and threads.threads == 3
+    assert isinstance(throughput, SamplesPerSecond)
+
+
+def test_ddp_uses_gloo_spawned_ranks_with_a_share_of_the_cores(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+
+    kwargs = trainer_kwargs(3)
+
+    assert kwargs["devices"] == 3
+    assert isinstance(kwargs["strategy"], DDPStrategy)
+    assert kwargs["strategy"].process_group_backend == "gloo"
+    assert kwargs["use_distributed_sampler"] is False
+    assert kwargs["callbacks"][0].threads == threads_per_process(3) == 2
+    with pytest.raises(ValueError):
+        trainer_kwargs(2, strategy="fsdp")
+
+
+def test_ddp_fit_returns_trained_weights(tmp_path):
+    torch.save((torch.randn(64, 4), torch.randn(64, 1)), tmp_path / "train.pt")
+    model = FootTrafficModel(input_dim=4, hidden_dim=8)
+    before = [p.detach().clone() for p in model.parameters()]
+
+    trainer = pl.Trainer(max_epochs=1, logger=False, enable_checkpointing=False,
+                         enable_progress_bar=False, enable_model_summary=False,
+                         **trainer_kwargs(2, threads=1))
+    path = str(tmp_path / "train.pt")
+    trainer.fit(model, datamodule=FootTrafficDataModule(path, val_path=path, batch_size=8,
+                                                        fast_loader=True))
+
+    # Weights trained in the spawned ranks are loaded back into this process.
+    assert any(not torch.equal(a, b) for a, b in zip(before, model.parameters()))
+    assert float(trainer.callback_metrics["samples_per_sec"]) > 0
+    assert "val_loss" in trainer.callback_metrics
+
+
+@pytest.mark.parametrize("num_processes, strategy, retrained", [
+    (1, "auto", False), (2, "auto", True), (1, "ddp", True),
+])
+def test_distributed_final_fit_implies_retrain(tmp_path, monkeypatch, num_processes, strategy,
+                                               retrained):
+    import train
+
+    torch.save((torch.randn(16, 4), torch.randn(16, 1)), tmp_path / "train.pt")
+    checkpoint = tmp_path / "trial.pt"
+    torch.save(FootTrafficModel(input_dim=4, hidden_dim=8).model.state_dict(), checkpoint)
+    best = types.SimpleNamespace(params={"hidden_dim": 8, "lr": 1e-3},
+                                 user_attrs={"input_dim": 4, "checkpoint": str(checkpoint)})
+    args = argparse.Namespace(
+        train_path=str(tmp_path / "train.pt"), val_path=None, test_path=None, batch_size=8,
+        fast_loader=True, prefetch=False, max_epochs=1, retrain=False,
+        num_processes=num_processes, strategy=strategy, threads_per_process=1,
+    )
+    fits = []
+
+    class RecordingTrainer:
+        def __init__(self, **kwargs):
+            self.callback_metrics = {}
+
+        def fit(self, model, datamodule):
+            fits.append(model)
+
+    monkeypatch.setattr(pl, "Trainer", RecordingTrainer)
+
+    model = train.build_final_model(args, best)
+
+    assert fits == ([model] if retrained else [])
@@ -0,0 +1,33 @@
+import pytest
+import torch
+from torch import nn
+
+from models.serving.export import build_inference_artifacts, check_parity
+
+
+def make_model():
+    torch.manual_seed(0)
+    return nn.Sequential(nn.Linear(10, 64), nn.ReLU(), nn.Linear(64, 1))
+
+
+def test_artifacts_match_eager_model():
+    model = make_model()
+    example = torch.randn(128, 10)
+
+    artifacts = build_inference_artifacts(model, example)
+
+    assert set(artifacts) == {"torchscript", "int8"}
+    assert artifacts["torchscript"][1] < 1e-5
+    assert artifacts["int8"][1] < 5e-2
+    # Traced artifacts keep a dynamic batch dimension.
+    rows = torch.randn(3, 10)
+    scripted, _ = artifacts["torchscript"]
+    with torch.no_grad():
+        assert torch.allclose(scripted(rows), model(rows), atol=1e-6)
+        assert artifacts["int8"][0](rows).shape == (3, 1)
+
+
+def test_check_parity_rejects_drift():
+    reference = torch.tensor([[1.0], [2.0]])
+    with pytest.raises(ValueError, match="int8"):
+        check_parity("int8", reference, reference * 1.5)
@@ -0,0 +1,129 @@
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from models.serving.features import FEATURE_COLUMNS, FeatureCache, FrameOnlineStore
+
+NOW = pd.Timestamp("2024-03-01 12:00")
+
+
+class Clock:
+    def __init__(self, start: pd.Timestamp):
+        self.now = start.tz_localize("UTC").timestamp()
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingStore(FrameOnlineStore):
+    def __init__(self, features):
+        super().__init__(features)
+        self.lookups = 0
+
+    def get_latest(self, cbd_id, as_of=None):
+        self.lookups += 1
+        return super().get_latest(cbd_id, as_of)
+
+
+def make_features(timestamps, cbd_ids=None):
+    cbd_ids = cbd_ids or ["a"] * len(timestamps)
+    n = len(timestamps)
+    return pd.DataFrame({
+        "cbd_id": cbd_ids,
+        "timestamp": pd.to_datetime(timestamps),
+        **{column: [float(i + 1) for i in range(n)] for column in FEATURE_COLUMNS},
+    })
+
+
+def test_hits_skip_the_store():
+    store = CountingStore(make_features([NOW - timedelta(hours=1)]))
+    cache = FeatureCache(store, clock=Clock(NOW))
+
+    first = cache.get("a")
+    second = cache.get("a")
+
+    assert first == second == [1.0] * len(FEATURE_COLUMNS)
+    assert store.lookups == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_ttl():
+    store = CountingStore(make_features([NOW - timedelta(hours=1)]))
+    clock = Clock(NOW)
+    cache = FeatureCache(store, ttl=60, clock=clock)
+
+    cache.get("a")
+    clock.now += 61
+    cache.get("a")
+
+    assert store.lookups == 2
+    assert cache.misses == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    store = CountingStore(make_features([NOW] * 3, cbd_ids=["a", "b", "c"]))
+    cache = FeatureCache(store, max_entries=2, clock=Clock(NOW))
+
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")  # "b" is now least recently used
+    cache.get("c")
+
+    assert cache.stats()["size"] == 2
+    cache.get("a")
+    assert store.lookups == 3
+    cache.get("b")
+    assert store.lookups == 4
+
+
+def test_feature_view_ttl_honoured():
+    # 10 days old: the 7 day views have expired, the 30 and 365 day ones not.
+    store = CountingStore(make_features([NOW - timedelta(days=10)]))
+    clock = Clock(NOW)
+    cache = FeatureCache(store, ttl=3600, fill_value=-1.0, clock=clock)
+
+    vector = dict(zip(FEATURE_COLUMNS, cache.get("a")))
+
+    assert vector == {
+        "rolling_1h_count": -1.0,
+        "rolling_24h_count": -1.0,
+        "temp_lag_1h": -1.0,
+        "event_attendance": 1.0,
+        "is_holiday": 1.0,
+    }
+
+
+def test_entry_expires_with_its_features():
+    # The 7 day views expire 30 seconds from now, before the cache TTL.
+    observed = NOW - timedelta(days=7) + timedelta(seconds=30)
+    store = CountingStore(make_features([observed]))
+    clock = Clock(NOW)
+    cache = FeatureCache(store, ttl=3600, clock=clock)
+
+    assert cache.get("a")[0] == 1.0
+    clock.now += 31
+    assert cache.get("a")[0] == 0.0
+    assert store.lookups == 2
+
+
+def test_as_of_lookup_and_unknown_cbd():
+    store = FrameOnlineStore(make_features([NOW - timedelta(hours=2), NOW - timedelta(hours=1)]))
+    cache = FeatureCache(store, clock=Clock(NOW))
+
+    assert cache.get("a", NOW - timedelta(minutes=90))[0] == 1.0
+    assert cache.get("a")[0] == 2.0
+    with pytest.raises(KeyError):
+        cache.get("a", NOW - timedelta(hours=3))
+    with pytest.raises(KeyError):
+        cache.get("z")
+
+
+def test_lookup_reports_when_features_were_observed():
+    store = CountingStore(make_features([NOW - timedelta(hours=2), NOW - timedelta(hours=1)]))
+    cache = FeatureCache(store, clock=Clock(NOW))
+
+    assert cache.lookup("a") == ([2.0] * len(FEATURE_COLUMNS), NOW - timedelta(hours=1))
+    assert cache.lookup("a")[1] == NOW - timedelta(hours=1)
+    assert cache.lookup("a", NOW - timedelta(minutes=90))[1] == NOW - timedelta(hours=2)
+    assert store.lookups == 2
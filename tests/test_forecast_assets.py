@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from dagster import build_asset_context
+
+from dags.assets.forecast_assets import forecast_table
+from features.calendar import holiday_flags
+from models.serving.features import FEATURE_COLUMNS
+from models.serving.forecast_table import (MODEL_COLUMNS, ForecastTable, forecast_all,
+                                          horizon_inputs, horizon_vector)
+
+
+def make_features(num_cbds=4, hours=6, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range("2024-01-05 12:00", periods=hours, freq="h")
+    frame = pd.DataFrame({
+        "cbd_id": np.repeat(np.arange(num_cbds), hours),
+        "timestamp": np.tile(timestamps, num_cbds),
+    })
+    for column in FEATURE_COLUMNS:
+        frame[column] = rng.normal(size=len(frame))
+    frame["is_holiday"] = False
+    return frame.sample(frac=1.0, random_state=seed)
+
+
+def test_forecast_all_matches_per_row_predictions():
+    torch.manual_seed(0)
+    model = torch.nn.Linear(len(MODEL_COLUMNS), 1)
+    features = make_features()
+
+    forecasts = forecast_all(model, features, max_horizon=24)
+
+    assert len(forecasts) == 4 * 24
+    assert forecasts["horizon"].tolist() == list(range(1, 25)) * 4
+    latest = features.sort_values("timestamp").groupby("cbd_id").tail(1).set_index("cbd_id")
+    for row in forecasts.sample(10, random_state=0).itertuples():
+        base = latest.loc[int(row.cbd_id)]
+        target = base["timestamp"] + pd.Timedelta(hours=row.horizon)
+        assert row.target_time == target
+        vector = horizon_vector(base[FEATURE_COLUMNS].astype(float).tolist(), base["timestamp"],
+                                row.horizon)
+        with torch.no_grad():
+            expected = model(torch.tensor([vector], dtype=torch.float32)).item()
+        assert row.prediction == pytest.approx(expected, rel=1e-5)
+    # 2024-01-06 is a Saturday or a holiday depending on the calendar in use.
+    weekend = forecasts["target_time"] >= pd.Timestamp("2024-01-06")
+    assert (holiday_flags(forecasts.loc[weekend, "target_time"])).all()
+    # The horizons of one CBD share its features but not their inputs.
+    assert forecasts.groupby("cbd_id")["prediction"].nunique().eq(24).all()
+
+
+def test_horizon_inputs_describe_the_target_hour():
+    features = pd.DataFrame({"timestamp": pd.to_datetime(["2024-01-05 22:00"] * 3)})
+    for column in FEATURE_COLUMNS:
+        features[column] = 1.0
+    features.loc[1, "rolling_1h_count"] = np.nan
+
+    inputs = horizon_inputs(features, [1, 2, 26], fill_value=-1.0)
+
+    assert inputs.dtype == np.float32 and inputs.shape == (3, len(MODEL_COLUMNS))
+    columns = pd.DataFrame(inputs, columns=MODEL_COLUMNS)
+    assert columns["rolling_1h_count"].tolist() == [1.0, -1.0, 1.0]
+    assert columns["horizon"].tolist() == [1.0, 2.0, 26.0]
+    # 23:00 and midnight, then 2024-01-07 00:00, which is a Sunday.
+    angles = 2 * np.pi * np.array([23, 0, 0]) / 24
+    np.testing.assert_allclose(columns["target_hour_sin"], np.sin(angles), atol=1e-6)
+    np.testing.assert_allclose(columns["target_hour_cos"], np.cos(angles), atol=1e-6)
+    assert columns["is_holiday"].tolist()[2] == 1.0
+
+
+def test_forecast_table_asset_writes_indexed_table(tmp_path):
+    path = tmp_path / "online.sqlite"
+    context = build_asset_context(
+        partition_key="2024-01-05",
+        asset_config={"table_path": str(path), "max_horizon": 3},
+    )
+    model = torch.nn.Linear(len(MODEL_COLUMNS), 1)
+
+    result = forecast_table(context, tecton_features=make_features(), trained_model=model)
+
+    assert result.metadata["rows"].value == 12
+    table = ForecastTable(path)
+    assert table.count() == 12
+    row = table.get("2", 3)
+    assert row["issued_at"] == pd.Timestamp("2024-01-05 17:00")
+    assert row["target_time"] == pd.Timestamp("2024-01-05 20:00")
+    assert table.get("2", 4) is None
+
+
+def test_forecast_table_keeps_newer_forecasts_on_backfill(tmp_path):
+    model = torch.nn.Linear(len(MODEL_COLUMNS), 1)
+    features = make_features()
+    newer = forecast_all(model, features, max_horizon=2)
+    older = forecast_all(model, features[features["timestamp"] < "2024-01-05 15:00"], max_horizon=2)
+    older["prediction"] = -1.0
+    table = ForecastTable(tmp_path / "t.sqlite")
+
+    table.write(newer)
+    table.write(older, created_at=1e12)
+
+    row = table.get("0", 1)
+    assert row["issued_at"] == pd.Timestamp("2024-01-05 17:00")
+    assert row["prediction"] != -1.0
+    assert row["created_at"] < 1e12
+
+    # Served rows must target a future hour and be recently issued.
+    assert table.get("0", 1, now=pd.Timestamp("2024-01-05 17:30")) is not None
+    assert table.get("0", 1, now=pd.Timestamp("2024-01-05 18:00")) is None
+    assert table.get("0", 2, now=pd.Timestamp("2024-01-05 18:00"), max_age=1800) is None
+    assert table.get("0", 2, now=pd.Timestamp("2024-01-05 18:00"), max_age=3600) is not None
+
+
+def test_forecast_table_rejects_mismatched_model(tmp_path):
+    context = build_asset_context(
+        partition_key="2024-01-05", asset_config={"table_path": str(tmp_path / "t.sqlite")}
+    )
+    with pytest.raises(ValueError, match="expects 10 features"):
+        forecast_table(context, tecton_features=make_features(), trained_model=torch.nn.Linear(10, 1))
+
+
+def test_forecast_table_runs_a_model_trained_by_train_py(tmp_path, monkeypatch):
+    import sys
+
+    import optuna
+
+    import train
+    from training.dataset import build_training_set
+
+    features = make_features(num_cbds=3, hours=12)
+    x, y = build_training_set(features)
+    # Every pair of rows of a CBD h hours apart is an example for horizon h.
+    assert x.shape == (3 * sum(range(12)), len(MODEL_COLUMNS))
+    horizons = x[:, MODEL_COLUMNS.index("horizon")]
+    assert sorted(set(horizons.tolist())) == [float(h) for h in range(1, 12)]
+    assert (horizons == 11).sum() == 3
+    torch.save((x, y), tmp_path / "train.pt")
+
+    monkeypatch.setenv("WANDB_MODE", "disabled")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", [
+        "train.py", "--train-path", str(tmp_path / "train.pt"),
+        "--val-path", str(tmp_path / "train.pt"), "--max-epochs", "1", "--wandb-offline",
+        "--checkpoint-dir", str(tmp_path / "checkpoints"),
+    ])
+    args = train.parse_args()
+    study = optuna.create_study()
+    study.optimize(lambda trial: train.objective(trial, args, {}), n_trials=1)
+    model = train.build_final_model(args, study.best_trial).model
+
+    context = build_asset_context(
+        partition_key="2024-01-05",
+        asset_config={"table_path": str(tmp_path / "online.sqlite"), "max_horizon": 2},
+    )
+    result = forecast_table(context, tecton_features=features, trained_model=model)
+
+    assert result.metadata["rows"].value == 3 * 2
+    assert result.value["prediction"].notna().all()
@@ -0,0 +1,73 @@
+import pandas as pd
+import prometheus_client
+from dagster import Output, build_asset_context
+
+from dags.assets import instrumentation
+from dags.assets.instrumentation import PeakMemorySampler, instrumented
+
+
+def test_instrumented_adds_runtime_metadata(monkeypatch):
+    monkeypatch.delenv(instrumentation.PUSHGATEWAY_ENV, raising=False)
+
+    @instrumented
+    def frame_asset(context):
+        return Output(pd.DataFrame({"a": [1, 2, 3]}), metadata={"source": "test"})
+
+    result = frame_asset(build_asset_context())
+
+    assert result.value["a"].tolist() == [1, 2, 3]
+    assert result.metadata["source"].value == "test"
+    assert result.metadata["rows"].value == 3
+    assert result.metadata["duration_seconds"].value >= 0
+    assert result.metadata["peak_rss_mb"].value > 0
+
+
+def test_instrumented_pushes_to_gateway(monkeypatch):
+    pushed = []
+
+    def fake_push(gateway, job, registry, grouping_key):
+        samples = {s.name: s.value for metric in registry.collect() for s in metric.samples}
+        pushed.append((gateway, job, grouping_key, samples))
+
+    monkeypatch.setattr(prometheus_client, "push_to_gateway", fake_push)
+    monkeypatch.setenv(instrumentation.PUSHGATEWAY_ENV, "pushgateway:9091")
+
+    @instrumented
+    def model_asset(context):
+        return object()
+
+    result = model_asset(build_asset_context())
+
+    assert "rows" not in result.metadata
+    [(gateway, job, grouping_key, samples)] = pushed
+    assert gateway == "pushgateway:9091"
+    assert job == instrumentation.PUSH_JOB
+    assert grouping_key == {"asset": "model_asset"}
+    assert samples["foot_traffic_asset_peak_rss_bytes"] > 0
+    assert "foot_traffic_asset_rows" not in samples
+
+
+def test_push_failure_does_not_fail_asset(monkeypatch):
+    def failing_push(*args, **kwargs):
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(prometheus_client, "push_to_gateway", failing_push)
+    monkeypatch.setenv(instrumentation.PUSHGATEWAY_ENV, "pushgateway:9091")
+
+    @instrumented
+    def frame_asset(context):
+        return pd.DataFrame({"a": [1]})
+
+    assert frame_asset(build_asset_context()).metadata["rows"].value == 1
+
+
+def test_peak_memory_sampler_sees_allocations():
+    with PeakMemorySampler(interval=0.001) as baseline:
+        pass
+    with PeakMemorySampler(interval=0.001) as sampler:
+        block = bytearray(64 * 2**20)
+        block[::4096] = b"x" * len(block[::4096])
+        del block
+
+    assert sampler.peak >= baseline.peak
+    assert sampler.peak > 0
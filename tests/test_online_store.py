@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from dags.assets.tecton_features import TectonClient, compute_tecton_features
+from features.online_store import FEATURE_VIEWS, SQLiteOnlineStore
+from models.serving.features import FEATURE_COLUMNS, FeatureCache, FrameOnlineStore
+
+
+def make_features(num_cbds=5, hours=48, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range("2024-01-01", periods=hours, freq="h")
+    frame = pd.DataFrame({
+        "cbd_id": np.repeat([f"cbd-{i}" for i in range(num_cbds)], hours),
+        "timestamp": np.tile(timestamps, num_cbds),
+    })
+    for column in FEATURE_COLUMNS:
+        frame[column] = rng.normal(size=len(frame))
+    return frame.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def test_upsert_and_latest_lookup(tmp_path):
+    features = make_features()
+    store = SQLiteOnlineStore(tmp_path / "online.sqlite", batch_size=17)
+
+    assert store.upsert(features) == len(features)
+    assert store.count("weather_lag") == len(features)
+    assert store.count("weather_lag", latest=True) == 5
+
+    frame_store = FrameOnlineStore(features)
+    for cbd_id in ["cbd-0", "cbd-3"]:
+        assert store.get_latest(cbd_id) == frame_store.get_latest(cbd_id)
+        as_of = pd.Timestamp("2024-01-01 12:30")
+        assert store.get_latest(cbd_id, as_of) == frame_store.get_latest(cbd_id, as_of)
+    assert store.get_latest("unknown") is None
+
+
+def test_upsert_overwrites_keys_and_keeps_newest(tmp_path):
+    store = SQLiteOnlineStore(tmp_path / "online.sqlite")
+    features = make_features(num_cbds=1, hours=3)
+    store.upsert(features)
+
+    # Re-pushing an older row updates history but not the latest row.
+    older = features.nsmallest(1, "timestamp").assign(rolling_1h_count=42.0)
+    store.upsert(older)
+    row = store.get_latest("cbd-0")
+    assert row["rolling_1h_count"][0] == features["timestamp"].max()
+    assert store.get_latest("cbd-0", older["timestamp"].iloc[0])["rolling_1h_count"][1] == 42.0
+    assert store.count("foot_traffic_rolling_counts") == 3
+
+    # Missing values are stored as NULL and the store persists across connections.
+    newer = features.nlargest(1, "timestamp").assign(timestamp=pd.Timestamp("2024-02-01"),
+                                                     temp_lag_1h=np.nan)
+    store.upsert(newer)
+    store.close()
+    row = SQLiteOnlineStore(tmp_path / "online.sqlite").get_latest("cbd-0")
+    assert row["temp_lag_1h"] == (pd.Timestamp("2024-02-01"), None)
+
+
+def test_push_then_serve(tmp_path):
+    data = pd.DataFrame({
+        "timestamp": pd.to_datetime(["2024-01-01 00:00", "2024-01-01 01:00", "2024-01-01 00:30"]),
+        "cbd_id": [1, 1, 2],
+        "count": [1, 2, 3],
+        "temperature": [10.0, 11.0, 12.0],
+        "attendance": [100, 0, 50],
+    })
+    path = tmp_path / "online.sqlite"
+    client = TectonClient(online_store_path=str(path))
+    features = compute_tecton_features(data, client)
+
+    assert client.last_pushed is features
+    store = SQLiteOnlineStore(path)
+    assert store.count("holiday_flag", latest=True) == 2
+    now = pd.Timestamp("2024-01-02", tz="UTC").timestamp()
+    vector = FeatureCache(store, clock=lambda: now).get("1")
+    assert vector == [3.0, 3.0, 10.0, 100.0, 0.0]
+    assert set(FEATURE_VIEWS) == {
+        "foot_traffic_rolling_counts", "weather_lag", "event_attendance", "holiday_flag",
+    }
@@ -0,0 +1,49 @@
+import pandas as pd
+from dagster import FilesystemIOManager, materialize
+
+from dags.assets.clean_assets import clean_data
+from dags.assets.raw_assets import AirbyteOutput, raw_data
+from dags.assets.tecton_features import TectonClient, compute_tecton_features, tecton_features
+
+
+def test_partitioned_features_use_lookback_and_emit_own_window(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # clean_data writes its output under data/clean
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    timestamps = pd.date_range("2024-01-01 12:00", "2024-01-02 12:00", freq="3h")
+    data = pd.DataFrame(
+        {
+            "timestamp": timestamps.strftime("%Y-%m-%d %H:%M:%S"),
+            "cbd_id": 1,
+            "count": range(1, len(timestamps) + 1),
+            "temperature": 20.0,
+            "attendance": 10,
+        }
+    )
+    data.to_csv(output_dir / "traffic.csv", index=False)
+
+    resources = {
+        "airbyte_output": AirbyteOutput(base_path=str(output_dir), cache_path=str(tmp_path / "cache")),
+        "tecton": TectonClient(),
+        "io_manager": FilesystemIOManager(base_dir=str(tmp_path / "storage")),
+    }
+    assets = [raw_data, clean_data, tecton_features]
+    materialize(assets, partition_key="2024-01-01", resources=resources)
+    result = materialize(assets, partition_key="2024-01-02", resources=resources)
+    assert result.success
+    clean = pd.read_parquet(tmp_path / "data" / "clean" / "2024-01-02.parquet")
+    assert clean["timestamp"].min() == pd.Timestamp("2024-01-02 00:00")
+    metadata = result.asset_materializations_for_node("tecton_features")[0].metadata
+    assert metadata["push_rows"].value == 5
+
+    features = result.output_for_node("tecton_features")
+    # Only the partition's own rows are emitted...
+    assert features["timestamp"].min() == pd.Timestamp("2024-01-02 00:00")
+    assert features["timestamp"].max() == pd.Timestamp("2024-01-02 12:00")
+
+    # ...but their windows include the previous day's rows.
+    clean = data.assign(timestamp=pd.to_datetime(data["timestamp"]))
+    expected = compute_tecton_features(clean, TectonClient())
+    expected = expected[expected["timestamp"] >= pd.Timestamp("2024-01-02")]
+    assert features["rolling_24h_count"].tolist() == expected["rolling_24h_count"].tolist()
+    assert features["temp_lag_1h"].notna().all()
@@ -0,0 +1,115 @@
+import os
+import time
+
+import pandas as pd
+from dagster import build_asset_context
+
+from dags.assets.raw_assets import AirbyteOutput, IngestionManifest, raw_data
+
+
+def test_raw_data_reparses_only_new_or_changed_files(tmp_path):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    pd.DataFrame({"cbd_id": [1, 2], "count": [10, 20]}).to_csv(output_dir / "a.csv", index=False)
+    pd.DataFrame({"cbd_id": [3], "count": [30]}).to_json(output_dir / "b.json")
+
+    resource = AirbyteOutput(base_path=str(output_dir), cache_path=str(tmp_path / "cache"))
+
+    first = raw_data(build_asset_context(), airbyte_output=resource)
+    assert first.metadata["files_parsed"].value == 2
+    assert first.value["count"].tolist() == [10, 20, 30]
+
+    second = raw_data(build_asset_context(), airbyte_output=resource)
+    assert second.metadata["files_parsed"].value == 0
+    pd.testing.assert_frame_equal(second.value, first.value, check_dtype=False)
+
+    # Touching a file without changing it only costs a hash, not a parse.
+    stat = os.stat(output_dir / "a.csv")
+    os.utime(output_dir / "a.csv", (stat.st_atime, stat.st_mtime + 10))
+    assert raw_data(build_asset_context(), airbyte_output=resource).metadata["files_parsed"].value == 0
+
+    pd.DataFrame({"cbd_id": [1, 2], "count": [11, 21]}).to_csv(output_dir / "a.csv", index=False)
+    pd.DataFrame({"cbd_id": [4], "count": [40]}).to_csv(output_dir / "c.csv", index=False)
+    third = raw_data(build_asset_context(), airbyte_output=resource)
+    assert third.metadata["files_parsed"].value == 2
+    assert third.value["count"].tolist() == [11, 21, 30, 40]
+
+
+def test_raw_data_restores_a_deleted_cache_file_once(tmp_path):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    pd.DataFrame({"cbd_id": [1, 2], "count": [10, 20]}).to_csv(output_dir / "a.csv", index=False)
+    cache_dir = tmp_path / "cache"
+    resource = AirbyteOutput(base_path=str(output_dir), cache_path=str(cache_dir))
+    raw_data(build_asset_context(), airbyte_output=resource)
+
+    (cache_file,) = cache_dir.glob("a.csv.*.parquet")
+    cache_file.unlink()
+
+    # The file is unchanged, so it is re-cached under the same name and kept.
+    assert raw_data(build_asset_context(), airbyte_output=resource).metadata["files_parsed"].value == 1
+    assert cache_file.exists()
+    assert raw_data(build_asset_context(), airbyte_output=resource).metadata["files_parsed"].value == 0
+
+
+def test_concurrent_runs_keep_each_others_manifest_entries_and_caches(tmp_path):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    for name, count in [("a.csv", 10), ("b.csv", 20)]:
+        pd.DataFrame({"cbd_id": [1], "count": [count]}).to_csv(output_dir / name, index=False)
+    frames = {name: pd.read_csv(output_dir / name) for name in ("a.csv", "b.csv")}
+
+    # Two partition runs take their snapshot before either has saved.
+    first, second = IngestionManifest(cache_dir), IngestionManifest(cache_dir)
+    entry_a = first.store(output_dir / "a.csv", frames["a.csv"])
+    entry_b = second.store(output_dir / "b.csv", frames["b.csv"])
+    with first.update():
+        first.record("a.csv", entry_a)
+        first.prune(["a.csv", "b.csv"])
+    with second.update():
+        second.record("b.csv", entry_b)
+        second.prune(["a.csv", "b.csv"])
+
+    assert set(IngestionManifest(cache_dir).entries) == {"a.csv", "b.csv"}
+    assert not list(cache_dir.glob(".manifest-*"))
+
+    # A superseded cache survives the grace period for runs still reading it.
+    pd.DataFrame({"cbd_id": [1], "count": [11]}).to_csv(output_dir / "a.csv", index=False)
+    reader = IngestionManifest(cache_dir)
+    resource = AirbyteOutput(base_path=str(output_dir), cache_path=str(cache_dir))
+    assert raw_data(build_asset_context(), airbyte_output=resource).value["count"].tolist() == [11, 20]
+    assert reader.load(output_dir / "a.csv")["count"].tolist() == [10]
+
+    old = cache_dir / entry_a["cache"]
+    past = time.time() - 2 * resource.cache_grace_seconds
+    os.utime(old, (past, past))
+    with IngestionManifest(cache_dir).update():
+        pass
+    assert not old.exists()
+    assert (cache_dir / entry_b["cache"]).exists()
+
+
+def test_partition_runs_load_only_files_overlapping_their_window(tmp_path):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    for name, timestamps in [("a.csv", ["2024-01-01 05:00", "2024-01-01 23:00"]),
+                             ("b.csv", ["2024-01-02 01:00", "2024-01-02 02:00"]),
+                             ("c.csv", ["2024-01-01 22:00", "2024-01-02 00:00"])]:
+        pd.DataFrame({"cbd_id": [1, 2], "timestamp": timestamps}).to_csv(output_dir / name, index=False)
+    cache_dir = tmp_path / "cache"
+    resource = AirbyteOutput(base_path=str(output_dir), cache_path=str(cache_dir))
+    raw_data(build_asset_context(), airbyte_output=resource)
+
+    entry = IngestionManifest(cache_dir).entries["c.csv"]
+    assert (entry["min_timestamp"], entry["max_timestamp"]) == ("2024-01-01T22:00:00", "2024-01-02T00:00:00")
+
+    result = raw_data(build_asset_context(partition_key="2024-01-02"), airbyte_output=resource)
+    assert result.metadata["files_loaded"].value == 2
+    assert result.value["timestamp"].tolist() == ["2024-01-02 01:00", "2024-01-02 02:00", "2024-01-02 00:00"]
+
+    # No file overlaps: the result is empty but keeps the columns.
+    result = raw_data(build_asset_context(partition_key="2024-01-05"), airbyte_output=resource)
+    assert result.metadata["files_loaded"].value == 1
+    assert result.value.empty and "timestamp" in result.value.columns
@@ -0,0 +1,244 @@
+import argparse
+import os
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from torch.utils.data import TensorDataset
+
+from dags.assets.tecton_features import TectonClient, compute_tecton_features
+from models.lightning.sharded import ShardedTensorDataset, write_sharded
+from training.ray_backend import init_ray, map_tasks
+
+
+class FakeObjectRef:
+    def __init__(self, value):
+        self.value = value
+
+
+def make_fake_ray():
+    """Serial stand-in for ``ray`` that records ``init``, ``put`` and task calls."""
+    ray = types.ModuleType("ray")
+    ray.init_calls, ray.puts, ray.tasks = [], [], []
+
+    def init(**kwargs):
+        ray.init_calls.append(kwargs)
+
+    def put(value):
+        ray.puts.append(value)
+        return FakeObjectRef(value)
+
+    def remote(num_cpus=1):
+        def wrap(fn):
+            def submit(*args):
+                # Like Ray, top-level object refs are resolved before the call.
+                args = [arg.value if isinstance(arg, FakeObjectRef) else arg for arg in args]
+                ray.tasks.append((fn.__name__, num_cpus))
+                return FakeObjectRef(fn(*args))
+
+            return types.SimpleNamespace(remote=submit)
+
+        return wrap
+
+    ray.is_initialized = lambda: bool(ray.init_calls)
+    ray.init = init
+    ray.put = put
+    ray.remote = remote
+    ray.get = lambda refs: [ref.value for ref in refs]
+    return ray
+
+
+@pytest.fixture
+def ray(monkeypatch):
+    fake = make_fake_ray()
+    monkeypatch.setitem(sys.modules, "ray", fake)
+    monkeypatch.delenv("RAY_ADDRESS", raising=False)
+    return fake
+
+
+def test_init_ray_starts_local_instance_once(ray):
+    init_ray(num_cpus=4, local_mode=True)
+    init_ray(num_cpus=8)
+
+    (call,) = ray.init_calls
+    assert (call["num_cpus"], call["local_mode"]) == (4, True)
+    # Local workers can import the repository from any working directory.
+    pythonpath = call["runtime_env"]["env_vars"]["PYTHONPATH"]
+    assert (Path(pythonpath.split(os.pathsep)[0]) / "train.py").exists()
+
+
+def test_init_ray_connects_to_cluster_address(ray, monkeypatch):
+    monkeypatch.setenv("RAY_ADDRESS", "ray://head:10001")
+
+    init_ray(num_cpus=4)
+
+    # Cluster resources are not overridden from the client, and the workers
+    # receive the repository and its requirements.
+    (call,) = ray.init_calls
+    assert call.keys() == {"address", "runtime_env"}
+    assert call["address"] == "ray://head:10001"
+    env = call["runtime_env"]
+    assert (Path(env["working_dir"]) / "training" / "ray_backend.py").exists()
+    assert Path(env["pip"]).name == "requirements.txt"
+    assert "*.pt" in env["excludes"]
+
+
+def test_init_ray_accepts_a_prebuilt_cluster_image(ray):
+    init_ray("ray://head:10001", runtime_env={})
+
+    assert ray.init_calls == [{"address": "ray://head:10001", "runtime_env": {}}]
+
+
+def test_map_tasks_puts_shared_value_once(ray):
+    shared = {"rows": [1, 2, 3]}
+
+    results = map_tasks(lambda data, scale: sum(data["rows"]) * scale, [(1,), (2,), (3,)],
+                        shared=shared, num_cpus=2)
+
+    assert results == [6, 12, 18]
+    assert ray.puts == [shared]
+    assert [cpus for _, cpus in ray.tasks] == [2, 2, 2]
+
+
+def test_ray_features_match_single_process(ray):
+    rng = np.random.default_rng(2)
+    offsets = np.sort(rng.integers(0, 4 * 24 * 60, size=300))
+    data = pd.DataFrame(
+        {
+            "timestamp": pd.Timestamp("2023-01-01") + pd.to_timedelta(offsets, unit="min"),
+            "cbd_id": rng.integers(1, 7, size=300),
+            "count": rng.integers(0, 50, size=300),
+            "temperature": rng.normal(20, 5, size=300),
+            "attendance": rng.integers(0, 500, size=300),
+        }
+    )
+    expected = compute_tecton_features(data, TectonClient())
+
+    client = TectonClient()
+    features = compute_tecton_features(data, client, num_workers=3, executor="ray")
+
+    pd.testing.assert_frame_equal(features, expected)
+    assert [(c["num_cpus"], c["local_mode"]) for c in ray.init_calls] == [(3, False)]
+    assert len(ray.tasks) > 1
+    assert {name for name, _ in ray.tasks} == {"_build_features"}
+
+
+def test_unknown_feature_executor_is_rejected():
+    with pytest.raises(ValueError, match="executor"):
+        compute_tecton_features(pd.DataFrame(), TectonClient(), executor="threads")
+
+
+def test_trials_run_as_ray_tasks_on_shared_datasets(ray, tmp_path, monkeypatch):
+    import train
+
+    x, y = torch.randn(8, 3), torch.randn(8, 1)
+    torch.save((x, y), tmp_path / "train.pt")
+    args = argparse.Namespace(
+        train_path=str(tmp_path / "train.pt"), val_path=None, test_path=None,
+        n_trials=5, n_jobs=2, threads_per_trial=3,
+        ray_address=None, ray_num_cpus=6, ray_local_mode=False,
+    )
+    runs = []
+    monkeypatch.setattr(train, "run_trials",
+                        lambda args, n_trials, dataset_cache: runs.append((n_trials, dataset_cache)))
+
+    train.run_trials_ray(args)
+
+    assert [(c["num_cpus"], c["local_mode"]) for c in ray.init_calls] == [(6, False)]
+    assert ray.tasks == [("_ray_trials", 3), ("_ray_trials", 3)]
+    assert [n for n, _ in runs] == [3, 2]
+    # The dataset was put in the object store once, as NumPy arrays.
+    assert len(ray.puts) == 1
+    (features, targets), = ray.puts[0].values()
+    for _, cache in runs:
+        dataset = cache[args.train_path]
+        assert isinstance(dataset, TensorDataset)
+        # Every task wraps the shared arrays without copying them.
+        assert dataset.tensors[0].data_ptr() == features.ctypes.data
+        assert torch.equal(dataset.tensors[1], y)
+
+
+def test_sharded_trial_datasets_are_passed_by_absolute_path(ray, tmp_path, monkeypatch):
+    import train
+
+    write_sharded(torch.randn(8, 3), torch.randn(8, 1), str(tmp_path / "train"), shard_size=4)
+    monkeypatch.chdir(tmp_path)
+    args = argparse.Namespace(
+        train_path="train", val_path=None, test_path=None,
+        n_trials=2, n_jobs=1, threads_per_trial=1,
+        ray_address=None, ray_num_cpus=1, ray_local_mode=False,
+    )
+    runs = []
+    monkeypatch.setattr(train, "run_trials",
+                        lambda args, n_trials, dataset_cache: runs.append(dataset_cache))
+
+    train.run_trials_ray(args)
+
+    assert ray.puts == [{"train": str(tmp_path / "train")}]
+    (cache,) = runs
+    assert isinstance(cache["train"], ShardedTensorDataset)
+
+    # A node without the shared volume fails with a clear message.
+    with pytest.raises(FileNotFoundError, match="every node"):
+        train._ray_trials({"train": str(tmp_path / "missing")}, args, 1)
+
+
+@pytest.fixture
+def ray_cluster(tmp_path, monkeypatch):
+    """A real two-CPU Ray instance on this machine (no ``local_mode``)."""
+    real_ray = pytest.importorskip("ray")
+    monkeypatch.delenv("RAY_ADDRESS", raising=False)
+    # Workers inherit the environment and working directory of the driver.
+    monkeypatch.setenv("WANDB_MODE", "disabled")
+    monkeypatch.chdir(tmp_path)
+    init_ray(num_cpus=2)
+    yield real_ray
+    real_ray.shutdown()
+
+
+def test_map_tasks_on_a_local_cluster(ray_cluster):
+    shared = np.arange(4.0)
+
+    results = map_tasks(lambda values, factor: values * factor, [(2.0,), (3.0,)], shared=shared)
+
+    assert [r.tolist() for r in results] == [[0, 2, 4, 6], [0, 3, 6, 9]]
+
+
+def test_trials_run_on_a_local_cluster(ray_cluster, tmp_path, monkeypatch):
+    import optuna
+
+    import train
+
+    torch.save((torch.randn(16, 3), torch.randn(16, 1)), tmp_path / "train.pt")
+    storage = f"sqlite:///{tmp_path / 'optuna.db'}"
+    monkeypatch.setattr(sys, "argv", [
+        "train.py", "--train-path", str(tmp_path / "train.pt"),
+        "--val-path", str(tmp_path / "train.pt"), "--max-epochs", "1", "--n-trials", "2",
+        "--n-jobs", "2", "--threads-per-trial", "1", "--backend", "ray", "--storage", storage, "--checkpoint-dir", str(tmp_path / "checkpoints"),
+    ])
+    args = train.parse_args()
+    optuna.create_study(study_name=args.study_name, storage=storage, load_if_exists=True)
+
+    train.run_trials_ray(args)
+
+    study = optuna.load_study(study_name=args.study_name, storage=storage)
+    trials = study.get_trials(states=[optuna.trial.TrialState.COMPLETE])
+    assert len(trials) == 2
+    assert all(Path(trial.user_attrs["checkpoint"]).exists() for trial in trials)
+
+
+def test_ray_backend_requires_ray(monkeypatch):
+    import train
+
+    monkeypatch.setitem(sys.modules, "ray", None)  # import ray fails
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+    monkeypatch.setattr(sys, "argv", ["train.py", "--train-path", "train.pt", "--backend", "ray"])
+
+    with pytest.raises(SystemExit):
+        train.parse_args()
+    with pytest.raises(ImportError, match="requirements-ray.txt"):
+        init_ray()
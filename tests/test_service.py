@@ -1,28 +1,153 @@
+import importlib
 import sys
+import time
 import types
 
+import pandas as pd
+import pytest
+
+
+class FakeView:
+    """Stand-in profile: row count and column sums, mergeable like a whylogs view."""
+
+    def __init__(self, rows, sums):
+        self.rows, self.sums = rows, sums
+
+    def merge(self, other):
+        sums = {column: self.sums.get(column, 0) + other.sums.get(column, 0)
+                for column in {*self.sums, *other.sums}}
+        return FakeView(self.rows + other.rows, sums)
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    frames, uploads = [], []
+
+    def log(pandas):
+        frames.append(pandas)
+        return types.SimpleNamespace(view=lambda: FakeView(len(pandas), pandas.sum().to_dict()))
+
+    class DummyWriter:
+        def __init__(self, **kwargs):
+            pass
+
+        def write(self, file):
+            uploads.append(file)
+
+    why = types.ModuleType("whylogs")
+    why.log = log
+    whylabs = types.ModuleType("whylogs.api.writer.whylabs")
+    whylabs.WhyLabsWriter = DummyWriter
+    monkeypatch.setitem(sys.modules, "whylogs", why)
+    monkeypatch.setitem(sys.modules, "whylogs.api", types.ModuleType("whylogs.api"))
+    monkeypatch.setitem(sys.modules, "whylogs.api.writer", types.ModuleType("whylogs.api.writer"))
+    monkeypatch.setitem(sys.modules, "whylogs.api.writer.whylabs", whylabs)
+    monkeypatch.delitem(sys.modules, "serving.serve", raising=False)
+    module = importlib.import_module("serving.serve")
+    module.frames, module.uploads, module.DummyWriter = frames, uploads, DummyWriter
+    yield module
+    module.profiler.close()
+
 
 def test_predict_logs_and_returns_sum(monkeypatch):
     logs = []
 
-    class DummyLogger:
-        def session(self):
-            class Session:
-                def __enter__(self_inner):
-                    return self_inner
-                def __exit__(self_inner, exc_type, exc, tb):
-                    pass
-                def log(self_inner, data):
-                    logs.append(data)
-            return Session()
-
-    dummy_why = types.SimpleNamespace(logger=lambda **kwargs: DummyLogger())
+    def log(pandas):
+        logs.extend(pandas.to_dict("records"))
+        return types.SimpleNamespace(view=lambda: FakeView(len(pandas), {}))
+
+    class DummyWriter:
+        def __init__(self, **kwargs):
+            pass
+
+        def write(self, file):
+            pass
+
+    dummy_why = types.SimpleNamespace(log=log)
+    whylabs = types.SimpleNamespace(WhyLabsWriter=DummyWriter)
     monkeypatch.setitem(sys.modules, 'whylogs', dummy_why)
+    monkeypatch.setitem(sys.modules, 'whylogs.api', types.ModuleType('whylogs.api'))
+    monkeypatch.setitem(sys.modules, 'whylogs.api.writer', types.ModuleType('whylogs.api.writer'))
+    monkeypatch.setitem(sys.modules, 'whylogs.api.writer.whylabs', whylabs)
+    monkeypatch.delitem(sys.modules, 'serving.serve', raising=False)
 
-    import importlib
     serve = importlib.import_module('serving.serve')
 
     result = serve.predict([1, 2, 3])
     assert result == 6
+    serve.profiler.flush()
     assert logs[0]['prediction'] == 6
-    assert logs[0]['features'] == [1, 2, 3]
+    # Profiled as a DataFrame, so the features are one column each.
+    assert [logs[0][f'feature_{i}'] for i in range(3)] == [1, 2, 3]
+    serve.profiler.close()
+
+
+def test_predict_profiles_and_returns_sum(serve):
+    result = serve.predict([1, 2, 3])
+    assert result == 6
+    assert serve.profiler.flush() == 1
+
+    (view,) = serve.uploads
+    assert view.rows == 1
+    assert view.sums == {"feature_0": 1, "feature_1": 2, "feature_2": 3, "prediction": 6}
+
+
+def test_profiler_drops_when_queue_full(serve):
+    profiler = serve.ProfilingPipeline(serve.DummyWriter(), queue_size=2, flush_rows=100,
+                                       flush_interval=60)
+    profiler._ensure_worker = lambda: None  # keep the queue full deterministically
+    assert profiler.submit({"prediction": 1})
+    assert profiler.submit({"prediction": 2})
+    assert not profiler.submit({"prediction": 3})
+    assert profiler.dropped == 1
+
+    assert profiler.flush() == 2
+    # The pending records were profiled as one DataFrame.
+    (frame,) = serve.frames
+    assert frame["prediction"].tolist() == [1, 2]
+    assert serve.uploads[-1].sums == {"prediction": 3}
+    assert profiler.flush() == 0
+    assert len(serve.uploads) == 1
+
+
+def test_worker_merges_batches_into_one_upload(serve):
+    profiler = serve.ProfilingPipeline(serve.DummyWriter(), flush_rows=2, flush_interval=60)
+    start_worker, profiler._ensure_worker = profiler._ensure_worker, lambda: None
+    for value in range(5):
+        profiler.submit({"features": [value, 1], "prediction": value})
+
+    start_worker()
+    deadline = time.monotonic() + 10
+    while profiler._rows < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # The worker profiled batches of at most ``flush_rows`` records ...
+    assert [len(frame) for frame in serve.frames] == [2, 2, 1]
+    assert all(isinstance(frame, pd.DataFrame) for frame in serve.frames)
+    # ... and only uploads the merged profile when it is flushed.
+    assert serve.uploads == []
+    profiler.close()
+    (view,) = serve.uploads
+    assert view.rows == 5
+    assert view.sums == {"feature_0": 10, "feature_1": 5, "prediction": 10}
+
+
+def test_worker_uploads_once_upload_rows_are_merged(serve):
+    profiler = serve.ProfilingPipeline(serve.DummyWriter(), flush_rows=2, flush_interval=60,
+                                       upload_rows=4)
+    start_worker, profiler._ensure_worker = profiler._ensure_worker, lambda: None
+    for value in range(5):
+        profiler.submit({"prediction": value})
+
+    start_worker()
+    deadline = time.monotonic() + 10
+    while not serve.uploads and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # Uploaded long before flush_interval, and the merged view starts over.
+    (view,) = serve.uploads
+    assert view.rows == 5
+    assert view.sums == {"prediction": 10}
+    assert profiler._rows == 0
+    profiler.close()
+    assert len(serve.uploads) == 1
@@ -1,6 +1,14 @@
+import numpy as np
 import pandas as pd
+import pytest
 
-from dags.assets.tecton_features import TectonClient, compute_tecton_features
+from dags.assets.tecton_features import (
+    FeatureWindowState,
+    TectonClient,
+    compute_tecton_features,
+    window_starts,
+    window_sum,
+)
 
 
 def test_tecton_features_pipeline():
@@ -48,3 +56,146 @@ def test_tecton_features_pipeline():
 
     # The Tecton client should receive the produced features
     pd.testing.assert_frame_equal(client.last_pushed, features)
+
+
+def _synthetic_clean_data(num_rows=200, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2023-01-01")
+    offsets = np.sort(rng.integers(0, 4 * 24 * 60, size=num_rows))
+    return pd.DataFrame(
+        {
+            "timestamp": start + pd.to_timedelta(offsets, unit="min"),
+            "cbd_id": rng.integers(1, 4, size=num_rows),
+            "count": rng.integers(0, 50, size=num_rows),
+            "temperature": rng.normal(20, 5, size=num_rows),
+            "attendance": rng.integers(0, 500, size=num_rows),
+        }
+    )
+
+
+def test_incremental_features_match_full_recompute(tmp_path):
+    data = _synthetic_clean_data()
+    expected = compute_tecton_features(data, TectonClient())
+    expected = expected.reset_index(drop=True)
+
+    state_path = tmp_path / "state.parquet"
+    deltas = []
+    for bounds in np.array_split(np.arange(len(data)), 5):
+        chunk = data.iloc[bounds]
+        state = FeatureWindowState.load(state_path)
+        deltas.append(compute_tecton_features(chunk, TectonClient(), state=state))
+        state.save(state_path)
+
+    incremental = (
+        pd.concat(deltas, ignore_index=True)
+        .sort_values(["cbd_id", "timestamp"], kind="stable")
+        .reset_index(drop=True)
+    )
+    pd.testing.assert_frame_equal(incremental, expected, check_dtype=False)
+
+    # Retained state only spans the longest window per CBD.
+    state = FeatureWindowState.load(state_path)
+    span = state.tail.groupby("cbd_id")["timestamp"].agg(lambda s: s.max() - s.min())
+    assert (span <= pd.Timedelta("24h")).all()
+
+
+def test_incremental_skips_rows_at_or_before_watermark():
+    data = _synthetic_clean_data(num_rows=50)
+    state = FeatureWindowState()
+    compute_tecton_features(data, TectonClient(), state=state)
+    replay = compute_tecton_features(data, TectonClient(), state=state)
+    assert replay.empty
+
+
+def test_window_kernel_matches_pandas_rolling():
+    data = _synthetic_clean_data(num_rows=500, seed=1)
+    # Duplicate timestamps and missing values exercise the window edges.
+    data = pd.concat([data, data.iloc[::7]], ignore_index=True)
+    data.loc[data.index[::11], "temperature"] = np.nan
+    data = data.sort_values(["cbd_id", "timestamp"], kind="stable").reset_index(drop=True)
+
+    codes = pd.factorize(data["cbd_id"])[0].astype(np.int64)
+    timestamps = data["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    for window in ["1h", "24h"]:
+        starts = window_starts(codes, timestamps, pd.Timedelta(window))
+        for column in ["count", "temperature"]:
+            expected = (
+                data.groupby("cbd_id")
+                .rolling(window, on="timestamp", closed="both")[column]
+                .sum()
+                .to_numpy()
+            )
+            np.testing.assert_allclose(window_sum(data[column].to_numpy(), starts), expected)
+
+
+def test_window_starts_splits_keys_that_would_overflow():
+    # A span of ~2**61 ns leaves room for only a few groups per int64 key.
+    codes = np.repeat(np.arange(7), 3)
+    timestamps = np.tile([0, 2**61, 2**61 + 5], 7).astype(np.int64)
+    starts = window_starts(codes, timestamps, pd.Timedelta(10))
+
+    group_first = np.repeat(np.arange(7) * 3, 3)
+    expected = group_first + np.tile([0, 1, 1], 7)
+    np.testing.assert_array_equal(starts, expected)
+
+
+def test_sharded_features_match_single_process():
+    data = _synthetic_clean_data(num_rows=300, seed=2)
+    expected = compute_tecton_features(data, TectonClient())
+
+    client = TectonClient()
+    sharded = compute_tecton_features(data, client, num_workers=3)
+
+    pd.testing.assert_frame_equal(sharded, expected)
+    pd.testing.assert_frame_equal(client.last_pushed, expected)
+
+
+def test_push_features_chunks_in_order():
+    features = compute_tecton_features(_synthetic_clean_data(num_rows=1000), TectonClient())
+    client = TectonClient(chunk_rows=128, max_workers=4)
+
+    stats = client.push_features(features)
+
+    assert [len(chunk) for chunk in client.pushed_chunks] == [128] * 7 + [104]
+    pd.testing.assert_frame_equal(pd.concat(client.pushed_chunks), features)
+    assert stats["rows"] == 1000
+    assert stats["chunks"] == 8
+    assert stats["retries"] == 0
+    assert stats["rows_per_second"] > 0
+    assert client.last_push_stats is stats
+
+
+def test_push_features_byte_sized_chunks():
+    features = compute_tecton_features(_synthetic_clean_data(num_rows=1000), TectonClient())
+    row_bytes = features.memory_usage(deep=True, index=False).sum() / len(features)
+    client = TectonClient(chunk_bytes=int(row_bytes * 100))
+
+    client.push_features(features)
+
+    assert max(len(chunk) for chunk in client.pushed_chunks) <= 100
+    assert sum(len(chunk) for chunk in client.pushed_chunks) == 1000
+
+
+def test_push_features_retries_failed_chunks(monkeypatch):
+    features = compute_tecton_features(_synthetic_clean_data(num_rows=300), TectonClient())
+    attempts = {}
+    send = TectonClient._send_chunk
+
+    def flaky(self, index, chunk):
+        attempts[index] = attempts.get(index, 0) + 1
+        if attempts[index] == 1 and index % 2 == 0:
+            raise ConnectionError("transient")
+        send(self, index, chunk)
+
+    monkeypatch.setattr(TectonClient, "_send_chunk", flaky)
+    client = TectonClient(chunk_rows=100, backoff_seconds=0.0)
+
+    stats = client.push_features(features)
+
+    assert stats["retries"] == 2
+    pd.testing.assert_frame_equal(pd.concat(client.pushed_chunks), features)
+
+    failing = TectonClient(chunk_rows=100, max_retries=0, backoff_seconds=0.0)
+    attempts.clear()
+    with pytest.raises(ConnectionError):
+        failing.push_features(features)
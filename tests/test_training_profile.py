@@ -0,0 +1,125 @@
+import importlib
+import pickle
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from models.lightning.sharded import write_sharded
+
+
+class FakeView:
+    """Stand-in profile: row count and column sums, mergeable like a whylogs view."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def merge(self, other):
+        merged = dict(self.stats)
+        for column, (count, total) in other.stats.items():
+            seen, running = merged.get(column, (0, 0.0))
+            merged[column] = (seen + count, running + total)
+        return FakeView(merged)
+
+    def serialize(self):
+        return pickle.dumps(self.stats)
+
+    @classmethod
+    def deserialize(cls, data):
+        return cls(pickle.loads(data))
+
+    def write(self, path):
+        with open(path, "wb") as fh:
+            fh.write(self.serialize())
+
+
+def fake_log(pandas):
+    stats = {column: (len(pandas), float(pandas[column].sum())) for column in pandas.columns}
+    return types.SimpleNamespace(view=lambda: FakeView(stats))
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    why = types.ModuleType("whylogs")
+    why.log = fake_log
+    core = types.ModuleType("whylogs.core")
+    core.DatasetProfileView = FakeView
+    monkeypatch.setitem(sys.modules, "whylogs", why)
+    monkeypatch.setitem(sys.modules, "whylogs.core", core)
+    monkeypatch.delitem(sys.modules, "training.profiling", raising=False)
+    monkeypatch.delitem(sys.modules, "training.train", raising=False)
+    module = importlib.import_module("training.profiling")
+    yield module
+    module._open.cache_clear()
+
+
+@pytest.fixture
+def tensors(tmp_path):
+    x = torch.arange(60, dtype=torch.float32).reshape(30, 2)
+    y = torch.arange(30, dtype=torch.float32).reshape(30, 1)
+    path = tmp_path / "train.pt"
+    torch.save((x, y), path)
+    return x, y, str(path)
+
+
+@pytest.mark.parametrize("workers, mp_context", [(1, "spawn"), (2, "fork")])
+def test_chunked_profile_matches_full_data(profiling, tensors, workers, mp_context):
+    x, y, path = tensors
+    assert len(profiling.plan_chunks(path, 7)) == 5
+
+    view = profiling.profile_dataset(path, chunk_rows=7, workers=workers, mp_context=mp_context)
+
+    assert view.stats == {
+        "feature_0": (30, float(x[:, 0].sum())),
+        "feature_1": (30, float(x[:, 1].sum())),
+        "target": (30, float(y.sum())),
+    }
+
+
+def test_sharded_and_parquet_sources(profiling, tensors, tmp_path):
+    x, y, _ = tensors
+    write_sharded(x, y, str(tmp_path / "shards"), shard_size=8)
+    view = profiling.profile_dataset(str(tmp_path / "shards"), chunk_rows=5, workers=1)
+    assert view.stats["target"] == (30, float(y.sum()))
+
+    frame = pd.DataFrame({"cbd_id": np.arange(25) % 3, "count": np.arange(25.0)})
+    frame.to_parquet(tmp_path / "features.parquet", row_group_size=10)
+    assert len(profiling.plan_chunks(str(tmp_path / "features.parquet"), 4)) == 3
+    view = profiling.profile_dataset(str(tmp_path / "features.parquet"), chunk_rows=4, workers=1)
+    assert view.stats["count"] == (25, float(frame["count"].sum()))
+
+
+def test_sampled_profile_is_bounded_by_budget(profiling, tensors):
+    x, _, path = tensors
+    view = profiling.profile_dataset(path, chunk_rows=4, workers=1, sample_rows=6, seed=1)
+    count, total = view.stats["feature_0"]
+    assert count == 6
+    # Six distinct rows of the dataset: bounded by the smallest and largest six.
+    values = np.sort(x[:, 0].numpy())
+    assert values[:6].sum() <= total <= values[-6:].sum()
+
+
+def test_reservoir_merge_is_proportional_to_rows_seen(profiling):
+    rng = np.random.default_rng(0)
+    left = (pd.DataFrame({"side": np.zeros(10)}), 900)
+    right = (pd.DataFrame({"side": np.ones(10)}), 100)
+
+    from_right = [profiling.merge_reservoirs(left, right, 10, rng)[0]["side"].sum() for _ in range(2000)]
+
+    assert np.mean(from_right) == pytest.approx(1.0, abs=0.1)
+    merged, seen = profiling.merge_reservoirs(left, right, 10, rng)
+    assert (len(merged), seen) == (10, 1000)
+
+
+def test_train_writes_baseline_profile(profiling, tensors, tmp_path):
+    _, y, path = tensors
+    train = importlib.import_module("training.train")
+    baseline = tmp_path / "profiles" / "baseline.bin"
+
+    view = train.train(path, chunk_rows=8, workers=1, baseline_path=str(baseline), upload=False)
+
+    assert pickle.loads(baseline.read_bytes()) == view.stats
+    assert view.stats["target"] == (30, float(y.sum()))
@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from models.lightning.network import feed_forward
+from models.serving.weights import WeightsRunnable, load_network
+
+
+@pytest.fixture
+def saved_network(tmp_path):
+    torch.manual_seed(0)
+    network = feed_forward(3, 4).eval()
+    path = tmp_path / "weights.pt"
+    torch.save(network.state_dict(), path)
+    return network, path
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="needs /proc")
+def test_load_network_maps_weights_from_file(saved_network):
+    network, path = saved_network
+    loaded = load_network(str(path), 3, 4)
+
+    with open("/proc/self/maps") as fh:
+        assert str(path) in fh.read()
+    for name, tensor in network.state_dict().items():
+        assert torch.equal(loaded.state_dict()[name], tensor)
+    assert not any(p.requires_grad for p in loaded.parameters())
+
+
+def test_weights_runnable_warms_up_and_matches_network(saved_network):
+    network, path = saved_network
+    runnable = WeightsRunnable(str(path), 3, 4, warmup_batch_sizes=(1, 16))
+
+    report = runnable.timer.report()
+    assert {"boot", "load_weights", "warmup"} <= set(report["phases"])
+    assert report["ready_seconds"] is not None
+    assert report["first_prediction_seconds"] is None
+
+    inputs = np.random.default_rng(0).random((5, 3), dtype=np.float32)
+    inputs.flags.writeable = False
+    outputs = runnable(inputs)
+
+    with torch.no_grad():
+        expected = network(torch.from_numpy(inputs.copy())).numpy()
+    np.testing.assert_allclose(outputs, expected, rtol=1e-6)
+    assert runnable.timer.report()["first_prediction_seconds"] >= report["ready_seconds"]
@@ -1,95 +1,473 @@
 import argparse
+import importlib.util
+import os
+from typing import Optional
+
+
+# SQLite serializes writers with a file lock. Trial workers sharing a SQLite
+# study wait up to SQLITE_BUSY_TIMEOUT seconds for it instead of failing with
+# "database is locked", and at most SQLITE_MAX_JOBS of them may run at once.
+SQLITE_BUSY_TIMEOUT = 60.0
+SQLITE_MAX_JOBS = 4
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Train foot traffic model")
     parser.add_argument("--train-path", type=str, required=True,
-                        help="Path to training dataset (.pt)")
+                        help="Path to training dataset (.pt or sharded directory)")
     parser.add_argument("--val-path", type=str, default=None,
-                        help="Path to validation dataset (.pt)")
+                        help="Path to validation dataset (.pt or sharded directory)")
     parser.add_argument("--test-path", type=str, default=None,
-                        help="Path to test dataset (.pt)")
+                        help="Path to test dataset (.pt or sharded directory)")
     parser.add_argument("--batch-size", type=int, default=32,
                         help="Batch size for training")
+    parser.add_argument("--fast-loader", action="store_true",
+                        help="Slice batches directly from the dataset tensors")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="Prefetch the next batch on a background thread (with --fast-loader)")
     parser.add_argument("--max-epochs", type=int, default=10,
                         help="Number of epochs per trial")
     parser.add_argument("--n-trials", type=int, default=1,
                         help="Number of Optuna trials")
+    parser.add_argument("--n-jobs", type=int, default=1,
+                        help="Number of worker processes running trials concurrently")
+    parser.add_argument("--threads-per-trial", type=int, default=None,
+                        help="Torch threads per trial (defaults to CPU cores / --n-jobs)")
+    parser.add_argument("--backend", type=str, choices=["processes", "ray"], default="processes",
+                        help="Run the --n-jobs trial workers as local processes or as Ray tasks")
+    parser.add_argument("--ray-address", type=str, default=None,
+                        help="Ray cluster to connect to (default: RAY_ADDRESS, else a local instance)")
+    parser.add_argument("--ray-num-cpus", type=int, default=None,
+                        help="CPUs of a locally started Ray instance (default: all cores)")
+    parser.add_argument("--ray-local-mode", action="store_true",
+                        help="Run Ray tasks serially in this process (deprecated by Ray; to "
+                             "debug, prefer a local instance with --ray-num-cpus 1)")
+    parser.add_argument("--num-processes", type=int, default=1,
+                        help="Local processes for the final fit (more than one uses DDP "
+                             "and implies --retrain)")
+    parser.add_argument("--strategy", type=str, choices=["auto", "ddp"], default="auto",
+                        help="Final fit strategy; ddp runs gloo data parallelism on the CPU "
+                             "and implies --retrain")
+    parser.add_argument("--threads-per-process", type=int, default=None,
+                        help="Torch threads per final-fit process (defaults to CPU cores / processes)")
+    parser.add_argument("--pruner", type=str, choices=["median", "none"], default="median",
+                        help="Optuna pruner applied to per-epoch val_loss")
+    parser.add_argument("--storage", type=str, default="sqlite:///optuna.db",
+                        help="Optuna storage URL; studies persist there and can be resumed. "
+                             f"SQLite allows at most {SQLITE_MAX_JOBS} --n-jobs on one machine; "
+                             "use PostgreSQL (postgresql://user@host/db) for more, or for "
+                             "--backend ray on a cluster")
+    parser.add_argument("--study-name", type=str, default="foot-traffic",
+                        help="Optuna study name; an existing study is resumed")
+    parser.add_argument("--checkpoint-dir", type=str, default="checkpoints",
+                        help="Directory for per-trial model weights")
+    parser.add_argument("--retrain", action="store_true",
+                        help="Retrain the best configuration instead of reusing its trial weights")
+    parser.add_argument("--export-onnx", action="store_true",
+                        help="Also register an ONNX artifact (requires onnx and onnxruntime)")
+    parser.add_argument("--parity-rows", type=int, default=256,
+                        help="Example rows used to check exported artifacts against the eager model")
     parser.add_argument("--wandb-project", type=str, default="foot-traffic",
                         help="Weights & Biases project name")
     parser.add_argument("--wandb-offline", action="store_true",
                         help="Disable online W&B logging")
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.backend == "ray" and importlib.util.find_spec("ray") is None:
+        parser.error("--backend ray needs Ray, an optional dependency: "
+                     "pip install -r requirements-ray.txt")
+    if args.storage.startswith("sqlite:"):
+        if args.backend == "ray" and (args.ray_address or os.environ.get("RAY_ADDRESS")):
+            parser.error("--backend ray on a cluster needs Optuna storage that every node can "
+                         "reach; SQLite is a local file. Use PostgreSQL, e.g. "
+                         "--storage postgresql://user@host/optuna")
+        if args.n_jobs > SQLITE_MAX_JOBS:
+            parser.error(f"SQLite storage supports at most {SQLITE_MAX_JOBS} concurrent --n-jobs "
+                         "before writers time out on its lock; use PostgreSQL, e.g. "
+                         "--storage postgresql://user@host/optuna")
+    return args
 
 
-def main() -> None:
-    args = parse_args()
+def optuna_storage(url: str):
+    """Return the Optuna storage for ``url``, with a busy timeout for SQLite."""
+    import optuna
+
+    if not url.startswith("sqlite:"):
+        return url
+    return optuna.storages.RDBStorage(
+        url, engine_kwargs={"connect_args": {"timeout": SQLITE_BUSY_TIMEOUT}}
+    )
+
+
+def trial_checkpoint_path(args: argparse.Namespace, trial_number: int) -> str:
+    return os.path.join(args.checkpoint_dir, args.study_name, f"trial-{trial_number}.pt")
+
+
+def dataset_input_dim(path: str, dataset_cache: Optional[dict] = None) -> int:
+    """Width of the feature vectors in the dataset at ``path``."""
+    from models.lightning.datamodule import FootTrafficDataModule
+
+    datamodule = FootTrafficDataModule(train_path=path, dataset_cache=dataset_cache)
+    datamodule.setup("fit")
+    return datamodule.train_dataset[0][0].numel()
+
+
+def objective(trial, args: argparse.Namespace, dataset_cache: Optional[dict] = None) -> float:
+    """Train one configuration and return its final validation loss.
 
+    The trained weights are saved to the trial's checkpoint path (recorded as
+    the ``checkpoint`` user attribute) so the best trial can be registered
+    without retraining it. The model's input width is taken from the training
+    data and recorded as the ``input_dim`` user attribute.
+    """
     import optuna
     import pytorch_lightning as pl
+    import torch
     from pytorch_lightning.loggers import WandbLogger
 
+    from models.lightning.callbacks import OptunaPruningCallback
     from models.lightning.datamodule import FootTrafficDataModule
     from models.lightning.model import FootTrafficModel
 
-    def objective(trial: optuna.trial.Trial) -> float:
-        lr = trial.suggest_float("lr", 1e-4, 1e-1, log=True)
-        hidden_dim = trial.suggest_int("hidden_dim", 32, 256)
+    lr = trial.suggest_float("lr", 1e-4, 1e-1, log=True)
+    hidden_dim = trial.suggest_int("hidden_dim", 32, 256)
 
-        datamodule = FootTrafficDataModule(
-            train_path=args.train_path,
-            val_path=args.val_path,
-            test_path=args.test_path,
-            batch_size=args.batch_size,
-        )
+    datamodule = FootTrafficDataModule(
+        train_path=args.train_path,
+        val_path=args.val_path,
+        test_path=args.test_path,
+        batch_size=args.batch_size,
+        fast_loader=args.fast_loader,
+        prefetch=args.prefetch,
+        dataset_cache=dataset_cache,
+    )
 
-        model = FootTrafficModel(hidden_dim=hidden_dim, lr=lr)
+    input_dim = dataset_input_dim(args.train_path, dataset_cache)
+    trial.set_user_attr("input_dim", input_dim)
+    model = FootTrafficModel(input_dim=input_dim, hidden_dim=hidden_dim, lr=lr)
 
-        wandb_logger = WandbLogger(
-            project=args.wandb_project,
-            offline=args.wandb_offline,
-            name=f"trial-{trial.number}",
-            log_model=False,
-        )
+    wandb_logger = WandbLogger(
+        project=args.wandb_project,
+        offline=args.wandb_offline,
+        name=f"trial-{trial.number}",
+        log_model=False,
+    )
 
-        trainer = pl.Trainer(max_epochs=args.max_epochs, logger=wandb_logger, enable_checkpointing=False)
-        trainer.fit(model, datamodule=datamodule)
+    pruning = OptunaPruningCallback(trial, monitor="val_loss")
+    trainer = pl.Trainer(
+        max_epochs=args.max_epochs,
+        logger=wandb_logger,
+        enable_checkpointing=False,
+        callbacks=[pruning],
+    )
+    trainer.fit(model, datamodule=datamodule)
 
-        metrics = trainer.callback_metrics
-        val_loss = metrics.get("val_loss")
-        if val_loss is None:
-            return float("nan")
-        return val_loss.item()
+    if pruning.pruned:
+        raise optuna.TrialPruned(f"Pruned at epoch {trainer.current_epoch}")
 
-    study = optuna.create_study(direction="minimize")
-    study.optimize(objective, n_trials=args.n_trials)
+    metrics = trainer.callback_metrics
+    val_loss = metrics.get("val_loss")
+    if val_loss is None:
+        return float("nan")
 
-    best = study.best_trial
-    print("Best trial:", best.number)
-    print("Best parameters:", best.params)
-    print("Best value:", best.value)
+    checkpoint = trial_checkpoint_path(args, trial.number)
+    os.makedirs(os.path.dirname(checkpoint), exist_ok=True)
+    torch.save(model.model.state_dict(), checkpoint)
+    trial.set_user_attr("checkpoint", checkpoint)
+    return val_loss.item()
+
+
+def example_inputs(args: argparse.Namespace, rows: int):
+    """First ``rows`` feature vectors of the validation (or training) dataset."""
+    import torch
+
+    from models.lightning.datamodule import FootTrafficDataModule
+
+    datamodule = FootTrafficDataModule(train_path=args.train_path, val_path=args.val_path)
+    datamodule.setup("fit")
+    dataset = datamodule.val_dataset or datamodule.train_dataset
+    return torch.stack([dataset[i][0] for i in range(min(rows, len(dataset)))]).float()
+
+
+def register_inference_artifacts(args: argparse.Namespace, model) -> None:
+    """Export, parity-check and register the optimized inference artifacts."""
+    import tempfile
 
-    # Train a final model using the best hyperparameters and save with BentoML
     import bentoml
 
-    datamodule = FootTrafficDataModule(
+    from models.serving.export import build_inference_artifacts
+    from models.serving.weights import save_weights
+
+    signatures = {"__call__": {"batchable": True, "batch_dim": 0}}
+    # The service checks the input width against the features it assembles.
+    metadata = {"input_dim": model[0].in_features}
+    example = example_inputs(args, args.parity_rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        onnx_path = os.path.join(tmp, "foot_traffic.onnx") if args.export_onnx else None
+        artifacts = build_inference_artifacts(model, example, onnx_path=onnx_path)
+        for name, (artifact, error) in artifacts.items():
+            print(f"{name} parity: max relative error {error:.3g}")
+
+        bentoml.torchscript.save_model("foot_traffic_torchscript", artifacts["torchscript"][0],
+                                       signatures=signatures, metadata=metadata)
+        bentoml.torchscript.save_model("foot_traffic_int8", artifacts["int8"][0],
+                                       signatures=signatures, metadata=metadata)
+        if onnx_path is not None:
+            import onnx
+
+            bentoml.onnx.save_model("foot_traffic_onnx", onnx.load(onnx_path),
+                                    signatures={"run": {"batchable": True, "batch_dim": 0}},
+                                    metadata=metadata)
+
+    # Plain state_dict for the memory-mapped ``mmap`` serving backend.
+    save_weights(model, input_dim=model[0].in_features, hidden_dim=model[0].out_features)
+
+
+def make_pruner(name: str):
+    import optuna
+
+    if name == "median":
+        return optuna.pruners.MedianPruner(n_startup_trials=2, n_warmup_steps=1)
+    return optuna.pruners.NopPruner()
+
+
+def threads_per_trial(args: argparse.Namespace) -> int:
+    """Intra-op threads for each trial so that concurrent trials fit the cores."""
+    if args.threads_per_trial:
+        return args.threads_per_trial
+    return max(1, (os.cpu_count() or 1) // args.n_jobs)
+
+
+def trial_shares(n_trials: int, n_jobs: int) -> list:
+    """Split ``n_trials`` as evenly as possible between ``n_jobs`` workers."""
+    return [n_trials // n_jobs + (i < n_trials % n_jobs) for i in range(n_jobs)]
+
+
+def run_trials(args: argparse.Namespace, n_trials: int,
+               dataset_cache: Optional[dict] = None) -> None:
+    """Run ``n_trials`` trials of the shared study in the current process."""
+    import optuna
+    import torch
+
+    torch.set_num_threads(threads_per_trial(args))
+    study = optuna.load_study(
+        study_name=args.study_name,
+        storage=optuna_storage(args.storage),
+        pruner=make_pruner(args.pruner),
+    )
+    # Every trial reuses the datasets in dataset_cache; without one, this
+    # process loads each split on first use.
+    if dataset_cache is None:
+        dataset_cache = {}
+    study.optimize(lambda trial: objective(trial, args, dataset_cache), n_trials=n_trials)
+
+
+def load_datasets(args: argparse.Namespace) -> dict:
+    """Load every split once and return a ``dataset_cache`` keyed by path."""
+    from models.lightning.datamodule import FootTrafficDataModule
+
+    cache: dict = {}
+    FootTrafficDataModule(
         train_path=args.train_path,
         val_path=args.val_path,
         test_path=args.test_path,
-        batch_size=args.batch_size,
-    )
+        dataset_cache=cache,
+    ).setup()
+    return cache
+
+
+def process_datasets(args: argparse.Namespace) -> dict:
+    """Load every split once, in a form that is cheap to pass to spawned processes.
+
+    In-memory datasets are moved to shared memory. Torch pickles shared
+    tensors as handles, so every trial process reads the tensors loaded here
+    instead of its own copy. Sharded datasets pickle to their path and are
+    memory-mapped again by each process.
+    """
+    from torch.utils.data import TensorDataset
+
+    cache = load_datasets(args)
+    for dataset in cache.values():
+        if isinstance(dataset, TensorDataset):
+            for tensor in dataset.tensors:
+                tensor.share_memory_()
+    return cache
+
+
+def run_trials_processes(args: argparse.Namespace) -> None:
+    """Run the trials in ``--n-jobs`` spawned processes sharing one copy of the data."""
+    import torch.multiprocessing
+
+    dataset_cache = process_datasets(args)
+    context = torch.multiprocessing.get_context("spawn")
+    # Each worker process pulls trials from the shared storage.
+    workers = [context.Process(target=run_trials, args=(args, share, dataset_cache))
+               for share in trial_shares(args.n_trials, args.n_jobs) if share]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if any(worker.exitcode != 0 for worker in workers):
+        raise RuntimeError("One or more Optuna worker processes failed")
+
+
+def shared_datasets(args: argparse.Namespace) -> dict:
+    """Load every split once, in a form that is cheap to share through Ray.
+
+    In-memory datasets become ``(features, targets)`` NumPy arrays, which Ray
+    workers read from the object store without copying. Sharded datasets are
+    passed as their absolute path and memory-mapped again by each worker, so
+    on a cluster they must be on storage mounted at that path on every node.
+    """
+    from torch.utils.data import TensorDataset
+
+    return {
+        path: tuple(t.numpy() for t in dataset.tensors) if isinstance(dataset, TensorDataset)
+        else os.path.abspath(dataset.path)
+        for path, dataset in load_datasets(args).items()
+    }
+
+
+def _ray_trials(datasets: dict, args: argparse.Namespace, n_trials: int) -> None:
+    """Ray task: run ``n_trials`` trials on the datasets from :func:`shared_datasets`."""
+    import warnings
+
+    import torch
+    from torch.utils.data import TensorDataset
+
+    from models.lightning.sharded import ShardedTensorDataset
+
+    dataset_cache = {}
+    for path, dataset in datasets.items():
+        if isinstance(dataset, tuple):
+            # Object store arrays are read-only; the tensors are never written.
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                dataset = TensorDataset(*(torch.from_numpy(a) for a in dataset))
+        elif os.path.isdir(dataset):
+            dataset = ShardedTensorDataset(dataset)
+        else:
+            raise FileNotFoundError(
+                f"Sharded dataset {dataset} is not visible on this Ray node; put it on storage "
+                "mounted at the same path on every node (see docs/deployment.md)"
+            )
+        dataset_cache[path] = dataset
+    run_trials(args, n_trials, dataset_cache)
+
+
+def run_trials_ray(args: argparse.Namespace) -> None:
+    """Run the trials as ``--n-jobs`` concurrent Ray tasks.
+
+    The datasets are loaded here and put in the object store once for all
+    tasks, and each task reserves ``threads_per_trial`` CPUs. Tasks pull
+    trials from the shared Optuna storage exactly like worker processes.
+    """
+    from training.ray_backend import init_ray, map_tasks
+
+    init_ray(args.ray_address, num_cpus=args.ray_num_cpus, local_mode=args.ray_local_mode)
+    calls = [(args, share) for share in trial_shares(args.n_trials, args.n_jobs) if share]
+    map_tasks(_ray_trials, calls, shared=shared_datasets(args), num_cpus=threads_per_trial(args))
+
+
+def build_final_model(args: argparse.Namespace, best):
+    """Return the best trial's ``FootTrafficModel`` with trained weights.
+
+    The trial's checkpoint is reused unless ``--retrain`` is set or it is
+    missing, in which case its configuration is fitted again. Asking for a
+    distributed final fit (``--num-processes`` > 1 or ``--strategy ddp``)
+    implies ``--retrain``.
+    """
+    import pytorch_lightning as pl
+    import torch
+
+    from models.lightning.datamodule import FootTrafficDataModule
+    from models.lightning.distributed import trainer_kwargs
+    from models.lightning.model import FootTrafficModel
 
     final_model = FootTrafficModel(
+        input_dim=best.user_attrs.get("input_dim") or dataset_input_dim(args.train_path),
         hidden_dim=best.params["hidden_dim"],
         lr=best.params["lr"],
     )
 
-    trainer = pl.Trainer(max_epochs=args.max_epochs, enable_checkpointing=False)
-    trainer.fit(final_model, datamodule=datamodule)
+    distributed = args.num_processes > 1 or args.strategy == "ddp"
+    checkpoint = best.user_attrs.get("checkpoint")
+    if not (args.retrain or distributed) and checkpoint and os.path.exists(checkpoint):
+        # Register the best trial's own weights instead of training them again.
+        final_model.model.load_state_dict(torch.load(checkpoint))
+    else:
+        if distributed and not args.retrain:
+            print("A distributed final fit was requested; retraining the best configuration "
+                  "instead of reusing its checkpoint.")
+        elif not args.retrain:
+            print("No checkpoint for the best trial; retraining its configuration.")
+        datamodule = FootTrafficDataModule(
+            train_path=args.train_path,
+            val_path=args.val_path,
+            test_path=args.test_path,
+            batch_size=args.batch_size,
+            fast_loader=args.fast_loader,
+            prefetch=args.prefetch,
+        )
+        # With --num-processes N every rank fits its own shard of the data;
+        # the trained weights end up in final_model in this process.
+        trainer = pl.Trainer(
+            max_epochs=args.max_epochs,
+            enable_checkpointing=False,
+            **trainer_kwargs(args.num_processes, args.strategy, args.threads_per_process),
+        )
+        trainer.fit(final_model, datamodule=datamodule)
+        throughput = trainer.callback_metrics.get("samples_per_sec")
+        if throughput is not None:
+            print(f"Final fit: {float(throughput):.0f} samples/sec "
+                  f"on {args.num_processes} process(es)")
+    return final_model
+
+
+def main() -> None:
+    args = parse_args()
 
-    # Save the trained PyTorch model to BentoML's model store
+    import optuna
+
+    # The study lives in persistent storage: re-running with the same
+    # --study-name resumes or extends it instead of starting over.
+    storage = optuna_storage(args.storage)
+    optuna.create_study(
+        study_name=args.study_name,
+        storage=storage,
+        direction="minimize",
+        load_if_exists=True,
+    )
+
+    if args.backend == "ray":
+        run_trials_ray(args)
+    elif args.n_jobs == 1:
+        run_trials(args, args.n_trials)
+    else:
+        run_trials_processes(args)
+
+    study = optuna.load_study(study_name=args.study_name, storage=storage)
+    best = study.best_trial
+    print("Best trial:", best.number)
+    print("Best parameters:", best.params)
+    print("Best value:", best.value)
+
+    final_model = build_final_model(args, best)
+
+    import bentoml
+
+    # Save the trained PyTorch model to BentoML's model store. Marking the call
+    # signature batchable lets the serving runner group concurrent requests.
     final_model.model.eval()
-    bentoml.pytorch.save_model("foot_traffic", final_model.model)
+    bentoml.pytorch.save_model(
+        "foot_traffic",
+        final_model.model,
+        signatures={"__call__": {"batchable": True, "batch_dim": 0}},
+        metadata={"input_dim": final_model.hparams.input_dim},
+    )
+    # TorchScript, int8, memory-mapped weights and optionally ONNX variants for
+    # the lighter serving backends; registration fails if any drifts from the
+    # eager model.
+    register_inference_artifacts(args, final_model.model)
 
 
 if __name__ == "__main__":
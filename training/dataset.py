@@ -0,0 +1,69 @@
+"""Training datasets on the serving feature vector.
+
+The served model predicts from the ``MODEL_COLUMNS`` vector that
+``forecast_table`` and ``/forecast`` assemble from ``tecton_features`` rows.
+:func:`build_training_set` builds its training examples the same way. Each
+feature row at time ``t`` is paired, for every horizon ``h`` from 1 to
+``max_horizon``, with ``target_column`` of the same CBD at ``t + h``; the
+inputs carry ``h`` and the target hour (see
+:func:`models.serving.forecast_table.horizon_inputs`). Pairs without an
+observation at ``t + h`` are skipped.
+
+Write a dataset for ``train.py`` from an export of the feature table::
+
+    python -m training.dataset features.parquet train.pt --max-horizon 24
+"""
+
+import argparse
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+
+from models.serving.features import FEATURE_COLUMNS
+from models.serving.forecast_table import MAX_HORIZON, horizon_inputs
+
+TARGET_COLUMN = "rolling_1h_count"
+
+
+def build_training_set(features: pd.DataFrame, max_horizon: int = MAX_HORIZON,
+                       target_column: str = TARGET_COLUMN) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Return ``(inputs, targets)`` float32 tensors of shape ``(n, F)`` and ``(n, 1)``.
+
+    Examples are ordered by horizon, then by feature row.
+    """
+    if max_horizon < 1:
+        raise ValueError("max_horizon must be positive")
+    rows = features[["cbd_id", "timestamp", *FEATURE_COLUMNS]]
+    targets = features[["cbd_id", "timestamp", target_column]].rename(
+        columns={"timestamp": "target_time", target_column: "_target"}
+    )
+    examples = pd.concat([
+        rows.assign(horizon=horizon, target_time=rows["timestamp"] + pd.Timedelta(hours=horizon))
+        .merge(targets, on=["cbd_id", "target_time"], how="inner")
+        for horizon in range(1, max_horizon + 1)
+    ], ignore_index=True)
+    examples = examples[examples["_target"].notna()].reset_index(drop=True)
+
+    inputs = horizon_inputs(examples, examples["horizon"])
+    target = examples["_target"].to_numpy(dtype=np.float32).reshape(-1, 1)
+    return torch.from_numpy(inputs), torch.from_numpy(target)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build a training dataset from feature rows")
+    parser.add_argument("source", type=str, help="Parquet export of the tecton_features asset")
+    parser.add_argument("destination", type=str, help="Output .pt file of (features, targets)")
+    parser.add_argument("--max-horizon", type=int, default=MAX_HORIZON,
+                        help="Build examples for 1 to this many hours ahead")
+    parser.add_argument("--target-column", type=str, default=TARGET_COLUMN,
+                        help="Feature predicted at the target hour")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    x, y = build_training_set(pd.read_parquet(args.source), args.max_horizon, args.target_column)
+    torch.save((x, y), args.destination)
+    print(f"wrote {len(x)} examples of {x.shape[1]} features to {args.destination}")
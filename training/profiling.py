@@ -0,0 +1,207 @@
+"""Streaming whylogs profiles of training datasets.
+
+:func:`profile_dataset` profiles a dataset that does not fit in memory. The
+dataset is split into chunks of at most ``chunk_rows`` rows. The chunks are
+profiled in parallel worker processes and the partial profiles are merged as
+they complete. Each worker opens the dataset itself, so only the chunk
+boundaries and the serialized profiles cross process boundaries, and memory
+use is bounded by ``chunk_rows`` per worker instead of by the dataset size.
+
+Supported datasets:
+
+* ``.pt`` files saved with ``torch.save((features, targets))``. They are
+  memory-mapped, not loaded.
+* directories in the sharded format of :mod:`models.lightning.sharded`.
+* ``.parquet`` feature frames, such as an export of the ``tecton_features``
+  asset. Each row group is one task, read in batches of ``chunk_rows``.
+
+Tensor datasets are profiled as columns ``feature_0 .. feature_{n-1}`` and
+``target`` (``target_0 ..`` for multi-dimensional targets).
+
+With ``sample_rows`` the profile is computed from a uniform sample of at most
+``sample_rows`` rows instead of from every row. Every chunk keeps a reservoir
+of up to ``sample_rows`` of its rows, drawn uniformly without replacement.
+Reservoirs are merged pairwise: the number of rows kept from each side is
+drawn from a hypergeometric distribution over the rows each side has seen.
+The merged reservoir is therefore a uniform sample of the whole dataset, and
+only it is profiled.
+"""
+
+import functools
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import whylogs as why
+from whylogs.core import DatasetProfileView
+
+from models.lightning.sharded import ShardedTensorDataset, is_sharded_dataset
+
+Task = Tuple[int, int, int]
+Reservoir = Tuple[pd.DataFrame, int]
+
+
+@functools.lru_cache(maxsize=4)
+def _open(path: str):
+    """Open ``path`` once per process: tensor segments or a ``ParquetFile``."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path)
+    if is_sharded_dataset(path):
+        return ShardedTensorDataset(path).shards
+    import torch
+
+    data = torch.load(path, mmap=True, weights_only=True)
+    if not (isinstance(data, tuple) and len(data) == 2):
+        raise ValueError("Dataset file must contain a tuple of (features, targets)")
+    return [data]
+
+
+def plan_chunks(path: str, chunk_rows: int) -> List[Task]:
+    """Split ``path`` into ``(segment, start, stop)`` tasks.
+
+    Tensor datasets are split into tasks of at most ``chunk_rows`` rows of a
+    shard. Parquet files get one task per row group, which
+    :func:`iter_frames` reads in batches of ``chunk_rows``.
+    """
+    if chunk_rows < 1:
+        raise ValueError("chunk_rows must be positive")
+    source = _open(path)
+    if path.endswith(".parquet"):
+        return [(i, 0, source.metadata.row_group(i).num_rows) for i in range(source.num_row_groups)]
+    return [
+        (segment, start, min(start + chunk_rows, len(x)))
+        for segment, (x, _) in enumerate(source)
+        for start in range(0, len(x), chunk_rows)
+    ]
+
+
+def _tensor_frame(x, y) -> pd.DataFrame:
+    x = x.reshape(len(x), -1).numpy()
+    y = y.reshape(len(y), -1).numpy()
+    columns = {f"feature_{i}": x[:, i] for i in range(x.shape[1])}
+    if y.shape[1] == 1:
+        columns["target"] = y[:, 0]
+    else:
+        columns.update({f"target_{i}": y[:, i] for i in range(y.shape[1])})
+    return pd.DataFrame(columns)
+
+
+def iter_frames(path: str, task: Task, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Yield the rows of ``task`` as dataframes of at most ``chunk_rows`` rows."""
+    segment, start, stop = task
+    source = _open(path)
+    if path.endswith(".parquet"):
+        for batch in source.iter_batches(batch_size=chunk_rows, row_groups=[segment]):
+            yield batch.to_pandas()
+        return
+    x, y = source[segment]
+    for begin in range(start, stop, chunk_rows):
+        end = min(begin + chunk_rows, stop)
+        yield _tensor_frame(x[begin:end], y[begin:end])
+
+
+def _profile_task(path: str, task: Task, chunk_rows: int) -> Optional[bytes]:
+    merged = None
+    for frame in iter_frames(path, task, chunk_rows):
+        view = why.log(pandas=frame).view()
+        merged = view if merged is None else merged.merge(view)
+    return None if merged is None else merged.serialize()
+
+
+def _sample_task(path: str, task: Task, chunk_rows: int, sample_rows: int,
+                 seed: int) -> Optional[Reservoir]:
+    rng = np.random.default_rng(seed)
+    reservoir = None
+    for frame in iter_frames(path, task, chunk_rows):
+        keep = np.sort(rng.choice(len(frame), size=min(sample_rows, len(frame)), replace=False))
+        sample = (frame.iloc[keep].reset_index(drop=True), len(frame))
+        reservoir = sample if reservoir is None else merge_reservoirs(
+            reservoir, sample, sample_rows, rng
+        )
+    return reservoir
+
+
+def merge_reservoirs(left: Reservoir, right: Reservoir, sample_rows: int,
+                     rng: np.random.Generator) -> Reservoir:
+    """Merge two uniform samples into a uniform sample of their combined rows."""
+    (left_rows, left_seen), (right_rows, right_seen) = left, right
+    size = min(sample_rows, left_seen + right_seen)
+    from_left, from_right = rng.multivariate_hypergeometric([left_seen, right_seen], size)
+    parts = [
+        rows.iloc[np.sort(rng.choice(len(rows), size=count, replace=False))]
+        for rows, count in ((left_rows, from_left), (right_rows, from_right))
+    ]
+    return pd.concat(parts, ignore_index=True), left_seen + right_seen
+
+
+def _completed(executor: Optional[ProcessPoolExecutor], fn, calls: List[tuple],
+               max_pending: int) -> Iterator:
+    """Yield ``fn(*args)`` for every ``args`` in ``calls``, in completion order."""
+    if executor is None:
+        for args in calls:
+            yield fn(*args)
+        return
+    pending = set()
+    calls = iter(calls)
+    for args in calls:
+        pending.add(executor.submit(fn, *args))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    for future in pending:
+        yield future.result()
+
+
+def profile_dataset(path: str, chunk_rows: int = 100_000, workers: Optional[int] = None,
+                    sample_rows: Optional[int] = None, seed: int = 0,
+                    mp_context: str = "spawn") -> DatasetProfileView:
+    """Profile the dataset at ``path`` chunk by chunk and return the merged profile.
+
+    ``workers`` processes (default: all CPUs; ``1`` profiles in this process)
+    each handle one chunk at a time, and at most two chunks per worker are
+    in flight. See the module docstring for ``sample_rows``.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Dataset not found: {path}")
+    tasks = plan_chunks(path, chunk_rows)
+    workers = workers or os.cpu_count() or 1
+    executor = None
+    if workers > 1 and len(tasks) > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context(mp_context)
+        )
+    try:
+        if sample_rows is None:
+            merged = None
+            calls = [(path, task, chunk_rows) for task in tasks]
+            for data in _completed(executor, _profile_task, calls, 2 * workers):
+                if data is None:
+                    continue
+                view = DatasetProfileView.deserialize(data)
+                merged = view if merged is None else merged.merge(view)
+            if merged is None:
+                raise ValueError(f"Dataset is empty: {path}")
+            return merged
+
+        seeds = np.random.SeedSequence(seed).generate_state(len(tasks) + 1)
+        rng = np.random.default_rng(seeds[-1])
+        calls = [(path, task, chunk_rows, sample_rows, int(s)) for task, s in zip(tasks, seeds)]
+        reservoir = None
+        for sample in _completed(executor, _sample_task, calls, 2 * workers):
+            if sample is None:
+                continue
+            reservoir = sample if reservoir is None else merge_reservoirs(
+                reservoir, sample, sample_rows, rng
+            )
+        if reservoir is None:
+            raise ValueError(f"Dataset is empty: {path}")
+        return why.log(pandas=reservoir[0]).view()
+    finally:
+        if executor is not None:
+            executor.shutdown()
@@ -0,0 +1,113 @@
+"""Optional Ray execution backend for trial and feature jobs.
+
+Ray is an optional dependency, installed with
+``pip install -r requirements-ray.txt``, and only imported when the backend
+is used. :func:`init_ray` connects to the cluster at ``address`` or
+``RAY_ADDRESS`` (for example the head service of ``k8s/ray-cluster.yaml``,
+``ray://ray-cluster-head-svc:10001``). Without either it starts a
+single-machine Ray instance with ``num_cpus`` CPUs. Jobs submitted with
+:func:`map_tasks` run unchanged on both. To debug tasks, start a local
+instance with ``num_cpus=1`` so they run one at a time in ordinary worker
+processes. Ray's ``local_mode``, which runs them in this process instead, is
+deprecated by Ray and still accepted only for older Ray versions.
+
+Cluster nodes run the stock ``rayproject/ray`` image, which contains neither
+this repository nor its dependencies. When connecting to a cluster,
+:func:`init_ray` therefore ships both as the job's ``runtime_env`` (see
+:func:`repo_runtime_env`). Data directories are left out; datasets reach the
+tasks through the object store or shared storage.
+
+Large inputs shared by every task are placed in the object store once with
+``ray.put`` and passed to the tasks by reference. Ray resolves the reference
+before the task runs, and workers on the same node read NumPy buffers from
+shared memory without copying them.
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional
+
+_SHARED = object()
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# Local data and run outputs that are never uploaded with the working directory.
+RUNTIME_ENV_EXCLUDES = [
+    ".git", "data/", "airbyte/cache/", "feature_store/", "feature_state/", "checkpoints/",
+    "profiles/", "wandb/", "lightning_logs/", "optuna.db", "*.pt", "*.parquet", "*.sqlite",
+]
+
+
+def require_ray():
+    """Import and return ``ray``, or explain how to install it."""
+    try:
+        import ray
+    except ImportError as exc:
+        raise ImportError(
+            "The Ray backend needs Ray, an optional dependency: "
+            "pip install -r requirements-ray.txt"
+        ) from exc
+    return ray
+
+
+def repo_runtime_env() -> dict:
+    """Ray ``runtime_env`` that installs this repository and its requirements on every worker."""
+    return {
+        "working_dir": str(REPO_ROOT),
+        "excludes": RUNTIME_ENV_EXCLUDES,
+        "pip": str(REPO_ROOT / "requirements.txt"),
+    }
+
+
+def local_runtime_env() -> dict:
+    """Ray ``runtime_env`` that puts this repository on local workers' ``sys.path``.
+
+    Local workers start in the driver's working directory, which need not be
+    the repository.
+    """
+    path = [str(REPO_ROOT), *filter(None, [os.environ.get("PYTHONPATH")])]
+    return {"env_vars": {"PYTHONPATH": os.pathsep.join(path)}}
+
+
+def init_ray(address: Optional[str] = None, num_cpus: Optional[int] = None,
+             local_mode: bool = False, runtime_env: Optional[dict] = None):
+    """Connect to or start Ray once per process and return the ``ray`` module.
+
+    ``num_cpus`` and ``local_mode`` only apply to a locally started instance;
+    an existing cluster keeps its own resources. ``runtime_env`` defaults to
+    :func:`repo_runtime_env` on a cluster and :func:`local_runtime_env`
+    otherwise. Pass ``{}`` when the cluster image already contains the
+    repository.
+    """
+    ray = require_ray()
+
+    if ray.is_initialized():
+        return ray
+    address = address or os.environ.get("RAY_ADDRESS")
+    if address:
+        ray.init(address=address,
+                 runtime_env=repo_runtime_env() if runtime_env is None else runtime_env)
+    else:
+        ray.init(num_cpus=num_cpus, local_mode=local_mode,
+                 runtime_env=local_runtime_env() if runtime_env is None else runtime_env)
+    return ray
+
+
+def map_tasks(fn: Callable, calls: Iterable[tuple], shared: Any = _SHARED,
+              num_cpus: float = 1) -> List[Any]:
+    """Run ``fn(*args)`` as one Ray task per ``args`` in ``calls``.
+
+    When ``shared`` is given it is put in the object store once and every task
+    is called as ``fn(shared, *args)``. Each task reserves ``num_cpus`` CPUs.
+    Results are returned in the order of ``calls``. Ray must be initialized
+    (see :func:`init_ray`).
+    """
+    import ray
+
+    task = ray.remote(num_cpus=num_cpus)(fn)
+    if shared is _SHARED:
+        refs = [task.remote(*args) for args in calls]
+    else:
+        shared_ref = ray.put(shared)
+        refs = [task.remote(shared_ref, *args) for args in calls]
+    return ray.get(refs)
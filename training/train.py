@@ -1,26 +1,71 @@
 from pathlib import Path
+import argparse
 import os
 import yaml
-import whylogs as why
+
+from training.profiling import profile_dataset
 
 CONFIG_PATH = Path(__file__).resolve().parent.parent / "monitoring" / "whylabs.yaml"
 
 
-def train():
-    """Dummy training routine that logs data to WhyLabs."""
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Profile the training data for WhyLabs")
+    parser.add_argument("--data", type=str, default=None,
+                        help="Training dataset (.pt, sharded directory or .parquet)")
+    parser.add_argument("--chunk-rows", type=int, default=None,
+                        help="Rows profiled at a time by each worker")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Profiling processes (default: all CPUs)")
+    parser.add_argument("--sample-rows", type=int, default=None,
+                        help="Profile a uniform reservoir sample of this many rows")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="Where to write the baseline profile")
+    parser.add_argument("--no-upload", action="store_true",
+                        help="Only write the baseline profile, do not upload it")
+    return parser.parse_args()
+
+
+def train(data_path=None, chunk_rows=None, workers=None, sample_rows=None,
+          baseline_path=None, upload=True):
+    """Profile the training data and store it as the drift baseline.
+
+    The dataset is profiled in bounded chunks (see
+    :func:`training.profiling.profile_dataset`). The merged profile is written
+    to ``baseline_path`` for comparison with the serving profiles and uploaded
+    to WhyLabs. Unset arguments default to the ``training_profile`` section of
+    ``monitoring/whylabs.yaml``.
+    """
     config = yaml.safe_load(CONFIG_PATH.read_text())
-    logger = why.logger(
-        project=config["org_id"],
-        dataset_name=config["dataset_id"],
-        api_key=os.getenv(config.get("api_key_env", "WHYLABS_API_KEY")),
+    settings = config.get("training_profile") or {}
+    sample_rows = sample_rows or settings.get("sample_rows")
+
+    view = profile_dataset(
+        data_path or settings["data_path"],
+        chunk_rows=int(chunk_rows or settings.get("chunk_rows", 100_000)),
+        workers=workers or settings.get("workers"),
+        sample_rows=int(sample_rows) if sample_rows else None,
     )
 
-    data = {"feature": [1, 2, 3], "target": [0, 1, 0]}
-    with logger.session() as session:
-        session.log(data)
+    baseline = Path(baseline_path or settings.get("baseline_path", "profiles/training_baseline.bin"))
+    baseline.parent.mkdir(parents=True, exist_ok=True)
+    view.write(str(baseline))
+    print(f"baseline profile written to {baseline}")
+
+    if upload:
+        from whylogs.api.writer.whylabs import WhyLabsWriter
+
+        writer = WhyLabsWriter(
+            org_id=config["org_id"],
+            dataset_id=config["dataset_id"],
+            api_key=os.getenv(config.get("api_key_env", "WHYLABS_API_KEY")),
+        )
+        writer.write(file=view)
 
     print("training complete")
+    return view
 
 
 if __name__ == "__main__":
-    train()
+    args = parse_args()
+    train(args.data, args.chunk_rows, args.workers, args.sample_rows, args.baseline,
+          upload=not args.no_upload)